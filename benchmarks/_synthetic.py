@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from datetime import datetime
+
+
+def make_bars(n_bars: int, 
+              start: datetime = datetime(2024, 1, 2, 9, 30), 
+              freq: str = "1min",
+              seed: int = 0) -> pd.DataFrame:
+    """
+    Generate a synthetic OHLCV + iv DataFrame with the same columns as the 
+    sample ES data used in the tests.
+
+    Args:
+        n_bars (int): The number of bars to generate.
+        start (datetime, optional): The timestamp of the first bar. 
+            Defaults to 2024-01-02 09:30.
+        freq (str, optional): The bar frequency. Defaults to "1min".
+        seed (int, optional): The random seed. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: The synthetic bars, with a `date` column.
+    """
+    rng = np.random.default_rng(seed)
+    close = 5000 + np.cumsum(rng.normal(0, 1, n_bars)).round(2)
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.5, n_bars))
+    return pd.DataFrame({
+        "date": pd.date_range(start, periods=n_bars, freq=freq),
+        "open": open_,
+        "high": np.maximum(open_, close) + spread,
+        "low": np.minimum(open_, close) - spread,
+        "close": close,
+        "volume": rng.integers(1, 1000, n_bars).astype(float),
+        "iv": 0.15 + 0.01 * np.sin(np.arange(n_bars) / 1000),
+    })
+
+
+def write_bars_csv(path: str, n_bars: int, **kwargs) -> str:
+    """
+    Write synthetic bars (see `make_bars`) to a CSV that `DataFile` can read.
+    """
+    df = make_bars(n_bars, **kwargs)
+    df["date"] = df["date"].dt.strftime("%Y-%m-%d %H:%M:%S")
+    df.to_csv(path)
+    return path
@@ -0,0 +1,79 @@
+"""
+Benchmark the `BacktestEngine` main loop.
+
+Compares the legacy loop, which called `asyncio.run(strategy.tick())` on 
+every timestep, against `BacktestEngine.run_async()`, which awaits every tick
+inside of one event loop.
+
+Usage:
+    python benchmarks/bench_backtest_engine.py [--bars 1000000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+from _synthetic import write_bars_csv
+from ib_async_trader import *
+
+
+class NoOpStrat(Strategy):
+    
+    async def tick(self):
+        self.datas["ES"].get("close")
+
+
+class LegacyBacktestEngine(BacktestEngine):
+    """Reproduces the loop from before `run_async()` existed."""
+    
+    def run(self):
+        self.broker.initialize(self.start_time)
+        for _, data in self.datas.items():
+            data.initialize(self.strategy.on_data_update)
+        self.strategy.on_start()
+        for time_now in self._get_clock():
+            self.time_now = time_now
+            self.strategy.time_now = time_now
+            for _, data in self.datas.items():
+                data.set_time(time_now)
+            self.broker.time_now = time_now
+            asyncio.run(self.strategy.tick())
+            self.broker.update()
+        self.strategy.on_finish()
+
+
+def time_engine(engine_cls: type, csv_path: str) -> tuple[int, float]:
+    contract = ib.Future(symbol="ES", lastTradeDateOrContractMonth="202412",
+                         exchange="CME", multiplier=50)
+    data = DataFile(contract, csv_path)
+    index = data.as_df().index
+    engine = engine_cls(NoOpStrat(), {"ES": data}, None, index[0], index[-1],
+                        clock_type=ClockType.DATA_INDEX)
+    
+    start = perf_counter()
+    engine.run()
+    return len(index), perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bars", type=int, default=1_000_000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = write_bars_csv(os.path.join(tmp, "bars.csv"), args.bars)
+        
+        for name, engine_cls in [("asyncio.run per tick", LegacyBacktestEngine),
+                                 ("single event loop", BacktestEngine)]:
+            n, elapsed = time_engine(engine_cls, csv_path)
+            print(f"{name:<24} {n:>10d} ticks {elapsed:>8.2f} s "
+                  f"{n / elapsed:>12,.0f} ticks/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Benchmark pricing a whole options chain with `BlackScholes`.
+
+Compares calling the scalar `call_put_price` and `call_put_delta` once per 
+strike against a single call to the batch `BlackScholes.greeks`.
+
+Usage:
+    python benchmarks/bench_black_scholes.py [--strikes 10000]
+"""
+import argparse
+import numpy as np
+
+from time import perf_counter
+
+from ib_async_trader.utils.black_scholes import BlackScholes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--strikes", type=int, default=10_000)
+    args = parser.parse_args()
+    
+    S = 5000.0
+    K = np.linspace(4000, 6000, args.strikes)
+    t = 7 / 365
+    sigma = 0.15
+    
+    start = perf_counter()
+    for k in K:
+        BlackScholes.call_put_price(S, k, t, sigma)
+        BlackScholes.call_put_delta(S, k, t, sigma)
+    scalar = perf_counter() - start
+    
+    start = perf_counter()
+    BlackScholes.greeks(S, K, t, sigma)
+    batch = perf_counter() - start
+    
+    print(f"scalar (price + delta) {scalar * 1000:>10.2f} ms")
+    print(f"batch  (all greeks)    {batch * 1000:>10.2f} ms")
+    print(f"speedup                {scalar / batch:>10.1f} x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark per-query latency of `HistoricalOptionsDataSql`.
+
+Builds a synthetic quotes table (about 2 GB with the default arguments), then
+times the legacy lookups (f-string SQL and `SELECT COUNT(*)` against an 
+unindexed table) against `HistoricalOptionsDataSql` with bound parameters,
+covering indexes and its per-contract price cache.
+
+Usage:
+    python benchmarks/bench_historical_options_sql.py [--db quotes.db]
+        [--quote-times 20000] [--expirations 5] [--strikes 100]
+"""
+import argparse
+import numpy as np
+import os
+import sqlite3
+import tempfile
+
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
+
+from ib_async_trader.datas.data_file import HistoricalOptionsDataSql
+
+
+GREEKS = ["DELTA", "GAMMA", "VEGA", "THETA", "RHO", "IV", "VOLUME", "LAST", 
+          "SIZE", "BID", "ASK"]
+COLUMNS = ["QUOTE_UNIXTIME", "EXPIRE_UNIX", "STRIKE"] \
+    + [f"C_{g}" for g in GREEKS] + [f"P_{g}" for g in GREEKS]
+
+
+def build_db(path: str, n_quote_times: int, n_expirations: int, n_strikes: int):
+    conn = sqlite3.connect(path)
+    conn.execute(f"CREATE TABLE quotes ({', '.join(f'{c} REAL' for c in COLUMNS)})")
+    
+    start = datetime(2024, 1, 2, 9, 30)
+    expirations = [int(datetime.combine(date(2024, 1, 2) + timedelta(days=d), 
+                                        time(16)).timestamp()) 
+                   for d in range(n_expirations)]
+    strikes = np.arange(n_strikes) * 5.0 + 4500
+    rng = np.random.default_rng(0)
+    
+    per_quote = n_expirations * n_strikes
+    expire_col = np.repeat(expirations, n_strikes)
+    strike_col = np.tile(strikes, n_expirations)
+    placeholders = ", ".join("?" * len(COLUMNS))
+    for i in range(n_quote_times):
+        quote_unix = int((start + timedelta(minutes=i)).timestamp())
+        values = rng.random((per_quote, len(COLUMNS)))
+        values[:, 0] = quote_unix
+        values[:, 1] = expire_col
+        values[:, 2] = strike_col
+        conn.executemany(f"INSERT INTO quotes VALUES ({placeholders})", 
+                         values.tolist())
+        if i % 1000 == 0:
+            conn.commit()
+    conn.commit()
+    return start, expirations, strikes
+
+
+def time_queries(fn, args: list[tuple]) -> float:
+    start = perf_counter()
+    for a in args:
+        fn(*a)
+    return (perf_counter() - start) / len(args)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--quote-times", type=int, default=20_000)
+    parser.add_argument("--expirations", type=int, default=5)
+    parser.add_argument("--strikes", type=int, default=100)
+    parser.add_argument("--legacy-queries", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "quotes.db")
+        print(f"Building {db_path}...")
+        start, expirations, strikes = build_db(db_path, args.quote_times, 
+                                               args.expirations, args.strikes)
+        print(f"Database size: {os.path.getsize(db_path) / 2**30:.2f} GiB")
+        
+        rng = np.random.default_rng(1)
+        lookups = [(start + timedelta(minutes=int(rng.integers(args.quote_times))),
+                    datetime.fromtimestamp(expirations[rng.integers(len(expirations))]).date(),
+                    float(strikes[rng.integers(len(strikes))]))
+                   for _ in range(args.queries)]
+        
+        # Legacy: f-string SQL with a COUNT(*) and no index
+        conn = sqlite3.connect(db_path)
+        def legacy_has_quote_data(q, e, k):
+            expire_unix = int(datetime.combine(e, time(16)).timestamp())
+            conn.execute(f"""
+                SELECT COUNT(*) FROM quotes
+                WHERE 
+                    QUOTE_UNIXTIME == {int(q.timestamp())}
+                    AND EXPIRE_UNIX == {expire_unix}
+                    AND STRIKE == {k}
+            """).fetchone()
+        legacy = time_queries(legacy_has_quote_data, lookups[:args.legacy_queries])
+        conn.close()
+        
+        sql = HistoricalOptionsDataSql(db_path, create_indexes=True)
+        probe = time_queries(lambda q, e, k: sql.has_quote_data(q, e, k, "C"), 
+                             lookups)
+        series = time_queries(
+            lambda q, e, k: sql.get_price_timeseries_for_option(e, k, "C"), 
+            lookups[:100])
+        
+        print(f"legacy has_quote_data (COUNT, no index) {legacy * 1e3:>12.3f} ms/query")
+        print(f"has_quote_data (cached, indexed)        {probe * 1e3:>12.3f} ms/query")
+        print(f"get_price_timeseries_for_option         {series * 1e3:>12.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark the `IBLiveTradeEngine` end to end against a `SimulatedIB`, 
+replaying synthetic five second bars much faster than real time.
+
+Reports the time to the first tick, the tick lag and duration, the cost of
+the data stream update handlers, and the round-trip time of market orders
+(from `place_order` to the filled event).
+
+Usage:
+    python benchmarks/bench_live_engine.py [--symbols 30] [--ticks 200]
+"""
+import argparse
+import asyncio
+
+from time import perf_counter
+
+from ib_async_trader import *
+from ib_async_trader.utils.telemetry import Histogram
+
+
+class OrderEveryNTicksStrat(Strategy):
+    
+    def __init__(self, num_ticks: int, order_every: int):
+        super().__init__()
+        self.num_ticks = num_ticks
+        self.order_every = order_every
+        self.ticks = 0
+        self.round_trips = Histogram()
+        
+        
+    async def tick(self):
+        for data in self.datas.values():
+            if data.time_now is not None:
+                data.get_last("close")
+        
+        if self.ticks % self.order_every == 0:
+            data = next(iter(self.datas.values()))
+            placed = perf_counter()
+            self.broker.place_order(
+                data.contract, ib.MarketOrder("BUY", 1),
+                filled_event=lambda t: self.round_trips.observe(perf_counter() - placed))
+        
+        self.ticks += 1
+        if self.ticks == self.num_ticks:
+            raise KeyboardInterrupt
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=30)
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--tick-rate", type=float, default=0.05)
+    parser.add_argument("--speed", type=float, default=100)
+    parser.add_argument("--fill-latency", type=float, default=0.002)
+    parser.add_argument("--request-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    bars = {s: make_synthetic_bars(20_000, price=100 + i, seed=i) 
+            for i, s in enumerate(symbols)}
+    replay_from = next(iter(bars.values())).index[17_280].to_pydatetime()
+    sim = SimulatedIB(bars, speed=args.speed, replay_from=replay_from,
+                      fill_latency_s=args.fill_latency, 
+                      request_latency_s=args.request_latency)
+    
+    datas = {s: DataStream(ib.Stock(s, "SMART", "USD"), 60) for s in symbols}
+    strat = OrderEveryNTicksStrat(args.ticks, order_every=10)
+    engine = IBLiveTradeEngine(strat, datas, tick_rate_s=args.tick_rate, client=sim)
+    try:
+        asyncio.run(engine.run())
+    except SystemExit:
+        pass
+    
+    print(f"{'time to first tick':<24} {engine.time_to_first_tick_s * 1e3:>10.1f} ms")
+    for name in ["tick_lag_seconds", "tick_duration_seconds"]:
+        h = engine.metrics.histograms[(name, ())]
+        print(f"{name:<24} mean {h.mean * 1e3:>8.3f} ms  p99<= {h.quantile(0.99) * 1e3:>8.3f} ms")
+    
+    updates = Histogram()
+    for (name, _), h in engine.metrics.histograms.items():
+        if name == "stream_update_seconds":
+            updates.count += h.count
+            updates.sum += h.sum
+    print(f"{'stream updates':<24} {updates.count:>10d} calls, mean {updates.mean * 1e6:.1f} us")
+    
+    rt = strat.round_trips
+    print(f"{'order round trip':<24} {rt.count:>10d} orders, mean {rt.mean * 1e3:.3f} ms, "
+          f"max {rt.max * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
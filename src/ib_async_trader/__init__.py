@@ -2,9 +2,14 @@ from .broker import *
 from .brokers.backtest_broker import *
 from .brokers.ib_live_trade_broker import *
 from .data import *
+from .datas.bar_cache import *
 from .datas.data_file import *
 from .datas.data_stream import *
 from .engine import *
 from .engines.backtest_engine import *
+from .engines.backtest_sweep import *
 from .engines.ib_live_trade_engine import *
+from .engines.vectorized_backtest_engine import *
+from .simulated_ib import *
 from .strategy import *
+from . import analytics
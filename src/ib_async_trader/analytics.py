@@ -0,0 +1,345 @@
+"""
+Performance metrics computed from a backtest's equity curve and trade ledger
+(see `BacktestEngine.get_equity_curve()` and `BacktestEngine.get_trades()`).
+
+Every function that takes returns or equity accepts either a single series
+(a 1-D array, `pd.Series`, or the equity curve `pd.DataFrame` itself) or a
+batch of them as the columns of a 2-D array, in which case a metric is
+computed for each column at once.  Batches of different lengths can be padded
+with NaN (see `stack_equity_curves()`), which is ignored.
+"""
+import numpy as np
+import pandas as pd
+
+from typing import Sequence
+
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def stack_equity_curves(equity_curves: Sequence[pd.DataFrame | pd.Series | np.ndarray]) -> np.ndarray:
+    """
+    Stack the equity of many backtests (e.g. from a `BacktestSweep`) into the
+    columns of one 2-D array, padding the shorter ones at the end with NaN, so
+    that their metrics can be computed in one batched call.
+
+    Args:
+        equity_curves (Sequence[pd.DataFrame | pd.Series | np.ndarray]): The
+            equity curves, or their equity columns.
+
+    Returns:
+        np.ndarray: An array of shape (longest curve, number of curves).
+    """
+    columns = [_as_array(curve) for curve in equity_curves]
+    stacked = np.full((max((len(c) for c in columns), default=0), len(columns)), np.nan)
+    for i, column in enumerate(columns):
+        stacked[:len(column), i] = column
+    return stacked
+
+
+def returns(equity: pd.DataFrame | pd.Series | np.ndarray) -> np.ndarray:
+    """
+    Get the simple returns between consecutive points of an equity curve.
+
+    Args:
+        equity (pd.DataFrame | pd.Series | np.ndarray): The equity curve(s).
+
+    Returns:
+        np.ndarray: The returns, one shorter than `equity` along the first
+        axis.
+    """
+    equity = _as_array(equity)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return equity[1:] / equity[:-1] - 1
+
+
+def total_return(equity: pd.DataFrame | pd.Series | np.ndarray) -> np.ndarray:
+    """Get the return from the first to the last point of an equity curve."""
+    equity = _as_array(equity)
+    return _last_valid(equity) / _first_valid(equity) - 1
+
+
+def sharpe_ratio(returns: np.ndarray,
+                 periods_per_year: float = TRADING_DAYS_PER_YEAR,
+                 risk_free_rate: float = 0) -> np.ndarray:
+    """
+    Calculate the annualized Sharpe ratio of a series of returns.
+
+    Args:
+        returns (np.ndarray): The returns (see `returns()`).
+        periods_per_year (float, optional): The number of returns per year,
+            e.g. the number of bars per year for an equity curve recorded
+            every tick. Defaults to 252 (daily returns).
+        risk_free_rate (float, optional): The annual risk-free rate.
+            Defaults to 0.
+
+    Returns:
+        np.ndarray: The Sharpe ratio (one per column for a batch).
+    """
+    excess = _as_array(returns) - risk_free_rate / periods_per_year
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.nanmean(excess, axis=0) / np.nanstd(excess, axis=0, ddof=1) \
+            * np.sqrt(periods_per_year)
+
+
+def sortino_ratio(returns: np.ndarray,
+                  periods_per_year: float = TRADING_DAYS_PER_YEAR,
+                  risk_free_rate: float = 0) -> np.ndarray:
+    """
+    Calculate the annualized Sortino ratio of a series of returns.  Only
+    returns below the risk-free rate count towards the downside deviation.
+
+    Args:
+        returns (np.ndarray): The returns (see `returns()`).
+        periods_per_year (float, optional): See `sharpe_ratio()`.
+            Defaults to 252.
+        risk_free_rate (float, optional): The annual risk-free rate.
+            Defaults to 0.
+
+    Returns:
+        np.ndarray: The Sortino ratio (one per column for a batch).
+    """
+    excess = _as_array(returns) - risk_free_rate / periods_per_year
+    downside = np.sqrt(np.nanmean(np.minimum(excess, 0) ** 2, axis=0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.nanmean(excess, axis=0) / downside * np.sqrt(periods_per_year)
+
+
+def drawdown(equity: pd.DataFrame | pd.Series | np.ndarray) -> np.ndarray:
+    """
+    Get the drawdown at each point of an equity curve: the fraction by which
+    equity is below its running maximum (zero or negative).
+
+    Args:
+        equity (pd.DataFrame | pd.Series | np.ndarray): The equity curve(s).
+
+    Returns:
+        np.ndarray: The drawdown, the same shape as `equity`.
+    """
+    equity = _as_array(equity)
+    return equity / np.fmax.accumulate(equity, axis=0) - 1
+
+
+def max_drawdown(equity: pd.DataFrame | pd.Series | np.ndarray) -> np.ndarray:
+    """Get the largest drawdown of an equity curve, as a negative fraction."""
+    return np.nanmin(drawdown(equity), axis=0)
+
+
+def rolling_sharpe_ratio(returns: np.ndarray, window: int,
+                         periods_per_year: float = TRADING_DAYS_PER_YEAR) -> np.ndarray:
+    """
+    Calculate the annualized Sharpe ratio over a rolling window, in O(n) using
+    running sums.
+
+    Args:
+        returns (np.ndarray): The returns (see `returns()`).
+        window (int): The number of returns in each window, at least 2.
+        periods_per_year (float, optional): See `sharpe_ratio()`.
+            Defaults to 252.
+
+    Returns:
+        np.ndarray: The Sharpe ratio of the window ending at each return, the
+        same shape as `returns`.  The first `window - 1`, and those of windows
+        that contain NaN (e.g. the leading NaN of `returns()`), are NaN.
+    """
+    _check_window(window)
+    mean, var = _rolling_mean_var(_as_array(returns), window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return mean / np.sqrt(var) * np.sqrt(periods_per_year)
+
+
+def rolling_sortino_ratio(returns: np.ndarray, window: int,
+                          periods_per_year: float = TRADING_DAYS_PER_YEAR) -> np.ndarray:
+    """
+    Calculate the annualized Sortino ratio over a rolling window, in O(n)
+    using running sums.  See `rolling_sharpe_ratio()`.
+    """
+    _check_window(window)
+    returns = _as_array(returns)
+    mean = _rolling_sum(returns, window) / window
+    downside = np.sqrt(_rolling_sum(np.minimum(returns, 0) ** 2, window) / window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return mean / downside * np.sqrt(periods_per_year)
+
+
+def rolling_drawdown(equity: pd.DataFrame | pd.Series | np.ndarray,
+                     window: int) -> np.ndarray:
+    """
+    Get the drawdown at each point of an equity curve relative to the maximum
+    of the last `window` points, rather than of all history.
+
+    Args:
+        equity (pd.DataFrame | pd.Series | np.ndarray): The equity curve(s).
+        window (int): The number of points to look back over.
+
+    Returns:
+        np.ndarray: The drawdown, the same shape as `equity`.
+    """
+    equity = _as_array(equity)
+    rolling_max = pd.DataFrame(equity).rolling(window, min_periods=1).max().to_numpy()
+    return (equity / rolling_max.reshape(equity.shape)) - 1
+
+
+def trade_stats(trades: pd.DataFrame) -> dict[str, float]:
+    """
+    Calculate per-trade statistics from a trade ledger.  A trade is counted
+    for every fill that realized PnL, i.e. that reduced or closed a position.
+
+    Args:
+        trades (pd.DataFrame): The trade ledger.
+
+    Returns:
+        dict[str, float]: The number of trades, win rate, average win and
+        loss, largest win and loss, profit factor (gross wins over gross
+        losses), and expectancy (average PnL per trade).
+    """
+    pnl = trades["realized_pnl"].to_numpy(dtype=np.float64)
+    pnl = pnl[pnl != 0]
+    wins = pnl[pnl > 0]
+    losses = pnl[pnl < 0]
+    gross_loss = -losses.sum()
+    return {
+        "num_trades": len(pnl),
+        "win_rate": len(wins) / len(pnl) if len(pnl) else np.nan,
+        "avg_win": wins.mean() if len(wins) else np.nan,
+        "avg_loss": losses.mean() if len(losses) else np.nan,
+        "largest_win": wins.max() if len(wins) else np.nan,
+        "largest_loss": losses.min() if len(losses) else np.nan,
+        "profit_factor": wins.sum() / gross_loss if gross_loss > 0 else np.nan,
+        "expectancy": pnl.mean() if len(pnl) else np.nan,
+    }
+
+
+def turnover(trades: pd.DataFrame,
+             equity: pd.DataFrame | pd.Series | np.ndarray) -> float:
+    """
+    Get the total value traded over the mean equity.
+
+    Args:
+        trades (pd.DataFrame): The trade ledger.
+        equity (pd.DataFrame | pd.Series | np.ndarray): The equity curve.
+
+    Returns:
+        float: The turnover, e.g. 2.0 if twice the mean equity was traded.
+    """
+    traded = np.abs(trades["cash_effect"].to_numpy(dtype=np.float64)).sum()
+    return traded / np.nanmean(_as_array(equity))
+
+
+def summarize(equity_curve: pd.DataFrame, trades: pd.DataFrame = None,
+              periods_per_year: float = TRADING_DAYS_PER_YEAR,
+              risk_free_rate: float = 0) -> dict[str, float]:
+    """
+    Calculate the common metrics of one backtest.
+
+    Args:
+        equity_curve (pd.DataFrame): The equity curve.
+        trades (pd.DataFrame, optional): The trade ledger.  If given, the
+            trade statistics and turnover are included. Defaults to None.
+        periods_per_year (float, optional): The number of points of the
+            equity curve per year.  See `sharpe_ratio()`. Defaults to 252.
+        risk_free_rate (float, optional): The annual risk-free rate.
+            Defaults to 0.
+
+    Returns:
+        dict[str, float]: The metrics, by name.
+    """
+    equity = _as_array(equity_curve)
+    rets = returns(equity)
+    metrics = {
+        "total_return": float(total_return(equity)),
+        "sharpe_ratio": float(sharpe_ratio(rets, periods_per_year, risk_free_rate)),
+        "sortino_ratio": float(sortino_ratio(rets, periods_per_year, risk_free_rate)),
+        "max_drawdown": float(max_drawdown(equity)),
+    }
+    if trades is not None:
+        metrics.update(trade_stats(trades))
+        metrics["turnover"] = turnover(trades, equity)
+    return metrics
+
+
+def summarize_batch(equity_curves: Sequence[pd.DataFrame | pd.Series | np.ndarray] | np.ndarray,
+                    periods_per_year: float = TRADING_DAYS_PER_YEAR,
+                    risk_free_rate: float = 0) -> pd.DataFrame:
+    """
+    Calculate the common metrics of many backtests at once.
+
+    Args:
+        equity_curves (Sequence | np.ndarray): The equity curves, or a 2-D
+            array with one equity curve per column (see
+            `stack_equity_curves()`).
+        periods_per_year (float, optional): See `summarize()`. Defaults to 252.
+        risk_free_rate (float, optional): The annual risk-free rate.
+            Defaults to 0.
+
+    Returns:
+        pd.DataFrame: One row of metrics per equity curve.
+    """
+    if isinstance(equity_curves, np.ndarray) and equity_curves.ndim == 2:
+        equity = equity_curves
+    else:
+        equity = stack_equity_curves(equity_curves)
+    rets = returns(equity)
+    return pd.DataFrame({
+        "total_return": total_return(equity),
+        "sharpe_ratio": sharpe_ratio(rets, periods_per_year, risk_free_rate),
+        "sortino_ratio": sortino_ratio(rets, periods_per_year, risk_free_rate),
+        "max_drawdown": max_drawdown(equity),
+    })
+
+
+def _as_array(values: pd.DataFrame | pd.Series | np.ndarray) -> np.ndarray:
+    # Equity curves are given as DataFrames, so take their equity column
+    if isinstance(values, pd.DataFrame):
+        values = values["equity"]
+    return np.asarray(values, dtype=np.float64)
+
+
+def _first_valid(values: np.ndarray) -> np.ndarray:
+    # The first non-NaN value (of each column)
+    valid = ~np.isnan(values)
+    return np.take_along_axis(values, np.argmax(valid, axis=0)[None], axis=0)[0] \
+        if values.ndim == 2 else values[np.argmax(valid)]
+
+
+def _last_valid(values: np.ndarray) -> np.ndarray:
+    # The last non-NaN value (of each column)
+    n = len(values)
+    valid = ~np.isnan(values)[::-1]
+    return np.take_along_axis(values, (n - 1 - np.argmax(valid, axis=0))[None], axis=0)[0] \
+        if values.ndim == 2 else values[n - 1 - np.argmax(valid)]
+
+
+def _check_window(window: int):
+    # A ratio needs the spread of at least two returns
+    if window < 2:
+        raise ValueError(f"The window of a rolling ratio must be at least 2, got {window}.")
+
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    # The sum of each window of values ending at each point, by differencing
+    # the cumulative sum.  Windows that are not full (the first window - 1, 
+    # or all of them if the window is longer than the data) or that contain
+    # NaN are NaN.
+    sums = np.full(values.shape, np.nan)
+    if window > len(values):
+        return sums
+    cumsum = np.nancumsum(values, axis=0)
+    counts = np.cumsum(~np.isnan(values), axis=0)
+    sums[window - 1] = cumsum[window - 1]
+    sums[window:] = cumsum[window:] - cumsum[:-window]
+    num_valid = counts[window - 1:].copy()
+    num_valid[1:] -= counts[:-window]
+    sums[window - 1:][num_valid < window] = np.nan
+    return sums
+
+
+def _rolling_mean_var(values: np.ndarray, window: int) -> tuple[np.ndarray, np.ndarray]:
+    # The mean and sample variance of each window.  Values are centered on
+    # their overall mean first, which keeps the running sums of squares from
+    # losing precision.
+    overall_mean = np.nanmean(values, axis=0) if len(values) else 0.0
+    centered = values - overall_mean
+    mean = _rolling_sum(centered, window) / window
+    var = (_rolling_sum(centered ** 2, window) - window * mean ** 2) / (window - 1)
+    return mean + overall_mean, np.maximum(var, 0)
@@ -1,4 +1,6 @@
+import heapq
 import ib_async as ib
+import itertools
 
 import pandas as pd
 import numpy as np
@@ -8,20 +10,73 @@ from datetime import datetime, timedelta
 from ..broker import Broker
 from ..datas.data_file import DataFile, OptionsModelType
 from ..utils.black_scholes import BlackScholes
+from ..utils.column_recorder import ColumnRecorder
+from ..utils.contract_cache import ContractCache
+
+
+# The columns of the trade ledger, one row per fill.  quantity is signed 
+# (negative for sells), price is per contract (before the multiplier), and 
+# realized_pnl is the PnL realized by the fill, by average cost.
+TRADE_LEDGER_COLUMNS = {
+    "symbol": object,
+    "local_symbol": object,
+    "sec_type": object,
+    "expiration": object,
+    "strike": np.float64,
+    "right": object,
+    "action": object,
+    "quantity": np.float64,
+    "price": np.float64,
+    "cash_effect": np.float64,
+    "realized_pnl": np.float64,
+}
 
 
 class BacktestBroker(Broker):
     
-    def __init__(self, datas: dict[str, DataFile], starting_balance: float):
+    def __init__(self, datas: dict[str, DataFile], starting_balance: float,
+                 chain_ttl_s: float = None):
         super().__init__()
-        self.open_trades: list[ib.Trade] = []
-        self.open_positions: list[ib.Position] = []
+        
+        # Open positions keyed by contract (see _contract_key), open trades
+        # in the order they were placed, and open trades grouped by contract
+        # so that they can be found without scanning every trade.
+        self._positions: dict[object, ib.Position] = {}
+        self._trades: dict[int, ib.Trade] = {}
+        self._trades_by_contract: dict[object, dict[int, ib.Trade]] = {}
+        
+        # A min-heap of (expiration, sequence, contract key) for the open 
+        # positions, so only positions that have actually expired are touched
+        # on each update.  Entries for positions that have since been closed
+        # are skipped when they are popped.
+        self._expiry_heap: list[tuple[datetime, int, object]] = []
+        self._expiry_seq = itertools.count()
+        
+        # Parsed lastTradeDateOrContractMonth of each contract, keyed by 
+        # contract (see _contract_key), so it is only parsed once
+        self._expiration_dates: dict[object, datetime] = {}
         
         self.cash_balance = starting_balance        
         self.account_pnl = ib.PnL()
+        self.account_pnl.realizedPnL = 0.0
+        self.account_pnl.unrealizedPnL = 0.0
+        
+        # The cost of each open position (signed, like the position) for 
+        # average cost PnL, the last price each was marked at, and every fill
+        self._cost_basis: dict[object, float] = {}
+        self._last_marks: dict[object, float] = {}
+        self.trade_ledger = ColumnRecorder(TRADE_LEDGER_COLUMNS)
         
         self.datas = datas
         
+        # Contracts whose nearby historical options data has been prefetched
+        self._prefetched_contracts: set[tuple] = set()
+        
+        # Options chains, which are only rebuilt once per simulated day (or
+        # chain_ttl_s simulated seconds) rather than on every request
+        self.chain_cache = ContractCache(
+            chain_ttl_s, clock=lambda: self.time_now.timestamp())
+        
         
     def initialize(self, start_time):
         self.time_now = start_time
@@ -43,6 +98,52 @@ class BacktestBroker(Broker):
     def get_account_values(self) -> list[ib.AccountValue]:
         return None
     
+    
+    def get_trade_ledger(self) -> pd.DataFrame:
+        """
+        Get every fill so far, one row per fill, indexed by time.  See 
+        `TRADE_LEDGER_COLUMNS` for the columns.
+        """
+        return self.trade_ledger.as_df()
+    
+    
+    def mark_to_market(self) -> tuple[float, float]:
+        """
+        Price every open position at the current time, and update the 
+        account's unrealized PnL.  Options are priced in one batch per 
+        underlying, so this stays cheap with many option legs open, and 
+        nothing is priced when no positions are held.
+
+        Returns:
+            tuple[float, float]: The market value of all open positions, and
+            the exposure (the sum of the absolute market values).
+        """
+        if not self._positions:
+            self.account_pnl.unrealizedPnL = 0.0
+            return 0.0, 0.0
+        
+        keys = list(self._positions.keys())
+        positions = list(self._positions.values())
+        prices = self._get_mark_prices(keys, positions)
+        
+        qty = np.array([p.position for p in positions], dtype=np.float64)
+        mult = np.array([float(p.contract.multiplier or 1) for p in positions])
+        values = qty * mult * prices
+        
+        market_value = float(values.sum())
+        self.account_pnl.unrealizedPnL = market_value - sum(self._cost_basis.values())
+        return market_value, float(np.abs(values).sum())
+    
+
+    @property
+    def open_positions(self) -> list[ib.Position]:
+        return list(self._positions.values())
+    
+    
+    @property
+    def open_trades(self) -> list[ib.Trade]:
+        return list(self._trades.values())
+    
 
     def get_positions(self) -> list[ib.Position]:
         return self.open_positions
@@ -53,7 +154,7 @@ class BacktestBroker(Broker):
     
     
     def get_open_orders(self) -> list[ib.Order]:
-        return [t.order for t in self.open_trades]
+        return [t.order for t in self._trades.values()]
             
             
     def get_open_trades(self) -> list[ib.Trade]:
@@ -67,6 +168,7 @@ class BacktestBroker(Broker):
     async def get_options_chain(self, 
                                 contract: ib.Contract, 
                                 days_ahead: int = 1) -> list[ib.OptionChain]:
+        self.chain_cache.set_session(self.time_now.date())
         match (self.datas[contract.symbol].options_model):
             case OptionsModelType.BLACK_SCHOLES:
                 return self._get_black_scholes_options_chain(contract)
@@ -79,30 +181,53 @@ class BacktestBroker(Broker):
         
     def _get_black_scholes_options_chain(self, 
                                          contract: ib.Contract) -> list[ib.OptionChain]:
-        expirations = [(self.time_now + timedelta(days=x)).strftime("%Y%m%d") \
-            for x in range(30)]
         atm_strk = int(5 * round(self.datas[contract.symbol].get("close") / 5))
-        strikes = [strk for strk in range(atm_strk - 100, atm_strk + 100, 5)]
-        return [ib.OptionChain(contract.exchange, contract.conId, 
-                               contract.tradingClass, contract.multiplier, 
-                               expirations, strikes)]
+        key = (contract.symbol, contract.exchange, contract.conId, 
+               contract.tradingClass, contract.multiplier, atm_strk)
+        chains = self.chain_cache.get(key)
+        if chains is None:
+            expirations = [(self.time_now + timedelta(days=x)).strftime("%Y%m%d") \
+                for x in range(30)]
+            strikes = [strk for strk in range(atm_strk - 100, atm_strk + 100, 5)]
+            chains = [ib.OptionChain(contract.exchange, contract.conId, 
+                                     contract.tradingClass, contract.multiplier, 
+                                     expirations, strikes)]
+            self.chain_cache.put(key, chains)
+        return chains
         
     
     def _get_historical_options_chain(self, contract: ib.Contract, days_ahead: int = 1) -> list[ib.OptionChain]:
+        # The chain is the one quoted at this exact time, so it is keyed on 
+        # the quote time; options that have expired since must not be listed
+        key = (contract.symbol, contract.exchange, contract.conId, 
+               contract.tradingClass, contract.multiplier, days_ahead,
+               int(self.time_now.timestamp()))
+        chains = self.chain_cache.get(key)
+        if chains is not None:
+            return chains
+        
         chain = self.datas[contract.symbol]._historical_options_data.get_options_chain_as_of(self.time_now, days_ahead)
         expirations = np.unique(
             pd.to_datetime(chain['EXPIRE_UNIX'], unit='s').dt.strftime('%Y%m%d')
         )
-        return [ib.OptionChain(contract.exchange, contract.conId, 
-                               contract.tradingClass, contract.multiplier,
-                               expirations,
-                               chain["STRIKE"].unique())]
+        chains = [ib.OptionChain(contract.exchange, contract.conId, 
+                                 contract.tradingClass, contract.multiplier,
+                                 expirations,
+                                 chain["STRIKE"].unique())]
+        
+        # There may be no quotes at this exact time, in which case try again
+        # rather than caching an empty chain
+        if len(chain):
+            self.chain_cache.put(key, chains)
+        return chains
 
 
     async def qualify_contracts(self, *contracts: ib.Contract) -> list[ib.Contract]:
         for contract in contracts:
             if not contract.localSymbol:
                 contract.localSymbol = f"{contract.symbol}{contract.lastTradeDateOrContractMonth}{contract.right}{contract.strike}"
+            if contract.lastTradeDateOrContractMonth:
+                self._get_contract_expiration_date(contract)
         return contracts
     
     
@@ -129,20 +254,80 @@ class BacktestBroker(Broker):
         if filled_event: trade.filledEvent += filled_event
         if cancel_event: trade.cancelEvent += cancel_event
         if cancelled_event: trade.cancelledEvent += cancelled_event
-        self.open_trades.append(trade)
+        self._add_trade(trade)
+        if contract.lastTradeDateOrContractMonth:
+            self._get_contract_expiration_date(contract)
+        self._prefetch_historical_options_data(contract)
         
         trade.log.append(ib.TradeLogEntry(self.time_now, status="Submitted"))
         trade.statusEvent(trade)
         return trade
             
     
+    def _prefetch_historical_options_data(self, contract: ib.Contract):
+        # The first time an option is traded, load quotes for the nearby 
+        # strikes and expirations as well, since spreads and rolls are likely
+        # to need them soon.
+        if type(contract) not in [ib.Option, ib.FuturesOption]:
+            return
+        data = self.datas[contract.symbol]
+        if data.options_model != OptionsModelType.HISTORICAL_DATA:
+            return
+        
+        key = (contract.symbol, contract.lastTradeDateOrContractMonth, contract.strike)
+        if key not in self._prefetched_contracts:
+            self._prefetched_contracts.add(key)
+            data._historical_options_data.prefetch(
+                self._get_contract_expiration_date(contract),
+                contract.strike)
+            
+    
+    @staticmethod
+    def _contract_key(contract: ib.Contract) -> object:
+        # Contracts are identified by conId when they have one.  Backtest 
+        # contracts usually don't, so fall back to the fields that define 
+        # them.  Not the local symbol, since qualify_contracts sets it, which
+        # would change the key of a contract traded before it was qualified.
+        if contract.conId:
+            return contract.conId
+        return (contract.secType, contract.symbol, 
+                contract.lastTradeDateOrContractMonth, contract.right, 
+                contract.strike)
+    
+    
+    def _add_trade(self, trade: ib.Trade):
+        trade_id = id(trade)
+        self._trades[trade_id] = trade
+        key = self._contract_key(trade.contract)
+        self._trades_by_contract.setdefault(key, {})[trade_id] = trade
+        
+        
+    def _remove_trade(self, trade: ib.Trade):
+        trade_id = id(trade)
+        if self._trades.pop(trade_id, None) is None:
+            return
+        key = self._contract_key(trade.contract)
+        contract_trades = self._trades_by_contract.get(key)
+        if contract_trades is not None:
+            contract_trades.pop(trade_id, None)
+            if not contract_trades:
+                del self._trades_by_contract[key]
+    
+    
+    def _get_contract_expiration_date(self, contract: ib.Contract) -> datetime:
+        key = self._contract_key(contract)
+        exp_date = self._expiration_dates.get(key)
+        if exp_date is None:
+            exp_date = datetime.strptime(contract.lastTradeDateOrContractMonth, 
+                                         "%Y%m%d")
+            self._expiration_dates[key] = exp_date
+        return exp_date
+    
+    
     def _get_contract_expiration_dt(self, contract: ib.Contract) -> datetime:
-        return datetime.strptime(contract.lastTradeDateOrContractMonth, 
-                                 "%Y%m%d").replace(hour=16, 
-                                                   minute=0, 
-                                                   second=0, 
-                                                   microsecond=0,
-                                                   tzinfo=self.time_now.tzinfo)
+        return self._get_contract_expiration_date(contract).replace(
+            hour=16, minute=0, second=0, microsecond=0, 
+            tzinfo=self.time_now.tzinfo)
 
 
     def _is_contract_expired(self, contract: ib.Contract) -> bool:
@@ -150,27 +335,28 @@ class BacktestBroker(Broker):
         
         
     def _handle_contract_expiry(self):
-        for pos in self.open_positions:
-            if self._is_contract_expired(pos.contract):
+        heap = self._expiry_heap
+        while heap and self.time_now >= heap[0][0]:
+            _, _, key = heapq.heappop(heap)
+            pos = self._positions.get(key)
+            if pos is None or not self._is_contract_expired(pos.contract):
+                continue
                 
-                # If a position is expired, place a closing order for it to 
-                # simulate expiration.  This assumes that positions are not 
-                # assigned, but rather all contracts settle to cash.
-                action = "SELL" if pos.position > 0 else "BUY"
-                coeff = 1 if action == "SELL" else -1
-                closing_ord = ib.MarketOrder(action, pos.position * -1)
-                closing_trade = ib.Trade(pos.contract, closing_ord)
-                self._execute_trade(closing_trade)
-                
-                # Look for any open trades on this symbol and cancel them
-                for i, trade in enumerate(self.open_trades):
-                    if trade.contract.localSymbol == pos.contract.localSymbol:
-                        self._cancel_trade(trade)
-                        del self.open_trades[i]
+            # If a position is expired, place a closing order for it to 
+            # simulate expiration.  This assumes that positions are not 
+            # assigned, but rather all contracts settle to cash.
+            action = "SELL" if pos.position > 0 else "BUY"
+            closing_ord = ib.MarketOrder(action, abs(pos.position))
+            closing_trade = ib.Trade(pos.contract, closing_ord)
+            self._execute_trade(closing_trade)
+            
+            # Cancel any open trades on this contract
+            for trade in list(self._trades_by_contract.get(key, {}).values()):
+                self._cancel_trade(trade)
         
         
     def _get_trade_cash_effect(self, trade: ib.Trade) -> float:
-        coeff = -1 if trade.order.action == "BUY" else 1
+        coeff = 1 if trade.order.action == "BUY" else -1
         symbol = trade.contract.symbol
         last_price = self.datas[symbol].get_last("close")
         if type(trade.contract) in [ib.Option, ib.FuturesOption]:
@@ -187,9 +373,18 @@ class BacktestBroker(Broker):
         else:
             price = last_price
             
+        return self._get_cash_effect(coeff * trade.order.totalQuantity, 
+                                     trade.contract, price)
+    
+    
+    @staticmethod
+    def _get_cash_effect(quantity: float | np.ndarray, contract: ib.Contract, 
+                         price: float | np.ndarray) -> float | np.ndarray:
+        # The effect on cash of filling a signed quantity (or quantities) of a
+        # contract at a price (before the multiplier).  Shared by the trade 
+        # and vectorized paths, so that they always agree.
         # TODO: warn if no multiplier
-        return coeff * trade.order.totalQuantity * trade.contract.multiplier \
-            * price
+        return -quantity * float(contract.multiplier or 1) * price
         
         
     def _get_black_scholes_option_price(self, 
@@ -197,32 +392,88 @@ class BacktestBroker(Broker):
                                         symbol: str,
                                         last_price: float) -> float:
         
-        exp_dt = self._get_contract_expiration_dt(trade.contract)
-            
-        # Get the time to expiration (t) and the theoretical call or put 
-        # price (c, p)
-        t = BlackScholes.time_to_expiration_years(exp_dt, self.time_now)
+        last_iv = self.datas[symbol].get_last("iv")
+        prices = self._get_black_scholes_prices(
+            [trade.contract], last_price, last_iv, pd.Timestamp(self.time_now).value)
+        return float(prices[0])
+    
+    
+    def _get_black_scholes_prices(self, 
+                                  contracts: list[ib.Contract],
+                                  S: float | np.ndarray,
+                                  sigma: float | np.ndarray,
+                                  time_ns: int | np.ndarray) -> np.ndarray:
+        """
+        Price options (before the multiplier) with Black-Scholes.  Trades, 
+        marks, and the vectorized engine's price series are all priced here.
+        The arguments are broadcast against each other, so this can price 
+        many contracts at one time, or one contract at many times.
+
+        Args:
+            contracts (list[ib.Contract]): The options contracts.
+            S (float | np.ndarray): The price(s) of the underlying.
+            sigma (float | np.ndarray): The implied volatility of the 
+                underlying.
+            time_ns (int | np.ndarray): The time(s) to price at, in 
+                nanoseconds.
+
+        Returns:
+            np.ndarray: The price of each option.
+        """
+        exp_ns = np.array([pd.Timestamp(self._get_contract_expiration_dt(c)).value
+                           for c in contracts])
+        t = (exp_ns - time_ns) / 1E9 \
+            / (BlackScholes.DAYS_PER_YEAR * BlackScholes.SECONDS_PER_DAY)
         
         # To avoid a division by zero error, never let t reach exactly 0...
         # just set it to a "sufficiently small" number.
         # NOTE: This will generate "bogus" values for option prices after 
         # they have expired, since the price of the underlying will continue
         # to move but time to expiration has been frozen.
-        if t <= 0:
-            t = 1E-12
+        t = np.where(t <= 0, 1E-12, t)
+        
+        strikes = np.array([c.strike for c in contracts], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            calls, puts = BlackScholes.call_put_price_batch(S, strikes, t, sigma)
+        is_call = np.array([c.right in ["CALL", "C"] for c in contracts])
+        return np.where(is_call, calls, puts)
+        
+    
+    def _get_price_series(self, contract: ib.Contract, 
+                          df: pd.DataFrame) -> np.ndarray:
+        """
+        The vectorized counterpart of `_get_trade_cash_effect`'s pricing: get
+        the price of one contract (before the multiplier) at every bar of its
+        underlying data, by the same rules used to price trades.
 
-        last_iv = self.datas[symbol].get_last("iv")
-        c, p = BlackScholes.call_put_price(last_price,
-                                            trade.contract.strike, 
-                                            t, 
-                                            last_iv)    
-        return c if trade.contract.right in ["CALL", "C"] else p
+        Args:
+            contract (ib.Contract): The contract to price.
+            df (pd.DataFrame): The data for the contract's symbol.
+
+        Returns:
+            np.ndarray: The price at each bar of `df`.
+        """
+        close = df["close"].to_numpy(dtype=np.float64)
+        if type(contract) not in [ib.Option, ib.FuturesOption]:
+            return close
+        
+        match(self.datas[contract.symbol].options_model):
+            case OptionsModelType.BLACK_SCHOLES:
+                return self._get_black_scholes_prices(
+                    [contract], close, df["iv"].to_numpy(dtype=np.float64), 
+                    df.index.asi8)
+            case OptionsModelType.HISTORICAL_DATA:
+                raise NotImplementedError(
+                    "Vectorized pricing of historical options data is not supported.")
+            case OptionsModelType.NONE:
+                print("WARNING: Attempted to get option price for a contract with no options model.")
+                return np.zeros(len(df))
         
     
     def _get_historical_options_data_price(self, trade: ib.Trade, symbol: str) -> float:
         price = self.datas[symbol]._historical_options_data.get_price_for_option(
             self.time_now,
-            datetime.strptime(trade.contract.lastTradeDateOrContractMonth, "%Y%m%d"), 
+            self._get_contract_expiration_date(trade.contract), 
             trade.contract.strike, 
             trade.contract.right)
         return price
@@ -234,15 +485,18 @@ class BacktestBroker(Broker):
         # This essentially assumes that we are not in the trading session and
         # so no trades can be executed.
         has_quotes = False
+        data = self.datas[trade.contract.symbol]
         match type(trade.contract):
-            case ib.Option | ib.FuturesOption:
-                has_quotes = self.datas[trade.contract.symbol]._historical_options_data.has_quote_data(
+            case ib.Option | ib.FuturesOption if data.options_model == OptionsModelType.HISTORICAL_DATA:
+                has_quotes = data._historical_options_data.has_quote_data(
                     self.time_now,
-                    datetime.strptime(trade.contract.lastTradeDateOrContractMonth, "%Y%m%d"), 
+                    self._get_contract_expiration_date(trade.contract), 
                     trade.contract.strike, 
                     trade.contract.right)
             case _:
-                has_quotes = self.datas[trade.contract.symbol].exists(self.time_now)
+                # Modeled options are priced from the underlying, so they can
+                # trade whenever it does.
+                has_quotes = data.exists(self.time_now)
                 
         if not has_quotes:
             return False
@@ -278,21 +532,32 @@ class BacktestBroker(Broker):
     
     def _update_positions(self, new_position: ib.Position) -> bool:
         
-        for old_position in self.open_positions:
-            if old_position.contract == new_position.contract:
-                new_qty = old_position.position + new_position.position
-                if new_qty > 0:
-                    new_avg_cost = ((old_position.avgCost + 
-                                     new_position.avgCost) / new_qty)
-                else: 
-                    new_avg_cost = old_position.avgCost
-                    
-                new_position = ib.Position("", new_position.contract, 
-                                           new_qty, new_avg_cost)
-                self.open_positions.remove(old_position)
+        key = self._contract_key(new_position.contract)
+        old_position = self._positions.pop(key, None)
+        if old_position is not None:
+            new_qty = old_position.position + new_position.position
+            if new_qty > 0:
+                new_avg_cost = ((old_position.avgCost + 
+                                 new_position.avgCost) / new_qty)
+            else: 
+                new_avg_cost = old_position.avgCost
+                
+            new_position = ib.Position("", new_position.contract, 
+                                       new_qty, new_avg_cost)
                 
         if abs(new_position.position) > 0:
-            self.open_positions.append(new_position)    
+            self._positions[key] = new_position
+            if old_position is None:
+                self._schedule_expiry(key, new_position.contract)
+                
+                
+    def _schedule_expiry(self, key: object, contract: ib.Contract):
+        # Contracts without an expiration (e.g. stocks) never expire
+        if not contract.lastTradeDateOrContractMonth:
+            return
+        heapq.heappush(self._expiry_heap, 
+                       (self._get_contract_expiration_dt(contract), 
+                        next(self._expiry_seq), key))
         
     
     def _execute_trade(self, trade: ib.Trade):
@@ -307,19 +572,11 @@ class BacktestBroker(Broker):
         # Determine what effect this trade will have on account balance
         cash_eff = self._get_trade_cash_effect(trade)
         
-        # Create the resulting position
+        # Update the positions, balance and PnL of the account
         coeff = 1 if trade.order.action == "BUY" else -1
         qty = coeff * trade.order.totalQuantity 
         avg_cost = abs(cash_eff) / qty
-        position = ib.Position("", trade.contract, qty, avg_cost)
-        
-        # Update open_positions, and remove this from open_orders
-        self._update_positions(position)
-        
-        # Update the balance on the account
-        self.cash_balance += cash_eff
-        
-        self.account_pnl.realizedPnL += cash_eff
+        self._book_fill(trade.contract, qty, cash_eff)
 
         # Create execution on commission data, then call trade fill events
         # NOTE: This currently assumes perfect execution of the entire order
@@ -351,14 +608,116 @@ class BacktestBroker(Broker):
         trade.commissionReportEvent(trade, fill, comm)
         
     
+    def _book_fill(self, contract: ib.Contract, qty: float, cash_eff: float):
+        """
+        Apply a fill to the account: update the position, cash balance and 
+        realized PnL, and record the fill in the trade ledger.
+
+        Realized PnL is booked by average cost, only on the part of a fill
+        that reduces a position.  (It used to be the sum of the cash effects
+        of all fills, so opening a position changed it.)  The cost of the 
+        open positions is carried in their cost basis instead, and is taken 
+        into account by the unrealized PnL (see `mark_to_market`).
+
+        Args:
+            contract (ib.Contract): The contract that was filled.
+            qty (float): The signed quantity filled (negative for sells).
+            cash_eff (float): The effect of the fill on the cash balance.
+        """
+        key = self._contract_key(contract)
+        old_qty = self._positions[key].position if key in self._positions else 0
+        old_cost = self._cost_basis.get(key, 0.0)
+        
+        # The value of one contract at the fill price (with the multiplier)
+        unit_value = abs(cash_eff / qty)
+        
+        # Realize PnL, by average cost, on the part of the fill that reduces
+        # the position, and carry the cost of whatever remains open.
+        realized = 0.0
+        if old_qty == 0 or np.sign(qty) == np.sign(old_qty):
+            new_cost = old_cost + qty * unit_value
+        else:
+            closed = min(abs(qty), abs(old_qty))
+            realized = np.sign(old_qty) * closed * unit_value \
+                - old_cost * closed / abs(old_qty)
+            new_cost = old_cost * (1 - closed / abs(old_qty)) \
+                + np.sign(qty) * (abs(qty) - closed) * unit_value
+        
+        self._update_positions(ib.Position("", contract, qty, abs(cash_eff) / qty))
+        if key in self._positions:
+            self._cost_basis[key] = new_cost
+            self._last_marks[key] = unit_value / float(contract.multiplier or 1)
+        else:
+            self._cost_basis.pop(key, None)
+            self._last_marks.pop(key, None)
+        
+        self.cash_balance += cash_eff
+        self.account_pnl.realizedPnL += realized
+        
+        self.trade_ledger.append(
+            pd.Timestamp(self.time_now).value,
+            symbol=contract.symbol,
+            local_symbol=contract.localSymbol,
+            sec_type=contract.secType,
+            expiration=contract.lastTradeDateOrContractMonth,
+            strike=float(contract.strike),
+            right=contract.right,
+            action="BUY" if qty > 0 else "SELL",
+            quantity=qty,
+            price=unit_value / float(contract.multiplier or 1),
+            cash_effect=cash_eff,
+            realized_pnl=realized)
+        
+        
+    def _get_mark_prices(self, keys: list[object], 
+                         positions: list[ib.Position]) -> np.ndarray:
+        # Price each position (before the multiplier) by the same rules as 
+        # trades, batching the Black-Scholes options of each underlying into
+        # one call.  Positions that can't be priced now keep their last mark.
+        prices = np.full(len(positions), np.nan)
+        modeled_options: dict[str, list[int]] = {}
+        for i, pos in enumerate(positions):
+            contract = pos.contract
+            data = self.datas[contract.symbol]
+            if type(contract) not in [ib.Option, ib.FuturesOption]:
+                prices[i] = data.get_last("close")
+                continue
+            match data.options_model:
+                case OptionsModelType.BLACK_SCHOLES:
+                    modeled_options.setdefault(contract.symbol, []).append(i)
+                case OptionsModelType.HISTORICAL_DATA:
+                    exp_date = self._get_contract_expiration_date(contract)
+                    if data._historical_options_data.has_quote_data(
+                            self.time_now, exp_date, contract.strike, contract.right):
+                        prices[i] = data._historical_options_data.get_price_for_option(
+                            self.time_now, exp_date, contract.strike, contract.right)
+                case OptionsModelType.NONE:
+                    prices[i] = 0
+        
+        time_ns = pd.Timestamp(self.time_now).value
+        for symbol, rows in modeled_options.items():
+            data = self.datas[symbol]
+            prices[rows] = self._get_black_scholes_prices(
+                [positions[i].contract for i in rows], data.get_last("close"), 
+                data.get_last("iv"), time_ns)
+        
+        for i, key in enumerate(keys):
+            if np.isnan(prices[i]):
+                prices[i] = self._last_marks.get(key, 0.0)
+            else:
+                self._last_marks[key] = prices[i]
+        return prices
+        
+    
     def _cancel_trade(self, trade: ib.Trade):
         """
-        Remove the (`Contract`, `Order`) tuple from `open_orders`, then call
-        the cancel events on the `Trade`.
+        Remove the `Trade` from the open trades, then call the cancel events
+        on the `Trade`.
 
         Args:
             trade (ib.Trade): The `Trade` to cancel.
         """
+        self._remove_trade(trade)
         trade.log.append(ib.TradeLogEntry(self.time_now, status="Cancelled"))
         trade.cancelEvent(trade)
         trade.cancelledEvent(trade)
@@ -367,8 +726,10 @@ class BacktestBroker(Broker):
 
     def _handle_open_trades(self):
         
-        for i, trade in enumerate(self.open_trades):
+        # Iterate over a snapshot, since trades are removed as they execute
+        # (or are cancelled)
+        for trade in list(self._trades.values()):
             
             if self._can_execute_trade(trade):
                 self._execute_trade(trade)
-                del self.open_trades[i]
+                self._remove_trade(trade)
@@ -1,31 +1,158 @@
+import copy
+import dataclasses
 import ib_async as ib
 
+from datetime import date
+from types import MappingProxyType
+
 from ..broker import Broker
+from ..utils.contract_cache import ContractCache
+
+
+class AccountSnapshot:
+    """
+    A read-only view of an account's values as of one update generation, so
+    that a tick reading several values gets them all from the same state of
+    the account, even if an update arrives part way through the tick.  Values
+    are typed: numeric values are floats, anything else is left a string.
+    """
+    
+    def __init__(self, generation: int, 
+                 values: dict[str, dict[tuple[str, str], float | str]]):
+        self.generation = generation
+        self._values = values
+        
+        
+    def get(self, tag: str, currency: str = None, account: str = None) -> float | str:
+        """
+        Get an account value.
+
+        Args:
+            tag (str): The tag of the value (e.g. "NetLiquidation").
+            currency (str, optional): The currency of the value.  If not 
+                given, the first value reported with this tag (and account)
+                is returned. Defaults to None.
+            account (str, optional): The account of the value.  If not given,
+                the first value reported with this tag (and currency) is 
+                returned. Defaults to None.
+
+        Returns:
+            float | str: The value.
+        """
+        return _lookup_account_value(self._values, tag, currency, account)
+        
+    
+    @property
+    def buying_power(self) -> float:
+        return self.get("BuyingPower")
+    
+    
+    @property
+    def cash_balance(self) -> float:
+        return self.get("CashBalance")
 
 
 class IBLiveTradeBroker(Broker):
     
-    def __init__(self, ib: ib.IB):
+    def __init__(self, ib: ib.IB, chain_ttl_s: float = 3600, 
+                 contract_ttl_s: float = None):
+        """
+        Initialize an `IBLiveTradeBroker`.
+
+        Args:
+            ib (ib.IB): The connection to IB.
+            chain_ttl_s (float, optional): How long options chains are cached
+                for, in seconds. Defaults to 3600.
+            contract_ttl_s (float, optional): How long qualified contracts are
+                cached for, in seconds.  If None, they are cached for the rest
+                of the day. Defaults to None.
+        """
         super().__init__()
         self.ib = ib
+        
+        # Options chains and qualified contracts, so that strategies that 
+        # rebuild spreads on every tick don't make a round-trip to IB (and
+        # count against its pacing limits) each time.  Both are dropped at 
+        # the start of each day, and whenever the connection is (re)made.
+        self.chain_cache = ContractCache(chain_ttl_s)
+        self.contract_cache = ContractCache(contract_ttl_s)
+        self.ib.connectedEvent += self._on_connected
+        
+        # Account values, indexed by tag and then (currency, account), kept
+        # up to date from IB's account value events rather than scanned for
+        # on every lookup.  The generation counts the updates received, and
+        # the snapshot of the latest generation is cached until the next one.
+        self._account_values: dict[str, dict[tuple[str, str], float | str]] = {}
+        self._account_generation = 0
+        self._account_snapshot: AccountSnapshot = None
+        self.ib.accountValueEvent += self._on_account_value
     
     
     def get_buying_power(self) -> float:
-        acct_vals = self.ib.accountValues()
-        bp = [av.value for av in acct_vals if av.tag == "BuyingPower"][0]
-        return float(bp)
+        return self.get_account_value("BuyingPower")
     
     
     def get_cash_balance(self) -> float:
-        acct_vals = self.ib.accountValues()
-        cb = [av.value for av in acct_vals if av.tag == "CashBalance"][0]
-        return float(cb)
+        return self.get_account_value("CashBalance")
+    
+    
+    def get_account_value(self, tag: str, currency: str = None, 
+                          account: str = None) -> float | str:
+        """
+        Get the latest value of an account value.  See `AccountSnapshot.get`.
+        """
+        self._seed_account_values()
+        return _lookup_account_value(self._account_values, tag, currency, account)
+    
+    
+    def get_account_snapshot(self) -> AccountSnapshot:
+        """
+        Get a consistent, read-only view of the account values as of the 
+        latest update.  A tick that reads several values should read them all
+        from one snapshot.
+        """
+        self._seed_account_values()
+        if self._account_snapshot is None or \
+                self._account_snapshot.generation != self._account_generation:
+            frozen = {tag: MappingProxyType(dict(by_key)) 
+                      for tag, by_key in self._account_values.items()}
+            self._account_snapshot = AccountSnapshot(self._account_generation, 
+                                                     MappingProxyType(frozen))
+        return self._account_snapshot
     
     
     def get_account_values(self) -> list[ib.AccountValue]:
         return self.ib.accountValues()
     
             
+    def _set_cache_session(self):
+        today = date.today()
+        self.chain_cache.set_session(today)
+        self.contract_cache.set_session(today)
+        
+        
+    def _on_connected(self):
+        self.chain_cache.clear()
+        self.contract_cache.clear()
+        
+        
+    def _seed_account_values(self):
+        # Values may have arrived before we subscribed to their events
+        if not self._account_values:
+            for value in self.ib.accountValues():
+                self._index_account_value(value)
+        
+        
+    def _on_account_value(self, value: ib.AccountValue):
+        self._index_account_value(value)
+        
+        
+    def _index_account_value(self, value: ib.AccountValue):
+        self._account_values.setdefault(value.tag, {})[(value.currency, value.account)] = \
+            _parse_account_value(value.value)
+        self._account_generation += 1
+    
+            
     def get_positions(self) -> list[ib.Position]:
         return self.ib.positions()
     
@@ -47,11 +174,44 @@ class IBLiveTradeBroker(Broker):
     
     
     async def get_options_chain(self, contract: ib.Contract) -> list[ib.OptionChain]:
-        return await self.ib.reqSecDefOptParamsAsync(contract.symbol, contract.exchange, contract.secType, contract.conId)
+        self._set_cache_session()
+        key = (contract.symbol, contract.exchange, contract.secType, contract.conId)
+        return await self.chain_cache.get_or_fetch(
+            key, lambda: self.ib.reqSecDefOptParamsAsync(*key))
         
     
     async def qualify_contracts(self, *contracts: ib.Contract) -> list[ib.Contract]:
-        return await self.ib.qualifyContractsAsync(*contracts)
+        """
+        Qualify contracts with IB, filling in their details in place.  Only
+        the contracts that have not been qualified recently are sent to IB, 
+        in a single request.
+
+        Returns:
+            list[ib.Contract]: The contracts that could be qualified.
+        """
+        self._set_cache_session()
+        keys = [_contract_cache_key(c) for c in contracts]
+        by_key = dict(zip(keys, contracts))
+        
+        async def fetch(keys: list[tuple]) -> list[ib.Contract]:
+            to_qualify = [copy.copy(by_key[key]) for key in keys]
+            qualified = await self.ib.qualifyContractsAsync(*to_qualify)
+            qualified_ids = {id(c) for c in qualified}
+            return [c if id(c) in qualified_ids else None for c in to_qualify]
+        
+        results = await self.contract_cache.get_or_fetch_many(keys, fetch)
+        qualified = []
+        for contract, result in zip(contracts, results):
+            if result is not None:
+                for field in dataclasses.fields(result):
+                    setattr(contract, field.name, getattr(result, field.name))
+                qualified.append(contract)
+                
+                # Qualifying an already qualified contract is a hit too
+                qualified_key = _contract_cache_key(contract)
+                if qualified_key not in self.contract_cache:
+                    self.contract_cache.put(qualified_key, result)
+        return qualified
     
     
     async def what_if_order(self, contract: ib.Contract, order: ib.Order) -> ib.OrderState:
@@ -72,4 +232,37 @@ class IBLiveTradeBroker(Broker):
         if cancel_event: trade.cancelEvent += cancel_event
         if cancelled_event: trade.cancelledEvent += cancelled_event
         return trade
-    
\ No newline at end of file
+    
+
+
+def _lookup_account_value(values: dict[str, dict[tuple[str, str], float | str]],
+                          tag: str, currency: str, account: str) -> float | str:
+    by_key = values.get(tag)
+    if by_key:
+        if currency is not None and account is not None:
+            value = by_key.get((currency, account))
+            if value is not None:
+                return value
+        else:
+            for (cur, acct), value in by_key.items():
+                if (currency is None or cur == currency) and \
+                        (account is None or acct == account):
+                    return value
+    raise KeyError(f"No account value for tag {tag}, currency {currency} "
+                   f"and account {account}.")
+
+
+def _contract_cache_key(contract: ib.Contract) -> tuple:
+    # Contracts that describe the same instrument before qualification
+    return (type(contract).__name__, contract.conId, contract.symbol, 
+            contract.secType, contract.lastTradeDateOrContractMonth, 
+            contract.strike, contract.right, contract.multiplier, 
+            contract.exchange, contract.primaryExchange, contract.currency, 
+            contract.localSymbol, contract.tradingClass)
+
+
+def _parse_account_value(value: str) -> float | str:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
@@ -0,0 +1,102 @@
+import sqlite3
+import threading
+
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+
+class CachedBar(NamedTuple):
+    """A bar loaded from a `BarCache`, with the same fields as IB's bars."""
+    date: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+class BarCache:
+    """
+    A local sqlite cache of the five second bars received by `DataStream`s,
+    so that a restarted stream only needs to request the bars it missed from
+    IB rather than all of its history.  One cache can be shared by any number
+    of streams, and is safe to write to from a background thread.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Initialize a `BarCache`, creating the database if it does not exist.
+
+        Args:
+            db_path (str): The path to the sqlite database.
+        """
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS bars (
+                    key TEXT NOT NULL,
+                    time INTEGER NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL,
+                    PRIMARY KEY (key, time)
+                ) WITHOUT ROWID
+            """)
+            self._conn.commit()
+
+
+    def load(self, key: str, since: datetime) -> list[CachedBar]:
+        """
+        Load the cached bars of a stream.
+
+        Args:
+            key (str): The key of the stream.
+            since (datetime): The time of the earliest bar to load.
+
+        Returns:
+            list[CachedBar]: The bars, oldest first, with UTC dates.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT time, open, high, low, close, volume FROM bars "
+                "WHERE key = ? AND time >= ? ORDER BY time",
+                (key, int(since.timestamp()))).fetchall()
+        return [CachedBar(datetime.fromtimestamp(t, timezone.utc), *ohlcv)
+                for t, *ohlcv in rows]
+
+
+    def append(self, key: str, bars: list) -> None:
+        """
+        Add bars to the cache, replacing any cached bars at the same times.
+
+        Args:
+            key (str): The key of the stream.
+            bars (list): The bars (e.g. `ib_async.BarData`), which must have
+                `date`, `open`, `high`, `low`, `close` and `volume`.
+        """
+        rows = [(key, int(bar.date.timestamp()), bar.open, bar.high, bar.low,
+                 bar.close, bar.volume) for bar in bars]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+
+    def prune(self, key: str, before: datetime) -> None:
+        """
+        Remove the cached bars of a stream that are older than a given time.
+
+        Args:
+            key (str): The key of the stream.
+            before (datetime): Bars before this time are removed.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM bars WHERE key = ? AND time < ?",
+                               (key, int(before.timestamp())))
+            self._conn.commit()
+
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
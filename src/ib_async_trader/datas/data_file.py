@@ -1,13 +1,20 @@
 import dask.dataframe as dd
+import hashlib
+import json
+import numpy as np
+import os
 import pathlib
 import pandas as pd
+import shutil
 import sqlite3
 
+from collections import deque
 from datetime import date, datetime, time, timedelta
 from enum import Enum
 from ib_async import Contract
 
 from ..data import Data
+from ..utils.lru_cache import LRUCache
  
 
 class OptionsModelType(Enum):
@@ -18,16 +25,138 @@ class OptionsModelType(Enum):
  
 class DataFile(Data):
     
+    # Types of the columns we know about, so pandas doesn't have to infer them
+    CSV_DTYPES = {
+        "date": str,
+        "open": np.float64,
+        "high": np.float64,
+        "low": np.float64,
+        "close": np.float64,
+        "volume": np.float64,
+        "average": np.float64,
+        "iv": np.float64,
+    }
+    CACHE_VERSION = 1
+    
     def __init__(self, 
                  contract: Contract, 
                  file_path: str, 
                  options_model: OptionsModelType = OptionsModelType.BLACK_SCHOLES,
-                 historical_options_path: str = None):
+                 historical_options_path: str = None,
+                 use_cache: bool = False,
+                 cache_dir: str = None):
+        """
+        Initialize a `DataFile`.
+
+        If `use_cache` is set, the first time a file is read the cleaned-up 
+        data is written to a binary cache, which later `DataFile`s for the 
+        same (unchanged) file memory-map instead of parsing the file again.
+
+        Args:
+            contract (Contract): The contract the data is for.
+            file_path (str): The path to the CSV file of bars.
+            options_model (OptionsModelType, optional): The options model to
+                use. Defaults to OptionsModelType.BLACK_SCHOLES.
+            historical_options_path (str, optional): The path to the historical
+                options data, if using `OptionsModelType.HISTORICAL_DATA`. 
+                Defaults to None.
+            use_cache (bool, optional): Whether to read from and write to the
+                binary cache. Defaults to False.
+            cache_dir (str, optional): The directory to keep the cache in.  
+                Defaults to "ib_async_trader" in the user's cache directory
+                (`$XDG_CACHE_HOME`, or `~/.cache`).
+        """
         super().__init__(contract)
-                
+        self.file_path = file_path
+        if use_cache:
+            self._set_df(self._read_file_cached(file_path, cache_dir))
+        else:
+            self._set_df(self._read_file(file_path))
+        self._set_options_model(options_model, historical_options_path)
+        
+    
+    @classmethod
+    def from_df(cls, 
+                contract: Contract, 
+                df: pd.DataFrame, 
+                options_model: OptionsModelType = OptionsModelType.BLACK_SCHOLES,
+                historical_options_path: str = None) -> "DataFile":
+        """
+        Create a `DataFile` from a DataFrame that has already been read and
+        cleaned up by another `DataFile` (see `as_df`), without re-reading the
+        source file.
+
+        Args:
+            contract (Contract): The contract the data is for.
+            df (pd.DataFrame): The data, indexed by a `DatetimeIndex`.
+            options_model (OptionsModelType, optional): The options model to
+                use. Defaults to OptionsModelType.BLACK_SCHOLES.
+            historical_options_path (str, optional): The path to the historical
+                options data, if using `OptionsModelType.HISTORICAL_DATA`. 
+                Defaults to None.
+
+        Returns:
+            DataFile: The new `DataFile`.
+        """
+        data = cls.__new__(cls)
+        Data.__init__(data, contract)
+        data.file_path = None
+        data._set_df(df)
+        data._set_options_model(options_model, historical_options_path)
+        return data
+    
+    
+    def _read_file_cached(self, file_path: str, cache_dir: str = None) -> pd.DataFrame:
+        # The cache is keyed by the file's path, modification time and size, 
+        # so it is rebuilt whenever the file changes.
+        source = pathlib.Path(file_path).resolve()
+        stat = source.stat()
+        key = {"version": self.CACHE_VERSION, "path": str(source), 
+               "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+        
+        if cache_dir is None:
+            cache_dir = pathlib.Path(os.environ.get("XDG_CACHE_HOME") or 
+                                     pathlib.Path.home() / ".cache") / "ib_async_trader"
+        path_hash = hashlib.sha1(str(source).encode()).hexdigest()[:12]
+        cache_path = pathlib.Path(cache_dir) / f"{source.name}-{path_hash}"
+            
+        try:
+            with open(cache_path / "key.json") as f:
+                if json.load(f) == key:
+                    return _read_df_columns(cache_path)
+        except (OSError, ValueError):
+            pass
+        
+        df = self._read_file(file_path)
+        
+        # Write the cache to a temporary directory first, then move it into 
+        # place, so that a partially written cache is never read.
+        tmp_path = cache_path.with_name(f"{cache_path.name}.tmp{os.getpid()}")
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            _write_df_columns(df, tmp_path)
+            with open(tmp_path / "key.json", "w") as f:
+                json.dump(key, f)
+            shutil.rmtree(cache_path, ignore_errors=True)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"WARNING: Could not write data cache for {file_path}: {e}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        return df
+    
+    
+    def _read_file(self, file_path: str) -> pd.DataFrame:
         # Read data from the file
-        df = pd.read_csv(file_path)
+        df = self._parse_dates(pd.read_csv(file_path, dtype=self.CSV_DTYPES))
         
+        # Cleanup duplicates, sort by time and interpolate missing values
+        df = _sort_by_time(df[~df.index.duplicated(keep='first')])
+        # TODO: Probably need to do this for more than just the iv column
+        df["iv"] = df["iv"].interpolate(method="linear")
+        return df
+    
+    
+    def _parse_dates(self, df: pd.DataFrame) -> pd.DataFrame:
         # Convert the date column to datetime
         # I don't like the way pandas converts dates/timezones, so
         # we will always assume data is given in "local time" and we can 
@@ -36,19 +165,24 @@ class DataFile(Data):
         df["date"]  = df["date"].str[0:19]
         df["date"] = pd.to_datetime(df["date"])
         df.index = pd.DatetimeIndex(df["date"])
+        return df
+    
+    
+    def _set_df(self, df: pd.DataFrame):
+        self._df = _sort_by_time(df)
+        self._build_columns()
+        self.set_time(self._df.index[0])
         
-        # Cleanup duplicates and interpolate missing values
-        df = df[~df.index.duplicated(keep='first')]
-        # TODO: Probably need to do this for more than just the iv column
-        df["iv"] = df["iv"].interpolate(method="linear")
-        
-        self._df = df
-        self.time_now = self._df.index[0]
-        
+    
+    def _set_options_model(self, options_model: OptionsModelType, 
+                           historical_options_path: str):
         self.options_model = options_model
+        self.historical_options_path = historical_options_path
         if options_model == OptionsModelType.HISTORICAL_DATA:
             ftype = pathlib.Path(historical_options_path).suffix
-            if ftype == ".parquet":
+            if pathlib.Path(historical_options_path).is_dir():
+                self._historical_options_data = HistoricalOptionsDataColumnar(historical_options_path)
+            elif ftype == ".parquet":
                 self._historical_options_data = HistoricalOptionsDataParquet(historical_options_path)
             elif ftype == ".db":
                 self._historical_options_data = HistoricalOptionsDataSql(historical_options_path)
@@ -60,13 +194,247 @@ class DataFile(Data):
         super().initialize(on_update)
         
         if self.on_update:
-            self._df = self.on_update(self.contract.symbol, self._df)
+            # Data read from the cache is memory-mapped read-only, so give 
+            # on_update a copy that it can modify in place
+            df = self._df.copy() if _is_read_only(self._df) else self._df
+            self._df = _sort_by_time(self.on_update(self.contract.symbol, df))
+            self._build_columns()
+            self.set_time(self.time_now)
     
         
     def set_time(self, time_now: datetime):
+        """
+        Set the data's perception of the current time, and advance the cursor
+        to the last bar at or before that time.  Since the backtest clock 
+        almost always moves forward, the search starts from the previous 
+        cursor position, so that each call is O(1) in the common case.
+
+        Args:
+            time_now (datetime): The current time.
+        """
         self.time_now = time_now
+        
+        t = pd.Timestamp(time_now).value
+        times = self._times
+        n = len(times)
+        pos = self._pos
+        
+        if pos >= 0 and times[pos] > t:
+            # Time moved backwards, so fall back to searching the whole index
+            pos = int(np.searchsorted(times, t, side="right")) - 1
+        elif pos + 1 < n and times[pos + 1] <= t:
+            pos += 1
+            if pos + 1 < n and times[pos + 1] <= t:
+                pos += int(np.searchsorted(times[pos + 1:], t, side="right"))
+        
+        self._pos = pos
+        self._is_at_bar = pos >= 0 and times[pos] == t
+        
+        
+    def get(self, name: str, bars_ago: int = 0) -> any:
+        if not self._is_at_bar:
+            return None
+        return self._columns[name][self._pos - bars_ago]
+    
+    
+    def get_last(self, name: str):
+        if self._pos < 0:
+            raise KeyError(f"No data at or before {self.time_now}.")
+        return self._columns[name][self._pos]
+    
+    
+    def exists(self, time: datetime=None):
+        if time is None:
+            return self._is_at_bar
+        return super().exists(time)
+    
+    
+    def iter_index_chunks(self):
+        """
+        Iterate over the data's `DatetimeIndex` in ascending, non-overlapping
+        chunks.  Used by the `BacktestEngine` to build its clock without 
+        needing every data's full index in memory at once.
+
+        Yields:
+            pd.DatetimeIndex: The next chunk of the index.
+        """
+        yield self._df.index
+    
+    
+    def _build_columns(self):
+        """
+        Extract the index and each column of the underlying DataFrame into 
+        NumPy arrays, so that `get` and `get_last` are simple array lookups.
+        This must be called whenever `_df` is replaced.
+        """
+        self._times = self._df.index.asi8
+        self._columns = {}
+        for name, col in self._df.items():
+            if col.dtype.kind in "biuf":
+                self._columns[name] = col.to_numpy()
+            else:
+                self._columns[name] = col.to_numpy(dtype=object)
+        self._pos = -1
+        self._is_at_bar = False
+
+
+class ChunkedDataFile(DataFile):
+    """
+    A `DataFile` for files too large to fit in memory.  Rather than reading
+    the whole file up front, the file is read in time-ordered chunks as the 
+    backtest clock advances, and only the most recent `lookback` bars (plus 
+    the current chunk) are kept in memory.  The file must be sorted by date.
+    """
+    
+    def __init__(self, 
+                 contract: Contract, 
+                 file_path: str, 
+                 chunksize: int = 100_000,
+                 lookback: int = 1_000,
+                 overlap: int = None,
+                 options_model: OptionsModelType = OptionsModelType.BLACK_SCHOLES,
+                 historical_options_path: str = None):
+        """
+        Initialize a `ChunkedDataFile`.
+
+        Args:
+            contract (Contract): The contract the data is for.
+            file_path (str): The path to the CSV file of bars, sorted by date.
+            chunksize (int, optional): The number of rows to read at a time.
+                Defaults to 100,000.
+            lookback (int, optional): The number of bars before the current 
+                chunk to keep in memory.  This is the furthest back that
+                `get(name, bars_ago)` is guaranteed to reach. 
+                Defaults to 1,000.
+            overlap (int, optional): The number of bars before each chunk that
+                are passed to `on_update` along with it, so that rolling 
+                calculations are correct at the start of the chunk.
+                Defaults to `lookback`.
+            options_model (OptionsModelType, optional): The options model to
+                use. Defaults to OptionsModelType.BLACK_SCHOLES.
+            historical_options_path (str, optional): The path to the historical
+                options data, if using `OptionsModelType.HISTORICAL_DATA`. 
+                Defaults to None.
+        """
+        Data.__init__(self, contract)
+        self.file_path = file_path
+        self.chunksize = chunksize
+        self.lookback = lookback
+        self.overlap = lookback if overlap is None else overlap
+        self._open_file()
+        self.set_time(self._df.index[0])
+        self._set_options_model(options_model, historical_options_path)
+        
+        
+    def initialize(self, on_update = None):
+        # Start reading from the beginning again, so that on_update is applied
+        # to every chunk, then read forward to the current time.
+        Data.initialize(self, on_update)
+        time_now = self.time_now
+        self._open_file()
+        self.set_time(time_now if time_now is not None else self._df.index[0])
+        
+    
+    def set_time(self, time_now: datetime):
+        # Read chunks until the current time is within the data in memory
+        t = pd.Timestamp(time_now).value
+        while not self._is_exhausted and (len(self._times) == 0 or t > self._times[-1]):
+            self._read_next_chunk()
+        super().set_time(time_now)
+        
+        
+    def get(self, name: str, bars_ago: int = 0) -> any:
+        if bars_ago > self._pos:
+            raise IndexError(f"{bars_ago} bars ago is further back than the "
+                             f"{self._pos} bars kept in memory.")
+        return super().get(name, bars_ago)
+    
+    
+    def iter_index_chunks(self):
+        """
+        Iterate over the times of the rows in the file, a chunk at a time,
+        starting with the chunk in memory.  Rather than reading the file a
+        second time, each further chunk is read ahead and kept until the 
+        clock reaches it, so at most one extra chunk is held in memory.
 
+        The times are those of the file's rows, so rows that `on_update` adds
+        do not become ticks (and rows it removes still do).
 
+        Yields:
+            pd.DatetimeIndex: The next chunk of the index.
+        """
+        if self._raw_index is not None:
+            yield self._raw_index
+        while True:
+            raw = self._read_raw_chunk()
+            if raw is None:
+                return
+            self._read_ahead.append(raw)
+            yield raw.index
+    
+    
+    def _open_file(self):
+        self._reader = pd.read_csv(self.file_path, dtype=self.CSV_DTYPES, 
+                                   chunksize=self.chunksize)
+        self._is_exhausted = False
+        self._raw_tail: pd.DataFrame = None
+        
+        # Chunks read ahead by iter_index_chunks, the last time read from the
+        # file, and the times of the chunk most recently loaded into memory
+        self._read_ahead: deque[pd.DataFrame] = deque()
+        self._last_raw_time: pd.Timestamp = None
+        self._raw_index: pd.DatetimeIndex = None
+        self._df = pd.DataFrame(index=pd.DatetimeIndex([]))
+        self.time_now = None
+        self._build_columns()
+        
+        # Read up to the first bar
+        while not self._is_exhausted and len(self._df) == 0:
+            self._read_next_chunk()
+        if len(self._df) == 0:
+            raise ValueError(f"No data in {self.file_path}.")
+    
+    
+    def _read_next_chunk(self):
+        raw = self._read_ahead.popleft() if self._read_ahead else self._read_raw_chunk()
+        if raw is None:
+            self._is_exhausted = True
+            return
+        self._raw_index = raw.index
+        
+        # Interpolate and run on_update over the new chunk along with the end
+        # of the previous one, then keep only the new chunk's rows.
+        window = raw if self._raw_tail is None else pd.concat([self._raw_tail, raw])
+        window["iv"] = window["iv"].interpolate(method="linear")
+        self._raw_tail = window.iloc[-self.overlap:] if self.overlap > 0 else window.iloc[:0]
+        
+        if self.on_update:
+            window = self.on_update(self.contract.symbol, window.copy())
+        new_rows = window[window.index >= raw.index[0]]
+        
+        # Keep the lookback bars, then rebuild the column arrays, restoring 
+        # the cursor to where it was.
+        kept = self._df.iloc[max(len(self._df) - self.lookback, 0):] if self.lookback > 0 else self._df.iloc[:0]
+        self._df = pd.concat([kept, new_rows]) if len(kept) > 0 else new_rows
+        self._build_columns()
+        if self.time_now is not None:
+            DataFile.set_time(self, self.time_now)
+            
+            
+    def _read_raw_chunk(self) -> pd.DataFrame:
+        # Read the next non-empty chunk of the file (or None at the end), 
+        # without duplicates, including any that span the chunk boundary
+        for raw in self._reader:
+            raw = self._parse_dates(raw)
+            raw = raw[~raw.index.duplicated(keep='first')]
+            if self._last_raw_time is not None:
+                raw = raw[raw.index > self._last_raw_time]
+            if len(raw) > 0:
+                self._last_raw_time = raw.index[-1]
+                return raw
+        return None
+            
+            
 class HistoricalOptionsData:
 
     def has_quote_data(self, quote_time: datetime, exp_date: date, strike: float, right: str) -> bool:
@@ -79,6 +447,15 @@ class HistoricalOptionsData:
     
     def get_price_timeseries_for_option(self, exp_date: datetime, strike: float, right: str) -> pd.DataFrame:
         pass
+    
+    
+    def prefetch(self, exp_date: date, strike: float) -> None:
+        """
+        Hint that quotes for options near the given expiration and strike are
+        about to be requested.  Backends that cache may load them ahead of 
+        time; by default this does nothing.
+        """
+        pass
 
 
 class HistoricalOptionsDataParquet(HistoricalOptionsData):
@@ -113,71 +490,499 @@ class HistoricalOptionsDataParquet(HistoricalOptionsData):
         
 class HistoricalOptionsDataSql:
     
-    def __init__(self, db_path: str):
-        self._conn = sqlite3.connect(db_path)
+    _PRICE_COLUMNS = ["QUOTE_UNIXTIME", "EXPIRE_UNIX", "STRIKE", 
+                      "C_LAST", "C_VOLUME", "P_LAST", "P_VOLUME"]
+    
+    # Indexes needed to serve each query without scanning the quotes table, 
+    # as (name, columns).
+    _INDEXES = [
+        ("idx_quotes_contract", ["EXPIRE_UNIX", "STRIKE", "QUOTE_UNIXTIME"]),
+        ("idx_quotes_quote_time", ["QUOTE_UNIXTIME", "EXPIRE_UNIX"]),
+    ]
+    
+    def __init__(self, db_path: str, cache_max_bytes: int = 256 * 2**20,
+                 prefetch_strike_range: float = 50, prefetch_days: int = 1,
+                 create_indexes: bool = False, mmap_size: int = 2**30,
+                 cache_size_kib: int = 64 * 2**10):
+        """
+        Initialize a `HistoricalOptionsDataSql`.  Unless `create_indexes` is 
+        set, the database is opened read-only.
+
+        Args:
+            db_path (str): The path to the sqlite database of quotes.
+            cache_max_bytes (int, optional): The maximum size of the cache of
+                per-contract price timeseries. Defaults to 256 MiB.
+            prefetch_strike_range (float, optional): When prefetching, load 
+                all strikes within this distance of the requested strike. 
+                Defaults to 50.
+            prefetch_days (int, optional): When prefetching, load all 
+                expirations within this many days of the requested expiration.
+                Defaults to 1.
+            create_indexes (bool, optional): Create any missing indexes on the
+                quotes table.  This writes to the database file, and can take
+                a long time on large tables. Defaults to False.
+            mmap_size (int, optional): The maximum number of bytes of the 
+                database that sqlite may memory-map. Defaults to 1 GiB.
+            cache_size_kib (int, optional): The size of sqlite's page cache, 
+                in KiB. Defaults to 64 MiB.
+        """
+        if create_indexes:
+            self._conn = sqlite3.connect(db_path, cached_statements=256)
+        else:
+            uri = pathlib.Path(db_path).resolve().as_uri() + "?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, cached_statements=256)
         self._cursor = self._conn.cursor()
         
-        self._price_data_cache = {}
+        self._cursor.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+        self._cursor.execute(f"PRAGMA cache_size = {-int(cache_size_kib)}")
+        self._cursor.execute("PRAGMA temp_store = MEMORY")
+        self._ensure_indexes(create_indexes)
+        if not create_indexes:
+            self._cursor.execute("PRAGMA query_only = ON")
+        
+        self.prefetch_strike_range = prefetch_strike_range
+        self.prefetch_days = prefetch_days
+        
+        # Price timeseries for each contract, keyed by (EXPIRE_UNIX, STRIKE)
+        # and holding both the call and put columns.
+        self._price_data_cache = LRUCache(
+            cache_max_bytes, 
+            lambda df: int(df.memory_usage(index=True).sum()))
         
     
     def has_quote_data(self, quote_time: datetime, exp_date: date, strike: float, right: str) -> bool:
         quote_unix = int(quote_time.timestamp())
+        expire_time_unix = _get_expire_unix(exp_date)
         
-        if (exp_date, strike, right) in self._price_data_cache.keys():
-            return quote_unix in self._price_data_cache[(exp_date, strike, right)].index
-        else: 
-            exp_dt = datetime.combine(exp_date, time(16, 0, 0)) # Assuming 4 PM is the expiration time
-            expire_time_unix = int(exp_dt.timestamp())
-            query = f"""
-                SELECT COUNT(*) FROM quotes
-                WHERE 
-                    QUOTE_UNIXTIME == {quote_unix}
-                    AND EXPIRE_UNIX == {expire_time_unix}
-                    AND STRIKE == {strike}
-            """
-            self._cursor.execute(query)
-            result = self._cursor.fetchone()
-            return result[0] > 0
+        # Load (and cache) the contract's whole timeseries, as a probe is
+        # usually followed by probes of later quotes and by price lookups
+        # of the same contract.
+        df = self._get_cached_price_timeseries(expire_time_unix, strike)
+        return quote_unix in df.index
                 
                 
     def get_options_chain_as_of(self, quote_time: datetime, days_ahead: int = 1) -> pd.DataFrame:
         quote_time_unix = int(quote_time.timestamp())
         quote_time_unix_end = int((quote_time + timedelta(days=days_ahead)).timestamp())
         
-        query = f"""
+        query = """
             SELECT * FROM quotes
             WHERE 
-                QUOTE_UNIXTIME == {quote_time_unix} 
-                AND EXPIRE_UNIX >= {quote_time_unix}
-                AND EXPIRE_UNIX <= {quote_time_unix_end}
+                QUOTE_UNIXTIME == ?
+                AND EXPIRE_UNIX >= ?
+                AND EXPIRE_UNIX <= ?
         """
-        return pd.read_sql_query(query, self._conn)
+        return pd.read_sql_query(query, self._conn, params=(
+            quote_time_unix, quote_time_unix, quote_time_unix_end))
     
     
     def get_price_timeseries_for_option(self, exp_date: date, strike: float, right: str) -> pd.DataFrame:
-        exp_dt = datetime.combine(exp_date, time(16, 0, 0)) # Assuming 4 PM is the expiration time
-        expire_time_unix = int(exp_dt.timestamp())
+        expire_time_unix = _get_expire_unix(exp_date)
     
         # NOTE: Added DISTINCT since data may contain duplicates
         cols = ["QUOTE_UNIXTIME", "EXPIRE_UNIX", "STRIKE", right + "_LAST", right + "_VOLUME"]
         query = f"""
             SELECT DISTINCT {','.join(cols)} FROM quotes
             WHERE 
-                EXPIRE_UNIX == {expire_time_unix}
-                AND STRIKE == {strike}
+                EXPIRE_UNIX == ?
+                AND STRIKE == ?
         """
-        return pd.read_sql_query(query, self._conn, index_col="QUOTE_UNIXTIME")
+        return pd.read_sql_query(query, self._conn, index_col="QUOTE_UNIXTIME",
+                                 params=(expire_time_unix, strike))
     
     
     def get_price_for_option(self, quote_time: datetime, exp_date: date, strike: float, right: str) -> float:
         quote_unix = int(quote_time.timestamp())
-        if (exp_date, strike, right) in self._price_data_cache.keys():
-            return self._price_data_cache[(exp_date, strike, right)].loc[quote_unix, right + "_LAST"]
-        
-        df = self.get_price_timeseries_for_option(exp_date, strike, right)
+        df = self._get_cached_price_timeseries(_get_expire_unix(exp_date), strike)
         if df.empty:
             raise ValueError(f"No data found for option with expiration date {exp_date}, strike {strike}, and right {right}.")
-        
-        self._price_data_cache[(exp_date, strike, right)] = df
         return df.loc[quote_unix, right + "_LAST"]
-    
\ No newline at end of file
+    
+    
+    def prefetch(self, exp_date: date, strike: float) -> None:
+        """
+        Load the price timeseries for every contract within 
+        `prefetch_strike_range` of `strike` and `prefetch_days` of `exp_date`
+        into the cache, using a single query.
+
+        Args:
+            exp_date (date): The expiration date to prefetch around.
+            strike (float): The strike price to prefetch around.
+        """
+        expire_time_unix = _get_expire_unix(exp_date)
+        expire_range = self.prefetch_days * 86400
+        query = f"""
+            SELECT DISTINCT {','.join(self._PRICE_COLUMNS)} FROM quotes
+            WHERE 
+                EXPIRE_UNIX >= ?
+                AND EXPIRE_UNIX <= ?
+                AND STRIKE >= ?
+                AND STRIKE <= ?
+        """
+        df = pd.read_sql_query(query, self._conn, params=(
+            expire_time_unix - expire_range, expire_time_unix + expire_range,
+            strike - self.prefetch_strike_range, strike + self.prefetch_strike_range))
+        for (expire_unix, strk), contract_df in df.groupby(["EXPIRE_UNIX", "STRIKE"]):
+            key = (int(expire_unix), float(strk))
+            if key not in self._price_data_cache:
+                self._price_data_cache.put(key, self._to_price_timeseries(contract_df))
+                
+                
+    def cache_stats(self) -> dict[str, int]:
+        """
+        Get the hit, miss and eviction counters of the price cache.
+
+        Returns:
+            dict[str, int]: See `LRUCache.stats`.
+        """
+        return self._price_data_cache.stats()
+    
+    
+    def _get_cached_price_timeseries(self, expire_time_unix: int, strike: float) -> pd.DataFrame:
+        key = (expire_time_unix, float(strike))
+        df = self._price_data_cache.get(key)
+        if df is None:
+            query = f"""
+                SELECT DISTINCT {','.join(self._PRICE_COLUMNS)} FROM quotes
+                WHERE 
+                    EXPIRE_UNIX == ?
+                    AND STRIKE == ?
+            """
+            df = self._to_price_timeseries(pd.read_sql_query(
+                query, self._conn, params=(expire_time_unix, strike)))
+            self._price_data_cache.put(key, df)
+        return df
+    
+    
+    def _ensure_indexes(self, create: bool):
+        """
+        Check that the quotes table has an index for each of the lookups made
+        by this class, creating any that are missing if `create` is set, and 
+        warning about them otherwise.
+        """
+        existing = []
+        self._cursor.execute("PRAGMA index_list(quotes)")
+        for index in self._cursor.fetchall():
+            self._cursor.execute(f"PRAGMA index_info('{index[1]}')")
+            existing.append([col[2] for col in sorted(self._cursor.fetchall())])
+        
+        for name, cols in self._INDEXES:
+            if any(idx[:len(cols)] == cols for idx in existing):
+                continue
+            if create:
+                print(f"Creating index {name} on quotes ({', '.join(cols)})...")
+                self._cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {name} ON quotes ({', '.join(cols)})")
+                self._conn.commit()
+            else:
+                print(f"WARNING: No index on quotes ({', '.join(cols)}); lookups "
+                      "will scan the whole table.  Pass create_indexes=True to "
+                      "create it.")
+    
+    
+    @staticmethod
+    def _to_price_timeseries(df: pd.DataFrame) -> pd.DataFrame:
+        df = df.set_index("QUOTE_UNIXTIME").sort_index()
+        return df[~df.index.duplicated(keep="first")]
+        
+
+class HistoricalOptionsDataColumnar(HistoricalOptionsData):
+    """
+    A read-only, columnar store of historical options quotes.  Each column is 
+    kept in its own NumPy `.npy` file, sorted by (QUOTE_UNIXTIME, EXPIRE_UNIX, 
+    STRIKE), and is memory-mapped when the store is opened, so startup does not
+    load the dataset into RAM.  Lookups are binary searches over small offset
+    tables rather than queries.
+
+    A store is created once from a parquet or sqlite source with 
+    `HistoricalOptionsDataColumnar.convert`, and is opened by passing its 
+    directory as the `historical_options_path` of a `DataFile`.
+    """
+    
+    FORMAT_VERSION = 1
+    INT_COLUMNS = ["QUOTE_UNIXTIME", "EXPIRE_UNIX"]
+    
+    def __init__(self, store_path: str):
+        self._path = pathlib.Path(store_path)
+        with open(self._path / "meta.json") as f:
+            meta = json.load(f)
+        if meta["version"] != self.FORMAT_VERSION:
+            raise ValueError(f"Unsupported historical options store version {meta['version']}.")
+        
+        self.columns: list[str] = meta["columns"]
+        self._cols = {c: self._load(c) for c in self.columns}
+        
+        # Offset table for quote-major lookups: rows for _quote_times[i] are
+        # _quote_offsets[i]:_quote_offsets[i+1]
+        self._quote_times = self._load("_quote_times")
+        self._quote_offsets = self._load("_quote_offsets")
+        
+        # Row order for contract-major lookups, sorted by 
+        # (EXPIRE_UNIX, STRIKE, QUOTE_UNIXTIME)
+        self._contract_rows = self._load("_contract_rows")
+        self._contract_expire = self._load("_contract_expire")
+        self._contract_strike = self._load("_contract_strike")
+        
+        
+    @classmethod
+    def convert(cls, source_path: str, store_path: str, 
+                chunksize: int = 1_000_000) -> "HistoricalOptionsDataColumnar":
+        """
+        Convert a parquet (`.parquet`) or sqlite (`.db`) historical options 
+        data source into a columnar store.  Only numeric columns are kept.  
+        Rows with a duplicate (QUOTE_UNIXTIME, EXPIRE_UNIX, STRIKE) key are 
+        dropped, keeping the first.
+
+        Sqlite sources are streamed in sorted chunks, so the source never has 
+        to fit in memory.  Parquet sources are loaded and sorted in memory.
+
+        Args:
+            source_path (str): The path to the parquet or sqlite source.
+            store_path (str): The directory to write the store to.
+            chunksize (int, optional): The number of rows to read from a sqlite
+                source at a time. Defaults to 1,000,000.
+
+        Returns:
+            HistoricalOptionsDataColumnar: The newly created store.
+        """
+        path = pathlib.Path(store_path)
+        path.mkdir(parents=True, exist_ok=True)
+        
+        ftype = pathlib.Path(source_path).suffix
+        # The columns kept are decided once, from the whole source's types,
+        # rather than per chunk, since a column that is all NULL in a chunk
+        # of a sqlite source is read as an object column.
+        if ftype == ".parquet":
+            df = dd.read_parquet(source_path).compute()
+            columns = cls._get_store_columns(df.select_dtypes(include="number").columns)
+            df = cls._normalize_chunk(df, columns).sort_values(
+                ["QUOTE_UNIXTIME", "EXPIRE_UNIX", "STRIKE"], kind="stable")
+            n_rows = len(df)
+            chunks = (df.iloc[i:i + chunksize] for i in range(0, n_rows, chunksize))
+        elif ftype == ".db":
+            conn = sqlite3.connect(source_path)
+            n_rows = conn.execute("SELECT COUNT(*) FROM quotes").fetchone()[0]
+            columns = cls._get_store_columns(
+                name for _, name, decl_type, *_ in conn.execute("PRAGMA table_info(quotes)")
+                if _has_numeric_affinity(decl_type))
+            chunks = (cls._normalize_chunk(c, columns) for c in pd.read_sql_query(
+                "SELECT * FROM quotes ORDER BY QUOTE_UNIXTIME, EXPIRE_UNIX, STRIKE",
+                conn, chunksize=chunksize))
+        else:
+            raise ValueError("Unsupported file type for historical options data.")
+        
+        cls._write_columns(path, chunks, columns, n_rows)
+        cls._write_indexes(path, columns)
+        
+        with open(path / "meta.json", "w") as f:
+            json.dump({"version": cls.FORMAT_VERSION, "columns": columns}, f)
+        
+        return cls(store_path)
+    
+    
+    def has_quote_data(self, quote_time: datetime, exp_date: date, strike: float, right: str) -> bool:
+        return self._find_row(int(quote_time.timestamp()), 
+                              _get_expire_unix(exp_date), strike) >= 0
+    
+    
+    def get_options_chain_as_of(self, quote_time: datetime, days_ahead: int = 1) -> pd.DataFrame:
+        quote_time_unix = int(quote_time.timestamp())
+        quote_time_unix_end = int((quote_time + timedelta(days=days_ahead)).timestamp())
+        
+        start, end = self._quote_slice(quote_time_unix)
+        expire = self._cols["EXPIRE_UNIX"][start:end]
+        lo = start + int(np.searchsorted(expire, quote_time_unix, side="left"))
+        hi = start + int(np.searchsorted(expire, quote_time_unix_end, side="right"))
+        return pd.DataFrame({c: np.array(self._cols[c][lo:hi]) for c in self.columns})
+    
+    
+    def get_price_timeseries_for_option(self, exp_date: date, strike: float, right: str) -> pd.DataFrame:
+        expire_time_unix = _get_expire_unix(exp_date)
+        lo = int(np.searchsorted(self._contract_expire, expire_time_unix, side="left"))
+        hi = int(np.searchsorted(self._contract_expire, expire_time_unix, side="right"))
+        strikes = self._contract_strike[lo:hi]
+        rows = self._contract_rows[lo + int(np.searchsorted(strikes, strike, side="left")):
+                                   lo + int(np.searchsorted(strikes, strike, side="right"))]
+        
+        right = right[0]
+        cols = ["QUOTE_UNIXTIME", "EXPIRE_UNIX", "STRIKE", right + "_LAST", right + "_VOLUME"]
+        df = pd.DataFrame({c: self._cols[c][rows] for c in cols if c in self._cols})
+        return df.set_index("QUOTE_UNIXTIME")
+    
+    
+    def get_price_for_option(self, quote_time: datetime, exp_date: date, strike: float, right: str) -> float:
+        row = self._find_row(int(quote_time.timestamp()), 
+                             _get_expire_unix(exp_date), strike)
+        if row < 0:
+            raise ValueError(f"No data found for option with expiration date {exp_date}, strike {strike}, and right {right} at {quote_time}.")
+        return float(self._cols[right[0] + "_LAST"][row])
+    
+    
+    def _quote_slice(self, quote_unix: int) -> tuple[int, int]:
+        i = int(np.searchsorted(self._quote_times, quote_unix))
+        if i == len(self._quote_times) or self._quote_times[i] != quote_unix:
+            return 0, 0
+        return int(self._quote_offsets[i]), int(self._quote_offsets[i + 1])
+    
+    
+    def _find_row(self, quote_unix: int, expire_unix: int, strike: float) -> int:
+        start, end = self._quote_slice(quote_unix)
+        expire = self._cols["EXPIRE_UNIX"][start:end]
+        lo = start + int(np.searchsorted(expire, expire_unix, side="left"))
+        hi = start + int(np.searchsorted(expire, expire_unix, side="right"))
+        strikes = self._cols["STRIKE"][lo:hi]
+        j = int(np.searchsorted(strikes, strike))
+        if j < len(strikes) and strikes[j] == strike:
+            return lo + j
+        return -1
+    
+    
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(self._path / f"{name}.npy", mmap_mode="r")
+    
+    
+    @staticmethod
+    def _get_store_columns(numeric_columns) -> list[str]:
+        # The numeric columns of the source, plus EXPIRE_UNIX, which is 
+        # computed from EXPIRE_DATE if the source doesn't have it
+        columns = list(numeric_columns)
+        if "EXPIRE_UNIX" not in columns:
+            columns.append("EXPIRE_UNIX")
+        return columns
+    
+    
+    @classmethod
+    def _normalize_chunk(cls, df: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+        if "EXPIRE_UNIX" not in df.columns:
+            expire = pd.to_datetime(df["EXPIRE_DATE"])
+            expire_unix = {d: _get_expire_unix(d.date()) for d in expire.unique()}
+            df = df.assign(EXPIRE_UNIX=expire.map(expire_unix))
+        
+        # Columns that are all NULL (read as objects) become NaN
+        df = df.reindex(columns=columns)
+        return df.astype({c: np.int64 if c in cls.INT_COLUMNS else np.float64 
+                          for c in columns})
+    
+    
+    @classmethod
+    def _write_columns(cls, path: pathlib.Path, chunks, columns: list[str], 
+                       n_rows: int) -> None:
+        keys = ["QUOTE_UNIXTIME", "EXPIRE_UNIX", "STRIKE"]
+        arrays = {c: np.lib.format.open_memmap(
+            path / f"{c}.npy", mode="w+", 
+            dtype=np.int64 if c in cls.INT_COLUMNS else np.float64, 
+            shape=(n_rows,)) for c in columns}
+        keep = np.ones(n_rows, dtype=bool)
+        last_key = None
+        row = 0
+        for chunk in chunks:
+            n = len(chunk)
+            for c in columns:
+                arrays[c][row:row + n] = chunk[c].to_numpy()
+            
+            # The data is sorted, so duplicate keys are always adjacent 
+            # (possibly across a chunk boundary).
+            key = chunk[keys].to_numpy()
+            dup = np.zeros(n, dtype=bool)
+            dup[1:] = (key[1:] == key[:-1]).all(axis=1)
+            if last_key is not None and n > 0:
+                dup[0] = (key[0] == last_key).all()
+            keep[row:row + n] = ~dup
+            if n > 0:
+                last_key = key[-1]
+            row += n
+        
+        if n_rows == 0:
+            raise ValueError("Historical options data source is empty.")
+        
+        for c in columns:
+            arrays[c].flush()
+            if not keep.all():
+                deduped = arrays[c][keep]
+                del arrays[c]
+                np.save(path / f"{c}.npy", deduped)
+    
+    
+    @classmethod
+    def _write_indexes(cls, path: pathlib.Path, columns: list[str]):
+        quote = np.load(path / "QUOTE_UNIXTIME.npy", mmap_mode="r")
+        expire = np.load(path / "EXPIRE_UNIX.npy", mmap_mode="r")
+        strike = np.load(path / "STRIKE.npy", mmap_mode="r")
+        
+        # Rows are sorted by quote time, so each quote time starts wherever
+        # the quote time changes.
+        is_start = np.ones(len(quote), dtype=bool)
+        is_start[1:] = quote[1:] != quote[:-1]
+        quote_starts = np.flatnonzero(is_start)
+        np.save(path / "_quote_times.npy", quote[quote_starts])
+        np.save(path / "_quote_offsets.npy", 
+                np.append(quote_starts, len(quote)).astype(np.int64))
+        
+        contract_rows = np.lexsort((quote, strike, expire))
+        np.save(path / "_contract_rows.npy", contract_rows)
+        np.save(path / "_contract_expire.npy", expire[contract_rows])
+        np.save(path / "_contract_strike.npy", strike[contract_rows])
+        
+        
+def _write_df_columns(df: pd.DataFrame, dir_path: str) -> None:
+    """
+    Write a DataFrame to a directory with one NumPy `.npy` file per column 
+    (and one for the index), so that it can be memory-mapped by 
+    `_read_df_columns`.
+    """
+    path = pathlib.Path(dir_path)
+    path.mkdir(parents=True, exist_ok=True)
+    columns = []
+    for i, (name, col) in enumerate(df.items()):
+        values = col.to_numpy()
+        np.save(path / f"{i}.npy", values, allow_pickle=values.dtype.kind == "O")
+        columns.append(str(name))
+    np.save(path / "index.npy", df.index.to_numpy())
+    with open(path / "columns.json", "w") as f:
+        json.dump({"columns": columns, "index_name": df.index.name}, f)
+        
+        
+def _read_df_columns(dir_path: str) -> pd.DataFrame:
+    """
+    Read a DataFrame written by `_write_df_columns`.  Numeric columns are
+    memory-mapped (read-only) rather than loaded into memory.
+    """
+    path = pathlib.Path(dir_path)
+    with open(path / "columns.json") as f:
+        meta = json.load(f)
+    
+    data = {}
+    for i, name in enumerate(meta["columns"]):
+        try:
+            data[name] = np.asarray(np.load(path / f"{i}.npy", mmap_mode="r"))
+        except ValueError:
+            # Object columns can't be memory-mapped
+            data[name] = np.load(path / f"{i}.npy", allow_pickle=True)
+    index = pd.DatetimeIndex(np.asarray(np.load(path / "index.npy", mmap_mode="r")), 
+                             name=meta["index_name"])
+    return pd.DataFrame(data, index=index, copy=False)
+
+
+def _has_numeric_affinity(decl_type: str) -> bool:
+    # Whether sqlite gives a column of a declared type INTEGER, REAL or 
+    # NUMERIC affinity (see https://www.sqlite.org/datatype3.html)
+    decl_type = (decl_type or "").upper()
+    return not any(t in decl_type for t in ["CHAR", "CLOB", "TEXT", "BLOB"]) \
+        and decl_type != ""
+
+
+def _sort_by_time(df: pd.DataFrame) -> pd.DataFrame:
+    # set_time binary searches the index, so it must be sorted.  (With 
+    # duplicate times, the last of them is the one found.)
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index(kind="stable")
+    return df
+
+
+def _is_read_only(df: pd.DataFrame) -> bool:
+    return any(not col.to_numpy().flags.writeable for _, col in df.items())
+
+
+def _get_expire_unix(exp_date: date) -> int:
+    # Assuming 4 PM is the expiration time
+    return int(datetime.combine(exp_date, time(16, 0, 0)).timestamp())
@@ -1,8 +1,24 @@
+import asyncio
+import math
+import numpy as np
 import pandas as pd
 
-from ib_async import BarDataList, IB, Contract, RealTimeBar, util
+from datetime import datetime, timedelta, timezone
+from ib_async import BarData, BarDataList, IB, Contract, RealTimeBar
+from time import perf_counter
+from zoneinfo import ZoneInfo
 
 from ..data import Data
+from .bar_cache import BarCache
+from ..utils.pacing import HistoricalDataPacer
+from ..utils.ring_buffer import RingBuffer
+from ..utils.telemetry import MetricsSink
+
+
+# TODO: May want to customize which timezone we convert to
+_LOCAL_TZ = ZoneInfo("US/Eastern")
+_EPOCH = datetime(1970, 1, 1)
+_OHLCV = ["open", "high", "low", "close", "volume"]
 
 
 class DataStream(Data):
@@ -11,80 +27,337 @@ class DataStream(Data):
                  contract: Contract, 
                  bar_size_s: int, 
                  what_to_show: str = "TRADES", 
-                 days_back: int = 1):
+                 days_back: int = 1,
+                 on_update_new_rows_only: bool = False,
+                 max_bars: int = None,
+                 bar_cache: BarCache = None,
+                 bar_cache_flush_s: float = 60):
+        """
+        Initialize a `DataStream`.
+
+        Args:
+            contract (Contract): The contract to stream bars for.
+            bar_size_s (int): The size of each bar, in seconds.  Five second
+                bars from IB are aggregated into bars of this size.
+            what_to_show (str, optional): The type of data to request.
+                Defaults to "TRADES".
+            days_back (int, optional): The number of days of history to load
+                when the stream is initialized. Defaults to 1.
+            on_update_new_rows_only (bool, optional): If set, the user's
+                `on_update` is called with only the bars that were added or
+                changed by an update, rather than with all history.  It must
+                then return a DataFrame with the same rows, which replace 
+                those rows of the data. Otherwise, the DataFrame it returns 
+                becomes the data. Defaults to False.
+            max_bars (int, optional): The maximum number of bars of history
+                to keep.  Defaults to enough for `days_back` days.
+            bar_cache (BarCache, optional): A local cache of the bars 
+                received.  If given, the stream starts from the cached history
+                and only requests the bars since the last cached one from IB,
+                and new bars are added to the cache as they arrive.
+                Defaults to None.
+            bar_cache_flush_s (float, optional): How often new bars are 
+                written to the cache, in seconds. Defaults to 60.
+        """
         super().__init__(contract)
         self.bar_size_s = bar_size_s 
         self.what_to_show = what_to_show
         self.days_back = days_back
+        self.on_update_new_rows_only = on_update_new_rows_only
         
         self.ib: IB = None
         self._five_sec_bars: BarDataList = None
         self.is_first_update = True
         
+        # Where to report how long each update takes (set by the engine)
+        self.metrics_sink: MetricsSink = None
+        
+        # Aggregated bars, and the number of five second bars folded into them
+        max_bars = max_bars or (days_back * 86400) // bar_size_s + 1
+        self._bars = RingBuffer(max_bars, {name: np.float64 for name in _OHLCV})
         
-    async def initialize(self, ib: IB, on_update: callable = None) -> None:
+        # The data returned by the user's on_update, which is the aggregated
+        # bars themselves if there is no on_update.  The bars are kept apart
+        # so that on_update always receives them unmodified.
+        self._data = self._bars
+        self._num_folded = 0
+        self._bar_size_ns = bar_size_s * 10**9
+        
+        # Bars folded in that the user's on_update has not seen yet
+        self._num_unprocessed = 0
+        
+        # The cache of five second bars, the time of the last cached bar when
+        # the stream started (earlier bars from IB are already folded in), 
+        # and the bars received since the cache was last written to
+        self.bar_cache = bar_cache
+        self.bar_cache_flush_s = bar_cache_flush_s
+        self._cached_through: datetime = None
+        self._unsaved_bars: list[BarData] = []
+        self._flush_task: asyncio.Task = None
+
+
+    async def initialize(self, ib: IB, on_update: callable = None, 
+                         qualify: bool = True, 
+                         pacer: HistoricalDataPacer = None) -> None:
+        """
+        Load the stream's history and subscribe to its updates.
+
+        Args:
+            ib (IB): The connection to IB.
+            on_update (callable, optional): See `Data.initialize`.
+            qualify (bool, optional): Whether to qualify the contract first. 
+                An engine starting many streams qualifies all of their 
+                contracts in one request instead. Defaults to True.
+            pacer (HistoricalDataPacer, optional): Paces the history request
+                when many streams are started at once. Defaults to None.
+        """
         super().initialize(on_update)
+        if self.on_update:
+            self._data = RingBuffer(self._bars.capacity, {})
         
         self.ib = ib
-        await self.ib.qualifyContractsAsync(self.contract)
+        if qualify:
+            await self.ib.qualifyContractsAsync(self.contract)
         print(f"Initializing data stream for {self.contract.symbol}")
 
-        self._five_sec_bars = await self.ib.reqHistoricalDataAsync(
-            self.contract, endDateTime="", durationStr=f"{self.days_back} D",
+        duration = f"{self.days_back} D"
+        if self.bar_cache is not None:
+            duration = self._load_cached_bars()
+
+        if pacer is None:
+            self._five_sec_bars = await self._request_history(duration)
+        else:
+            async with pacer:
+                self._five_sec_bars = await self._request_history(duration)
+        self._five_sec_bars.updateEvent += self._on_update
+        
+        if self.bar_cache is not None:
+            self._flush_task = asyncio.create_task(self._flush_bar_cache_periodically())
+        
+        
+    def flush_bar_cache(self) -> None:
+        """Write the bars received since the last flush to the bar cache."""
+        if self.bar_cache is None or not self._unsaved_bars:
+            return
+        bars, self._unsaved_bars = self._unsaved_bars, []
+        self.bar_cache.append(self._get_bar_cache_key(), bars)
+        
+        
+    async def _request_history(self, duration: str) -> BarDataList:
+        return await self.ib.reqHistoricalDataAsync(
+            self.contract, endDateTime="", durationStr=duration,
             barSizeSetting="5 secs", whatToShow=self.what_to_show, useRTH=False, 
             keepUpToDate=True)        
-        self._five_sec_bars.updateEvent += self._on_update
+        
+        
+    def _load_cached_bars(self) -> str:
+        # Fold in the cached bars from the last days_back days, and return 
+        # the duration of history still needed from IB to fill the gap since
+        # the last of them.
+        key = self._get_bar_cache_key()
+        now = datetime.now(timezone.utc)
+        since = now - timedelta(days=self.days_back)
+        self.bar_cache.prune(key, since)
+        cached = self.bar_cache.load(key, since)
+        if not cached:
+            return f"{self.days_back} D"
+        
+        self._fold_bars(cached)
+        self._num_unprocessed = len(self._bars)
+        self._cached_through = cached[-1].date
+        self.time_now = pd.Timestamp(self._bars.last_time())
+        print(f"Loaded {len(cached)} cached bars for {self.contract.symbol}")
+        
+        # IB allows durations in seconds of up to a day (with a margin so the
+        # gap is fully covered)
+        gap_s = (now - self._cached_through).total_seconds() + 60
+        if gap_s <= 86400:
+            return f"{int(gap_s)} S"
+        return f"{min(math.ceil(gap_s / 86400), self.days_back)} D"
+    
+    
+    def _get_bar_cache_key(self) -> str:
+        contract_id = self.contract.conId or self.contract.localSymbol \
+            or self.contract.symbol
+        return f"{contract_id}:{self.contract.secType}:{self.what_to_show}"
+    
+    
+    async def _flush_bar_cache_periodically(self):
+        while True:
+            await asyncio.sleep(self.bar_cache_flush_s)
+            if not self._unsaved_bars:
+                continue
+            bars, self._unsaved_bars = self._unsaved_bars, []
+            try:
+                await asyncio.to_thread(self.bar_cache.append, 
+                                        self._get_bar_cache_key(), bars)
+            except Exception as e:
+                print(f"WARNING: Could not write bars to the cache: {e}")
         
                 
     async def _on_update(self, bars: list[RealTimeBar], has_new: bool):
+        start = perf_counter()
+        try:
+            await self._handle_update(bars, has_new)
+        finally:
+            if self.metrics_sink is not None:
+                self.metrics_sink.observe("stream_update_seconds", 
+                                          perf_counter() - start,
+                                          {"stream": self.contract.symbol})
+            
+            
+    async def _handle_update(self, bars: list[RealTimeBar], has_new: bool):
         if len(bars) < 1:
             print("WARNING: Data updated but no bars were provided.")
             return
         
         if has_new:
             
-            # Convert RealTimeBar list to dataframe
-            bars_df = util.df(
-                bars, 
-                labels=('date', 'open', 'high', 'low', 'close', 'volume')
-            )
+            # Fold only the five second bars that have completed since the
+            # last update into the aggregated bars, rather than resampling all
+            # of the history again.  The last bar is still being updated, so
+            # it will be folded in on the next update.
+            new_bars = bars[self._num_folded:len(bars) - 1]
+            self._num_folded = len(bars) - 1
+            if self._cached_through is not None:
+                new_bars = self._drop_cached_bars(new_bars)
+            if self.bar_cache is not None:
+                self._unsaved_bars.extend(new_bars)
             
-            # Dates from ibkr don't appear to account for DST
-            # This massages the date data to account for DST and then 
-            # converts the DataFrame index to a DatetimeIndex
-            # TODO: May want to customize which timezone we convert to
-            bars_df.index = pd.DatetimeIndex(
-                bars_df["date"].dt.tz_convert("US/Eastern"))
+            num_changed = self._fold_bars(new_bars)
+            if self._num_unprocessed:
+                num_changed = min(num_changed + self._num_unprocessed, len(self._bars))
+                self._num_unprocessed = 0
+            if num_changed == 0:
+                return
             
-            # Calculate the UTC offset for each timestamp
-            utc_offsets = bars_df.index.map(lambda ts: ts.utcoffset())
-
-            # Convert the index to UTC and remove the timezone
-            bars_df.index = bars_df.index.tz_convert('UTC').tz_localize(None)
-
-            # Add the previously calculated UTC offset back to the index
-            bars_df.index = bars_df.index + utc_offsets
-
-            # Drop the old date field
-            bars_df.drop('date', axis=1, inplace=True)
-        
-            # Resample the data to the requested time interval
-            bars_df = bars_df.resample(f"{self.bar_size_s}s").agg(
-                {
-                    'open':'first',
-                    'high':'max',
-                    'low':'min',
-                    'close':'last',
-                    'volume':'sum'
-                }).dropna(how='any')
-    
             # Do any user-specified processing here
             if self.on_update:
-               bars_df = self.on_update(self.contract.symbol, bars_df)
+                num_rows = num_changed if self.on_update_new_rows_only else None
+                bars_df = self._bars.as_df(last_n=num_rows).copy()
+                self._store_user_data(
+                    self.on_update(self.contract.symbol, bars_df), bars_df.index)
     
             # Update the data on the strategy, set current tick time
             # and call tick() function 
-            self._df = bars_df
-            self.time_now = self._df.iloc[-1].name
+            data = self._data if len(self._data) > 0 else self._bars
+            self.time_now = pd.Timestamp(data.last_time())
             
             self.is_first_update = False
+
+            
+    def get(self, name: str, bars_ago: int = 0) -> any:
+        bars_ago_now, is_exact = self._data.position_asof(pd.Timestamp(self.time_now).value)
+        if not is_exact:
+            return None
+        return self._data.get(name, bars_ago_now + bars_ago)
+    
+    
+    def get_last(self, name: str):
+        bars_ago_now, _ = self._data.position_asof(pd.Timestamp(self.time_now).value)
+        if bars_ago_now < 0:
+            raise KeyError(f"No data at or before {self.time_now}.")
+        return self._data.get(name, bars_ago_now)
+    
+    
+    def exists(self, time: datetime = None):
+        time = time or self.time_now
+        return self._data.position_asof(pd.Timestamp(time).value)[1]
+    
+    
+    def as_df(self) -> pd.DataFrame:
+        """
+        Get the stream's bars (as returned by `on_update`, if there is one) as
+        a DataFrame.  The DataFrame is a view of the stream's buffer, so it is
+        only valid until the next update.  Copy it to keep it for longer.
+        """
+        return self._data.as_df()
+
+
+    def _fold_bars(self, bars: list[BarData]) -> int:
+        """
+        Fold five second bars into the aggregated `bar_size_s` bars.  A bar
+        that falls in the same interval as the most recent aggregated bar is
+        merged into it, otherwise a new aggregated bar is started.
+
+        Args:
+            bars (list[BarData]): The five second bars, oldest first.
+
+        Returns:
+            int: The number of aggregated bars (counting back from the most
+            recent) that were added or changed.
+        """
+        num_appended = 0
+        merged_into_last = False
+        open_start = self._bars.last_time() if len(self._bars) > 0 else None
+        for bar in bars:
+            start = self._get_interval_start_ns(bar.date)
+            if start == open_start:
+                self._bars.set_last(
+                    high=max(self._bars.get_last("high"), bar.high),
+                    low=min(self._bars.get_last("low"), bar.low),
+                    close=bar.close,
+                    volume=self._bars.get_last("volume") + bar.volume)
+                merged_into_last = merged_into_last or num_appended == 0
+            else:
+                self._bars.append(start, open=bar.open, high=bar.high,
+                                  low=bar.low, close=bar.close,
+                                  volume=bar.volume)
+                open_start = start
+                num_appended += 1
+        return min(num_appended + merged_into_last, len(self._bars))
+
+
+    def _drop_cached_bars(self, bars: list[BarData]) -> list[BarData]:
+        # The history requested on startup overlaps the cached bars a little,
+        # so skip the bars that were already loaded from the cache.
+        for i, bar in enumerate(bars):
+            if bar.date.timestamp() > self._cached_through.timestamp():
+                self._cached_through = None
+                return bars[i:]
+        return []
+    
+    
+    def _get_interval_start_ns(self, date: datetime) -> int:
+        # Dates from ibkr don't appear to account for DST, so convert each to
+        # local (DST aware) time, and then drop the timezone.
+        local = date.astimezone(_LOCAL_TZ).replace(tzinfo=None)
+        ns = (local - _EPOCH) // timedelta(microseconds=1) * 1000
+        return ns - ns % self._bar_size_ns
+
+
+    def _store_user_data(self, df: pd.DataFrame, bars_index: pd.DatetimeIndex):
+        # Store the DataFrame returned by the user's on_update, which was 
+        # called with the bars at bars_index.  With on_update_new_rows_only, 
+        # it replaces those rows of the data, otherwise all of the data.
+        if self.on_update_new_rows_only:
+            if not df.index.equals(bars_index):
+                raise ValueError(
+                    f"on_update for {self.contract.symbol} must return the same "
+                    f"rows it was given when on_update_new_rows_only is set.")
+            self._data.drop_since(bars_index[0].value)
+        else:
+            self._data = RingBuffer(self._bars.capacity, {})
+            
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index(kind="stable")
+        columns = {}
+        for name, col in df.items():
+            dtype = _get_column_dtype(col)
+            if name not in self._data.columns:
+                self._data.add_column(name, dtype)
+            else:
+                # e.g. an integer column that needs NaN for earlier rows
+                dtype = np.promote_types(self._data.dtype(name), dtype)
+                if dtype != self._data.dtype(name):
+                    self._data.set_dtype(name, dtype)
+            columns[name] = col.to_numpy(dtype=dtype)
+        self._data.extend(pd.DatetimeIndex(df.index).asi8, columns)
+
+
+def _get_column_dtype(col: pd.Series) -> np.dtype:
+    # Numeric columns are stored as they are, and anything else (strings, 
+    # timestamps, nullable extension types, ...) as Python objects
+    if isinstance(col.dtype, np.dtype) and col.dtype.kind in "biuf":
+        return col.dtype
+    return np.dtype(object)
@@ -1,21 +1,91 @@
 import asyncio
+import numpy as np
+import os
+import pandas as pd
 
 from datetime import datetime, timedelta
-from time import time
+from enum import Enum
+from time import perf_counter_ns, time
 
 from ..brokers.backtest_broker import BacktestBroker
 from ..datas.data_file import DataFile
 from ..engine import Engine
 from ..strategy import Strategy
+from ..utils.column_recorder import ColumnRecorder
+from ..utils.profiler import Profiler, ProfileMode
+
+
+# The methods timed when profiling, in addition to the phases of each tick
+_PROFILED_BROKER_METHODS = ["_handle_contract_expiry", "_handle_open_trades", 
+                            "_can_execute_trade", "_execute_trade",
+                            "_get_trade_cash_effect", 
+                            "_get_black_scholes_option_price",
+                            "_get_historical_options_data_price",
+                            "mark_to_market"]
+_PROFILED_DATA_METHODS = ["get", "get_last", "exists"]
+_PROFILED_OPTIONS_DATA_METHODS = ["has_quote_data", "get_price_for_option",
+                                  "get_options_chain_as_of",
+                                  "get_price_timeseries_for_option"]
+
+
+# The columns of the equity curve, recorded once per tick.  Exposure is the
+# sum of the absolute market values of the open positions.
+EQUITY_CURVE_COLUMNS = ["cash", "market_value", "equity", "realized_pnl",
+                        "unrealized_pnl", "exposure"]
+
+
+class ClockType(Enum):
+    FIXED_STEP = 1
+    DATA_INDEX = 2
 
 
 class BacktestEngine(Engine):
     
     def __init__(self, strategy: Strategy, datas: dict[str, DataFile], 
                  time_step: timedelta, start_time: datetime, end_time: datetime,
-                 start_cash: float = 10000):
+                 start_cash: float = 10000, 
+                 clock_type: ClockType = ClockType.FIXED_STEP,
+                 main_data: str = None,
+                 profile: ProfileMode = ProfileMode.NONE,
+                 profile_path: str = None):
+        """
+        Initialize a `BacktestEngine`.
+
+        Args:
+            strategy (Strategy): The `Strategy` to be backtested.
+            datas (dict[str, DataFile]): The datas available to the strategy,
+                keyed by data ID.
+            time_step (timedelta): The amount of time to advance the clock on
+                each tick when using `ClockType.FIXED_STEP`.  Ignored (and may
+                be `None`) when using `ClockType.DATA_INDEX`.
+            start_time (datetime): The time at which the backtest begins.
+            end_time (datetime): The time at which the backtest ends.
+            start_cash (float, optional): The starting account balance. 
+                Defaults to 10000.
+            clock_type (ClockType, optional): How the backtest clock advances.
+                `FIXED_STEP` ticks every `time_step` from `start_time` to 
+                `end_time`.  `DATA_INDEX` ticks only on timestamps for which
+                there is data.  Defaults to `ClockType.FIXED_STEP`.
+            main_data (str, optional): When using `ClockType.DATA_INDEX`, the 
+                ID of the data whose index drives the clock.  If not given, 
+                the union of the indexes of all datas is used.  
+                Defaults to None.
+            profile (ProfileMode, optional): Whether to profile the backtest.
+                Any mode other than `NONE` times each phase of every tick, and
+                the broker and data methods they call (see `profile_report`).
+                `CPROFILE` and `SAMPLING` also run `cProfile` or a sampling 
+                profiler over the main loop.  Defaults to `ProfileMode.NONE`.
+            profile_path (str, optional): Where to write the `cProfile` stats
+                or sampled stacks.  Defaults to None (kept in memory, see 
+                `profiler`).
+        """
         super().__init__(strategy, datas)
         
+        if clock_type == ClockType.FIXED_STEP and time_step is None:
+            raise ValueError("A time_step is required when using a fixed step clock.")
+        if main_data is not None and main_data not in datas:
+            raise ValueError(f"Main data '{main_data}' is not in the backtest datas.")
+        
         self.broker = BacktestBroker(datas, start_cash)
         self.strategy.broker = self.broker
         self.start_time = start_time
@@ -27,22 +97,45 @@ class BacktestEngine(Engine):
 
         # Set the current time for the backtest and the Strategy 
         self.time_step = time_step
+        self.clock_type = clock_type
+        self.main_data = main_data
         self.time_now: datetime = self.start_time
         self.strategy.time_now = self.time_now
+        
+        self.equity_curve = ColumnRecorder(
+            {name: np.float64 for name in EQUITY_CURVE_COLUMNS})
+        
+        self.profiler: Profiler = None
+        if profile != ProfileMode.NONE:
+            self.profiler = Profiler(profile, profile_path)
 
         
-    def run(self) -> tuple[list, list]:
+    def run(self) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Run the backtest to completion.  This is a thin, synchronous wrapper 
+        around `BacktestEngine.run_async()` that runs the entire backtest 
+        inside of a single event loop.
+
+        Returns:
+            tuple[pd.DataFrame, pd.DataFrame]: See `BacktestEngine.run_async()`.
+        """
+        return asyncio.run(self.run_async())
+    
+    
+    async def run_async(self) -> tuple[pd.DataFrame, pd.DataFrame]:
         """
-        The `Backtest.run()` method is the main loop of the backtest.  Each 
+        The `Backtest.run_async()` method is the main loop of the backtest.  Each 
         timepoint in `Backtest.data` is ticked through and passed to 
         `Backtest.strategy`, which can then make decisions based on that data.
         The `Backtest.account` is also updated each tick.
 
         Returns:
-            tuple[list, list]: The fist list in the tuple is time-series data
-            of the account state throughout the backtest.  The second is a list
-            of all trades made during the backtest.  These lists can be used
-            for post-processing and evaluating the efficay of a strategy.
+            tuple[pd.DataFrame, pd.DataFrame]: The first DataFrame in the tuple
+            is the equity curve, the state of the account at each tick (see 
+            `EQUITY_CURVE_COLUMNS`).  The second is the trade ledger, every 
+            fill made during the backtest (see `TRADE_LEDGER_COLUMNS`).  These
+            can be used for post-processing and evaluating the efficay of a 
+            strategy.
         """
         
         self.walltime_start = time()
@@ -55,13 +148,35 @@ class BacktestEngine(Engine):
         
         self.strategy.on_start()
         
-        # TODO: An alternative to incrementing timestep in this manner would be
-        # to use the datetime index from a "main" data-source.  This may yeild 
-        # performance enhancements since it would not run over dates for which 
-        # theres no actual data.
-        while self.time_now <= self.end_time:
+        if self.profiler is None:
+            await self._run_ticks()
+        else:
+            await self._run_profiled_ticks()
+
+        self.walltime_end = time()
+        self.run_walltime = self.walltime_end - self.walltime_start    
+        self.strategy.on_finish()
+        return self.get_equity_curve(), self.get_trades()
+    
+    
+    def profile_report(self) -> pd.DataFrame:
+        """
+        Get the time spent in each phase of the backtest, when it was run with
+        profiling enabled (see `Profiler.report`).  The top-level phases are
+        "clock", "set_time", "tick", "broker.update" and "record", and the
+        broker and data methods are reported under "broker.<method>" and
+        "<data ID>.<method>".
+        """
+        if self.profiler is None:
+            raise ValueError("The backtest was not run with profiling enabled.")
+        return self.profiler.report()
+    
+    
+    async def _run_ticks(self):
+        for time_now in self._get_clock():
 
             # Get the current state (time and stock quote data at that time).
+            self.time_now = time_now
             self.strategy.time_now = self.time_now
             
             # Set each data's perception of the current time
@@ -73,8 +188,10 @@ class BacktestEngine(Engine):
             self.broker.time_now = self.time_now
             
             # Engage the strategy, which will decide what actions to take on the 
-            # account given the current state.
-            asyncio.run(self.strategy.tick())
+            # account given the current state.  The tick is awaited in this
+            # event loop (rather than in a new loop per tick) so that any 
+            # broker coroutines it awaits run in the same loop as well.
+            await self.strategy.tick()
             
             # Perform an update on the account so it can effect any actions 
             # taken on it by the stategy.  The update will return lists of 
@@ -82,10 +199,162 @@ class BacktestEngine(Engine):
             # and passed to the strategy on the next tick.
             self.broker.update()
             
-            # Advance the current time
-            self.time_now += self.time_step
+            # Record the state of the account after this tick
+            self._record_account_state()
             
+            
+    async def _run_profiled_ticks(self):
+        # The same loop as _run_ticks, but timing each phase.  It is kept 
+        # separate so that the timers cost nothing when profiling is off.
+        profiler = self.profiler
+        add = profiler.add
+        profiler.instrument(self.broker, _PROFILED_BROKER_METHODS, "broker")
+        for data_id, data in self.datas.items():
+            profiler.instrument(data, _PROFILED_DATA_METHODS, data_id)
+            options_data = getattr(data, "_historical_options_data", None)
+            if options_data is not None:
+                profiler.instrument(options_data, _PROFILED_OPTIONS_DATA_METHODS,
+                                    f"{data_id}.options")
+        
+        profiler.start()
+        try:
+            clock = iter(self._get_clock())
+            while True:
+                t0 = perf_counter_ns()
+                time_now = next(clock, None)
+                if time_now is None:
+                    break
+                t1 = perf_counter_ns()
+                add("clock", t1 - t0)
+                
+                self.time_now = time_now
+                self.strategy.time_now = self.time_now
+                for _, data in self.datas.items():
+                    data.set_time(self.time_now)
+                self.broker.time_now = self.time_now
+                t2 = perf_counter_ns()
+                add("set_time", t2 - t1)
+                
+                await self.strategy.tick()
+                t3 = perf_counter_ns()
+                add("tick", t3 - t2)
+                
+                self.broker.update()
+                t4 = perf_counter_ns()
+                add("broker.update", t4 - t3)
+                
+                self._record_account_state()
+                add("record", perf_counter_ns() - t4)
+        finally:
+            profiler.stop()
+            profiler.restore()
+    
+    
+    def get_equity_curve(self) -> pd.DataFrame:
+        """
+        Get the state of the account at each tick so far, indexed by time.  
+        See `EQUITY_CURVE_COLUMNS` for the columns.
+        """
+        return self.equity_curve.as_df()
+    
+    
+    def get_trades(self) -> pd.DataFrame:
+        """
+        Get every fill made so far, indexed by time.  See 
+        `TRADE_LEDGER_COLUMNS` for the columns.
+        """
+        return self.broker.get_trade_ledger()
+    
+    
+    def save_results(self, dir_path: str) -> None:
+        """
+        Write the equity curve and trade ledger to `equity_curve.parquet` and
+        `trades.parquet` in a directory.
 
-        self.walltime_end = time()
-        self.run_walltime = self.walltime_end - self.walltime_start    
-        self.strategy.on_finish()
+        Args:
+            dir_path (str): The directory to write to.  It is created if it
+                does not exist.
+        """
+        os.makedirs(dir_path, exist_ok=True)
+        self.equity_curve.to_parquet(os.path.join(dir_path, "equity_curve.parquet"))
+        self.broker.trade_ledger.to_parquet(os.path.join(dir_path, "trades.parquet"))
+        
+        
+    def _record_account_state(self):
+        broker = self.broker
+        market_value, exposure = broker.mark_to_market()
+        
+        time_now = self.time_now
+        time_ns = time_now.value if isinstance(time_now, pd.Timestamp) \
+            else pd.Timestamp(time_now).value
+        cash = broker.cash_balance
+        pnl = broker.account_pnl
+        self.equity_curve.append_row(
+            time_ns, (cash, market_value, cash + market_value, 
+                      pnl.realizedPnL, pnl.unrealizedPnL, exposure))
+        
+        
+    def _get_clock(self):
+        """
+        Get the sequence of timestamps that the backtest will tick through,
+        according to `clock_type`.
+
+        Returns:
+            Iterable[datetime]: The timestamps, in ascending order.
+        """
+        match self.clock_type:
+            case ClockType.FIXED_STEP:
+                return self._get_fixed_step_clock()
+            case ClockType.DATA_INDEX:
+                return self._get_data_index_clock()
+            
+    
+    def _get_fixed_step_clock(self):
+        time_now = self.start_time
+        while time_now <= self.end_time:
+            yield time_now
+            time_now += self.time_step
+            
+    
+    def _get_data_index_clock(self):
+        # NOTE: This must be called after the datas have been initialized, 
+        # since the user's on_data_update may add or remove rows.
+        if self.main_data is not None:
+            datas = [self.datas[self.main_data]]
+        else:
+            datas = list(self.datas.values())
+        
+        # Merge the (sorted) index chunks of every data, a chunk at a time, so
+        # that no data's full index needs to be in memory at once.  Each round
+        # emits the timestamps up to the earliest end of the pending chunks,
+        # since no later chunk can contain anything before that.
+        start = pd.Timestamp(self.start_time)
+        end = pd.Timestamp(self.end_time)
+        iters = [data.iter_index_chunks() for data in datas]
+        pending = [self._next_index_chunk(it) for it in iters]
+        while any(chunk is not None for chunk in pending):
+            horizon = min(chunk[-1] for chunk in pending if chunk is not None)
+            
+            index = pd.DatetimeIndex([])
+            for i, chunk in enumerate(pending):
+                if chunk is None:
+                    continue
+                split = chunk.searchsorted(horizon, side="right")
+                index = index.union(chunk[:split])
+                pending[i] = chunk[split:] if split < len(chunk) else self._next_index_chunk(iters[i])
+            
+            # Slice the index down to the backtest time range
+            index = index[index.searchsorted(start, side="left"):
+                          index.searchsorted(end, side="right")]
+            yield from index
+            if horizon >= end:
+                return
+            
+            
+    @staticmethod
+    def _next_index_chunk(chunks) -> pd.DatetimeIndex:
+        # Get the next non-empty chunk from an index chunk iterator, or None
+        for chunk in chunks:
+            if len(chunk) > 0:
+                return chunk
+        return None
@@ -0,0 +1,210 @@
+import itertools
+import os
+import pandas as pd
+import tempfile
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from ..datas.data_file import (ChunkedDataFile, DataFile, _read_df_columns, 
+                               _write_df_columns)
+from ..strategy import Strategy
+from .backtest_engine import BacktestEngine, ClockType
+
+
+class BacktestSweep:
+    """
+    Run many backtests that differ only in their strategy parameters, spread
+    across a pool of processes.
+
+    The datas are read once, in the parent process, and written to a temporary
+    directory as memory-mapped columns.  Each worker maps those columns rather
+    than re-reading the source files, so the data is shared between workers
+    and not copied into each of them.  A `ChunkedDataFile` only holds part of
+    its file in memory, so its whole file is read for the sweep.
+    """
+
+    def __init__(self,
+                 strategy_factory: Callable[..., Strategy],
+                 param_grid: dict[str, list],
+                 datas: dict[str, DataFile],
+                 time_step: timedelta,
+                 start_time: datetime,
+                 end_time: datetime,
+                 start_cash: float = 10000,
+                 clock_type: ClockType = ClockType.FIXED_STEP,
+                 main_data: str = None,
+                 metrics: Callable[[BacktestEngine], dict[str, Any]] = None,
+                 max_workers: int = None):
+        """
+        Initialize a `BacktestSweep`.
+
+        Args:
+            strategy_factory (Callable[..., Strategy]): Called with one set of
+                parameters (as keyword arguments) to create the `Strategy` for
+                each backtest.  Since it is called in the worker processes, it
+                must be picklable (e.g. a module-level function or class).
+            param_grid (dict[str, list]): The values to try for each parameter.
+                A backtest is run for every combination of them.
+            datas (dict[str, DataFile]): The datas for the backtests, keyed by
+                data ID.
+            time_step (timedelta): See `BacktestEngine`.
+            start_time (datetime): See `BacktestEngine`.
+            end_time (datetime): See `BacktestEngine`.
+            start_cash (float, optional): See `BacktestEngine`.
+                Defaults to 10000.
+            clock_type (ClockType, optional): See `BacktestEngine`.
+                Defaults to ClockType.FIXED_STEP.
+            main_data (str, optional): See `BacktestEngine`. Defaults to None.
+            metrics (Callable[[BacktestEngine], dict[str, Any]], optional):
+                Called with each finished `BacktestEngine` to compute its
+                metrics.  Must be picklable. Defaults to `default_metrics`.
+            max_workers (int, optional): The number of worker processes.
+                Defaults to the number of CPUs.
+        """
+        self.strategy_factory = strategy_factory
+        self.param_grid = param_grid
+        self.datas = datas
+        self.engine_kwargs = {
+            "time_step": time_step,
+            "start_time": start_time,
+            "end_time": end_time,
+            "start_cash": start_cash,
+            "clock_type": clock_type,
+            "main_data": main_data,
+        }
+        self.metrics = metrics or default_metrics
+        self.max_workers = max_workers or os.cpu_count()
+
+
+    def get_param_sets(self) -> list[dict[str, Any]]:
+        """
+        Get every combination of the parameters in `param_grid`.
+
+        Returns:
+            list[dict[str, Any]]: One dict of keyword arguments per backtest.
+        """
+        names = list(self.param_grid.keys())
+        return [dict(zip(names, values))
+                for values in itertools.product(*self.param_grid.values())]
+
+
+    def run(self) -> pd.DataFrame:
+        """
+        Run a backtest for every parameter set.  A backtest that raises an
+        exception (or whose worker process dies) does not stop the others;
+        its error is reported in the `error` column of the results instead.
+        When a worker dies, the pool it was in breaks, so the backtests that
+        had not finished are run again, each in a pool of its own, to find
+        the one that killed it.
+
+        Returns:
+            pd.DataFrame: One row per parameter set, with a column for each
+            parameter, each metric, and `error` (None if the backtest
+            succeeded).
+        """
+        param_sets = self.get_param_sets()
+        results: list[dict] = [None] * len(param_sets)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            data_specs = self._share_datas(tmp)
+
+            lost = self._run_in_pool(range(len(param_sets)), param_sets, 
+                                     data_specs, results, self.max_workers)
+            for i in lost:
+                if self._run_in_pool([i], param_sets, data_specs, results, 1):
+                    results[i] = {"error": "The worker process running this "
+                                           "backtest died unexpectedly."}
+
+        rows = [{**params, **result} for params, result in zip(param_sets, results)]
+        df = pd.DataFrame(rows)
+        if "error" not in df.columns:
+            df["error"] = None
+        return df
+
+
+    def _run_in_pool(self, indexes: list[int], param_sets: list[dict], 
+                     data_specs: dict[str, dict], results: list[dict],
+                     max_workers: int) -> list[int]:
+        # Run the given backtests in a new pool, storing their results, and
+        # return those that were lost because a worker died and broke the pool
+        lost = []
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(_run_sweep_task, self.strategy_factory, param_sets[i],
+                            data_specs, self.engine_kwargs, self.metrics): i
+                for i in indexes
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except BrokenProcessPool:
+                    lost.append(i)
+                except Exception:
+                    results[i] = {"error": traceback.format_exc()}
+        return sorted(lost)
+    
+    
+    def _share_datas(self, dir_path: str) -> dict[str, dict]:
+        # Write each data's (already parsed) DataFrame to a directory that the
+        # workers can memory-map, along with what they need to rebuild it.
+        specs = {}
+        for data_id, data in self.datas.items():
+            data_dir = os.path.join(dir_path, data_id)
+            if isinstance(data, ChunkedDataFile):
+                df = DataFile(data.contract, data.file_path).as_df()
+            else:
+                df = data.as_df()
+            _write_df_columns(df, data_dir)
+            specs[data_id] = {
+                "contract": data.contract,
+                "dir_path": data_dir,
+                "options_model": data.options_model,
+                "historical_options_path": data.historical_options_path,
+            }
+        return specs
+
+
+def default_metrics(engine: BacktestEngine) -> dict[str, Any]:
+    """
+    The metrics reported by a `BacktestSweep` if none are given.
+
+    Args:
+        engine (BacktestEngine): A finished backtest.
+
+    Returns:
+        dict[str, Any]: The final cash balance, realized PnL, number of open
+        positions, and run time of the backtest.
+    """
+    return {
+        "cash_balance": engine.broker.cash_balance,
+        "realized_pnl": engine.broker.account_pnl.realizedPnL,
+        "open_positions": len(engine.broker.get_positions()),
+        "run_walltime": engine.run_walltime,
+    }
+
+
+def _run_sweep_task(strategy_factory: Callable[..., Strategy],
+                    params: dict[str, Any],
+                    data_specs: dict[str, dict],
+                    engine_kwargs: dict[str, Any],
+                    metrics: Callable[[BacktestEngine], dict[str, Any]]) -> dict:
+    # Runs in a worker process.  Exceptions are caught and returned so that
+    # the traceback from the worker is reported, not just the exception.
+    try:
+        datas = {
+            data_id: DataFile.from_df(spec["contract"],
+                                      _read_df_columns(spec["dir_path"]),
+                                      spec["options_model"],
+                                      spec["historical_options_path"])
+            for data_id, spec in data_specs.items()
+        }
+        engine = BacktestEngine(strategy_factory(**params), datas, **engine_kwargs)
+        engine.run()
+        return {**metrics(engine), "error": None}
+    except Exception:
+        return {"error": traceback.format_exc()}
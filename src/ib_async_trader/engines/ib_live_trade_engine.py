@@ -1,30 +1,80 @@
+import asyncio
 import ib_async as ib
 import sys
 import traceback
 
 from datetime import datetime, timedelta
+from time import perf_counter
 
 from ..brokers.ib_live_trade_broker import IBLiveTradeBroker
 from ..datas.data_stream import DataStream
 from ..engine import Engine
 from ..strategy import Strategy
+from ..utils.pacing import HistoricalDataPacer
+from ..utils.telemetry import MetricsSink
 
 
 class IBLiveTradeEngine(Engine):
     
     def __init__(self, strategy: Strategy, datas: dict[str, DataStream], 
                  tick_rate_s: float = 1, host: str="127.0.0.1", port: int=7496, 
-                 client_id: int=1):
+                 client_id: int=1, metrics_sink: MetricsSink = None,
+                 metrics_flush_s: float = 60, loop_lag_interval_s: float = 0.5,
+                 history_pacer: HistoricalDataPacer = None, client: ib.IB = None):
+        """
+        Initialize an `IBLiveTradeEngine`.
+
+        Args:
+            strategy (Strategy): The `Strategy` to be traded.
+            datas (dict[str, DataStream]): The datas available to the strategy,
+                keyed by data ID.
+            tick_rate_s (float, optional): The time between ticks, in seconds.
+                Defaults to 1.
+            host (str, optional): The host of the IB gateway or TWS.
+                Defaults to "127.0.0.1".
+            port (int, optional): The port of the IB gateway or TWS.
+                Defaults to 7496.
+            client_id (int, optional): The client ID to connect with.
+                Defaults to 1.
+            metrics_sink (MetricsSink, optional): Where to report telemetry: 
+                how late each tick starts, how long ticks and data updates 
+                take, overruns, skipped ticks and event loop lag.  Defaults to
+                a `MetricsSink` that only keeps them in memory (see `metrics`).
+            metrics_flush_s (float, optional): How often the metrics are 
+                flushed to the sink, in seconds. Defaults to 60.
+            loop_lag_interval_s (float, optional): How often the event loop 
+                lag is measured, in seconds. Defaults to 0.5.
+            history_pacer (HistoricalDataPacer, optional): Paces the history
+                requests of the data streams, which are started concurrently.
+                Defaults to a `HistoricalDataPacer` with IB's limits.
+            client (ib.IB, optional): The IB client to trade through, e.g. a
+                `SimulatedIB` for testing. Defaults to a new `ib.IB`.
+        """
         super().__init__(strategy, datas)
         self.tick_rate_s = tick_rate_s
         self.host = host
         self.port = port
         self.client_id = client_id
-        self.ib = ib.IB()
+        self.ib = client or ib.IB()
         self.strategy_started = False
+        
+        self.metrics = metrics_sink or MetricsSink()
+        self.metrics_flush_s = metrics_flush_s
+        self.loop_lag_interval_s = loop_lag_interval_s
+        self._describe_metrics()
+        self._background_tasks: list[asyncio.Task] = []
+        
+        self.history_pacer = history_pacer or HistoricalDataPacer()
+        
+        # How long each data stream took to start, by data ID, and how long
+        # it took from calling run to the first tick
+        self.stream_load_s: dict[str, float] = {}
+        self.time_to_first_tick_s: float = None
                 
         
     async def run(self) -> None:
+        run_start = perf_counter()
+        
         # Initialize the broker
         self.strategy.broker = IBLiveTradeBroker(self.ib)
 
@@ -32,9 +82,7 @@ class IBLiveTradeEngine(Engine):
         await self.ib.connectAsync(self.host, self.port, self.client_id)
 
         # Initialize the data streams
-        data: DataStream
-        for _, data in self.strategy.datas.items():
-            await data.initialize(self.ib, self.strategy.on_data_update)
+        await self._initialize_datas()
 
         # Call strategy on_start
         self.strategy.on_start()
@@ -47,11 +95,43 @@ class IBLiveTradeEngine(Engine):
                                             end_time, 
                                             self.tick_rate_s)
         
+        self._background_tasks = [
+            asyncio.create_task(self._monitor_loop_lag()),
+            asyncio.create_task(self._flush_metrics_periodically()),
+        ]
+        
+        # Whether the last call of tick() took longer than the tick interval
+        overran = False
+        
         try:
             # Call strategy tick function at each interval
             async for t in time_range:    
+                
+                # If this tick is already a whole interval late (because the
+                # previous tick overran, or the event loop was kept busy by
+                # something else, like data stream updates), skip it rather 
+                # than running a burst of stale ticks to catch up.
+                lag_s = (datetime.now() - t).total_seconds()
+                if lag_s >= self.tick_rate_s:
+                    self.metrics.increment("ticks_skipped_total")
+                    cause = "the previous tick overran" if overran \
+                        else "the event loop was busy"
+                    print(f"WARNING: Skipped the tick scheduled for {t}, which "
+                          f"was {lag_s:.3f}s late because {cause}.")
+                    continue
+                self.metrics.observe("tick_lag_seconds", lag_s)
+                
                 self.strategy.time_now = t            
+                start = perf_counter()
+                if self.time_to_first_tick_s is None:
+                    self._report_startup(start - run_start)
                 await self.strategy.tick()
+                duration_s = perf_counter() - start
+                
+                self.metrics.observe("tick_duration_seconds", duration_s)
+                overran = duration_s > self.tick_rate_s
+                if overran:
+                    self.metrics.increment("tick_overruns_total")
                 
         except KeyboardInterrupt:
             print("\nStop requested by user.")
@@ -64,9 +144,99 @@ class IBLiveTradeEngine(Engine):
     
     
     def stop(self) -> None:
+        for task in self._background_tasks:
+            task.cancel()
+        self.metrics.flush()
+        
+        for data in self.strategy.datas.values():
+            try:
+                data.flush_bar_cache()
+            except Exception as e:
+                print(f"WARNING: Could not write bars to the cache: {e}")
+        
         if self.strategy_started:
             self.strategy.on_finish()
             
         self.ib.disconnect()
         sys.exit()
+        
+        
+    async def _initialize_datas(self):
+        # Qualify every stream's contract in one request, then load all of 
+        # their histories concurrently, as fast as IB's pacing rules allow.
+        # Streams whose contracts could not be qualified are not loaded.
+        datas: dict[str, DataStream] = self.strategy.datas
+        contracts = [data.contract for data in datas.values()]
+        qualified = await self.strategy.broker.qualify_contracts(*contracts)
+        qualified_ids = {id(c) for c in qualified}
+        to_load = {}
+        for data_id, data in datas.items():
+            if id(data.contract) in qualified_ids:
+                to_load[data_id] = data
+            else:
+                print(f"WARNING: Could not qualify the contract of data stream "
+                      f"{data_id}, so it will not be loaded.")
+        
+        async def initialize(data_id: str, data: DataStream):
+            start = perf_counter()
+            data.metrics_sink = self.metrics
+            await data.initialize(self.ib, self.strategy.on_data_update, 
+                                  qualify=False, pacer=self.history_pacer)
+            self.stream_load_s[data_id] = perf_counter() - start
+            self.metrics.observe("stream_load_seconds", self.stream_load_s[data_id],
+                                 {"stream": data_id})
+        
+        await asyncio.gather(*(initialize(data_id, data) 
+                               for data_id, data in to_load.items()))
+        
+        
+    def _report_startup(self, time_to_first_tick_s: float):
+        self.time_to_first_tick_s = time_to_first_tick_s
+        self.metrics.observe("time_to_first_tick_seconds", time_to_first_tick_s)
+        
+        summary = f"First tick {time_to_first_tick_s:.2f}s after starting"
+        if self.stream_load_s:
+            slowest = max(self.stream_load_s, key=self.stream_load_s.get)
+            summary += (f", with {len(self.stream_load_s)} data streams loaded "
+                        f"(slowest: {slowest} in {self.stream_load_s[slowest]:.2f}s)")
+        print(summary + ".")
+        
+        
+    def _describe_metrics(self):
+        self.metrics.describe("tick_lag_seconds", 
+                              "How late each tick started, relative to its schedule.")
+        self.metrics.describe("tick_duration_seconds", 
+                              "How long each call of Strategy.tick() took.")
+        self.metrics.describe("tick_overruns_total", 
+                              "Ticks that took longer than the tick interval.")
+        self.metrics.describe("ticks_skipped_total", 
+                              "Ticks skipped because they were a whole interval late.")
+        self.metrics.describe("stream_update_seconds", 
+                              "How long each data stream update handler took.")
+        self.metrics.describe("event_loop_lag_seconds", 
+                              "How late the event loop ran a scheduled callback.")
+        self.metrics.describe("stream_load_seconds", 
+                              "How long each data stream took to load its history.")
+        self.metrics.describe("time_to_first_tick_seconds", 
+                              "How long it took from starting the engine to the first tick.")
+        
+        
+    async def _monitor_loop_lag(self):
+        # Sleep for a fixed interval, and measure how much longer than that
+        # it took for the loop to wake us up.
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.loop_lag_interval_s)
+            lag_s = loop.time() - start - self.loop_lag_interval_s
+            self.metrics.observe("event_loop_lag_seconds", max(lag_s, 0))
+            
+            
+    async def _flush_metrics_periodically(self):
+        while True:
+            await asyncio.sleep(self.metrics_flush_s)
+            try:
+                self.metrics.flush()
+            except Exception as e:
+                print(f"WARNING: Could not flush metrics: {e}")
         
\ No newline at end of file
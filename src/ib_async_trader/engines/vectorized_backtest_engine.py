@@ -0,0 +1,205 @@
+import numpy as np
+import os
+import pandas as pd
+
+from datetime import datetime
+from time import time
+
+from ..brokers.backtest_broker import BacktestBroker
+from ..datas.data_file import DataFile
+from ..engine import Engine
+from ..strategy import Strategy, TargetPosition
+
+
+class VectorizedBacktestEngine(Engine):
+    """
+    A fast alternative to the `BacktestEngine` for strategies whose decisions
+    depend only on their data, not on the state of the account.  Rather than
+    calling `Strategy.tick()` on every bar, the strategy returns its target
+    position in each contract for the whole backtest at once (see
+    `Strategy.get_target_positions()`), and the fills, cash and equity are
+    computed with NumPy over the whole history.
+
+    Trades are priced by the same rules as the `BacktestBroker` (the close of
+    the bar for futures and stocks, and Black-Scholes for modeled options),
+    and positions are closed when their contract expires.  Unlike the
+    `BacktestBroker`, orders are never rejected for lack of cash.
+    """
+
+    def __init__(self, strategy: Strategy, datas: dict[str, DataFile],
+                 start_time: datetime, end_time: datetime,
+                 start_cash: float = 10000):
+        """
+        Initialize a `VectorizedBacktestEngine`.
+
+        Args:
+            strategy (Strategy): The `Strategy` to be backtested.  It must
+                implement `Strategy.get_target_positions()`.
+            datas (dict[str, DataFile]): The datas available to the strategy,
+                keyed by data ID.
+            start_time (datetime): The time at which the backtest begins.
+            end_time (datetime): The time at which the backtest ends.
+            start_cash (float, optional): The starting account balance.
+                Defaults to 10000.
+        """
+        super().__init__(strategy, datas)
+
+        # The broker is only used for its pricing rules, and to hold the final
+        # state of the account so it can be inspected as with BacktestEngine.
+        self.broker = BacktestBroker(datas, start_cash)
+        self.start_time = start_time
+        self.end_time = end_time
+        self.start_cash = start_cash
+
+        self.trades: pd.DataFrame = None
+        self.equity_curve: pd.DataFrame = None
+
+        self.walltime_start: int = None
+        self.walltime_end: int = None
+        self.run_walltime: int = None
+
+
+    def run(self) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Run the backtest.  Afterwards, `broker` holds the final cash balance,
+        PnL and positions, as with the `BacktestEngine`.
+
+        Returns:
+            tuple[pd.DataFrame, pd.DataFrame]: The equity curve, with the
+            same columns as the `BacktestEngine`'s but one row per bar, and 
+            the trade ledger.  These are also kept in `equity_curve` and 
+            `trades`.
+        """
+        self.walltime_start = time()
+
+        self.broker.initialize(self.start_time)
+        for _, data in self.datas.items():
+            data.initialize(self.strategy.on_data_update)
+
+        self.strategy.on_start()
+
+        trades = []
+        market_values = []
+        for target in self.strategy.get_target_positions():
+            contract_trades, market_value = self._simulate(target)
+            trades.append(contract_trades)
+            market_values.append(market_value)
+
+        self._replay_fills(self._merge_trades(trades))
+        self.trades = self.broker.get_trade_ledger()
+        self.equity_curve = self._get_equity_curve(market_values)
+
+        self.walltime_end = time()
+        self.run_walltime = self.walltime_end - self.walltime_start
+        self.strategy.on_finish()
+        return self.equity_curve, self.trades
+    
+    
+    def save_results(self, dir_path: str) -> None:
+        """
+        Write the equity curve and trade ledger to `equity_curve.parquet` and
+        `trades.parquet` in a directory.
+
+        Args:
+            dir_path (str): The directory to write to.  It is created if it
+                does not exist.
+        """
+        os.makedirs(dir_path, exist_ok=True)
+        self.equity_curve.to_parquet(os.path.join(dir_path, "equity_curve.parquet"))
+        self.trades.to_parquet(os.path.join(dir_path, "trades.parquet"))
+
+
+    def _simulate(self, target: TargetPosition) -> tuple[pd.DataFrame, pd.Series]:
+        # Fill every change in the target position of one contract, and mark
+        # the position to market at each bar.
+        contract = target.contract
+        df = self.datas[contract.symbol].as_df()
+        positions = self._align(target.positions, df.index)
+
+        # Slice down to the backtest time range
+        start = df.index.searchsorted(self.start_time, side="left")
+        end = df.index.searchsorted(self.end_time, side="right")
+        df = df.iloc[start:end]
+        positions = positions[start:end]
+
+        # Expired contracts can't be held, so close them out at the first bar
+        # at or after expiration.
+        if contract.lastTradeDateOrContractMonth:
+            exp_dt = self.broker._get_contract_expiration_dt(contract)
+            positions = np.where(df.index >= exp_dt, 0, positions)
+
+        prices = self.broker._get_price_series(contract, df)
+        multiplier = float(contract.multiplier or 1)
+        quantities = np.diff(positions, prepend=0)
+        filled = np.flatnonzero(quantities)
+
+        trades = pd.DataFrame({
+            "time": df.index[filled],
+            "quantity": quantities[filled],
+            "cash_effect": self.broker._get_cash_effect(
+                quantities[filled], contract, prices[filled]),
+        })
+        trades["contract"] = pd.Series([contract] * len(filled), dtype=object)
+
+        market_value = pd.Series(np.where(positions != 0,
+                                          positions * multiplier * prices, 0),
+                                 index=df.index)
+        return trades, market_value
+
+
+    @staticmethod
+    def _align(positions: pd.Series | np.ndarray,
+               index: pd.DatetimeIndex) -> np.ndarray:
+        if isinstance(positions, pd.Series):
+            positions = positions.reindex(index)
+        positions = np.asarray(positions, dtype=np.float64)
+        if len(positions) != len(index):
+            raise ValueError(f"Expected {len(index)} target positions, got {len(positions)}.")
+        return np.nan_to_num(positions, nan=0.0)
+
+
+    @staticmethod
+    def _merge_trades(trades: list[pd.DataFrame]) -> pd.DataFrame:
+        if not trades:
+            return pd.DataFrame(columns=["time", "quantity", "cash_effect", "contract"])
+        merged = pd.concat(trades, ignore_index=True)
+        return merged.sort_values("time", kind="stable", ignore_index=True)
+
+
+    def _get_equity_curve(self, market_values: list[pd.Series]) -> pd.DataFrame:
+        # Combine the contracts' market values onto one index, carrying each
+        # forward over bars where its data has none.
+        index = pd.DatetimeIndex([])
+        for market_value in market_values:
+            index = index.union(market_value.index)
+
+        market_value = np.zeros(len(index))
+        exposure = np.zeros(len(index))
+        for mv in market_values:
+            mv = mv.reindex(index).ffill().fillna(0).to_numpy()
+            market_value += mv
+            exposure += np.abs(mv)
+
+        by_time = self.trades.groupby(level="time")
+        cash = self.start_cash + by_time["cash_effect"].sum() \
+            .reindex(index, fill_value=0).cumsum().to_numpy()
+        realized = by_time["realized_pnl"].sum() \
+            .reindex(index, fill_value=0).cumsum().to_numpy()
+        equity = cash + market_value
+
+        index.name = "time"
+        return pd.DataFrame({"cash": cash,
+                             "market_value": market_value,
+                             "equity": equity,
+                             "realized_pnl": realized,
+                             "unrealized_pnl": equity - self.start_cash - realized,
+                             "exposure": exposure}, index=index)
+
+
+    def _replay_fills(self, trades: pd.DataFrame):
+        # Apply each fill to the broker as BacktestBroker._execute_trade would
+        # so the final account state (and the trade ledger) can be compared 
+        # with BacktestEngine's.
+        for row in trades.itertuples(index=False):
+            self.broker.time_now = row.time
+            self.broker._book_fill(row.contract, row.quantity, row.cash_effect)
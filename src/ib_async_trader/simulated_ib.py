@@ -0,0 +1,481 @@
+import asyncio
+import ib_async as ib
+import itertools
+import math
+import numpy as np
+import pandas as pd
+
+from datetime import datetime, timedelta, timezone
+
+
+_SUPPORTED_ORDER_TYPES = ("MKT", "LMT")
+_DURATION_UNITS_S = {"S": 1, "D": 86400, "W": 7 * 86400}
+
+
+def make_synthetic_bars(n_bars: int,
+                        start: datetime = datetime(2024, 1, 2, 14, 30, tzinfo=timezone.utc),
+                        bar_size_s: int = 5, price: float = 5000.0,
+                        volatility: float = 0.25, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate random walk OHLCV bars to replay with a `SimulatedIB`.
+
+    Args:
+        n_bars (int): The number of bars to generate.
+        start (datetime, optional): The time of the first bar.
+            Defaults to 2024-01-02 14:30 UTC.
+        bar_size_s (int, optional): The size of each bar, in seconds.
+            Defaults to 5.
+        price (float, optional): The starting price. Defaults to 5000.
+        volatility (float, optional): The standard deviation of the change in
+            price per bar. Defaults to 0.25.
+        seed (int, optional): The random seed. Defaults to 0.
+
+    Returns:
+        pd.DataFrame: The bars, indexed by time (named "date").
+    """
+    rng = np.random.default_rng(seed)
+    close = price + np.cumsum(rng.normal(0, volatility, n_bars)).round(2)
+    open_ = np.concatenate([[price], close[:-1]])
+    spread = np.abs(rng.normal(0, volatility / 2, n_bars))
+    index = pd.date_range(start, periods=n_bars, freq=f"{bar_size_s}s", name="date")
+    return pd.DataFrame({
+        "open": open_,
+        "high": np.maximum(open_, close) + spread,
+        "low": np.minimum(open_, close) - spread,
+        "close": close,
+        "volume": rng.integers(1, 100, n_bars).astype(float),
+    }, index=index)
+
+
+class SimulatedIB:
+    """
+    An in-process stand-in for `ib_async.IB`, for testing and benchmarking
+    the live engine, broker and data streams without a TWS or IB gateway.
+
+    Bars are replayed from the given DataFrames, at real time or any multiple
+    of it, starting when `connectAsync` is called.  A history request returns
+    the bars up to the current replay time, and a `keepUpToDate` request then
+    receives each bar as it is replayed.  Market orders, and marketable limit
+    orders, are filled at the last close of the contract's symbol after a
+    configurable latency; other limit orders rest until the price reaches
+    them.  Fills update positions and cash, and emit the same trade,
+    position and account value events that IB does.
+    """
+
+    def __init__(self, bars: dict[str, pd.DataFrame], speed: float = 1.0,
+                 replay_from: datetime = None, fill_latency_s: float = 0.0,
+                 request_latency_s: float = 0.0, starting_cash: float = 1_000_000,
+                 commission: float = 0.0, account: str = "DU0000000"):
+        """
+        Initialize a `SimulatedIB`.
+
+        Args:
+            bars (dict[str, pd.DataFrame]): The bars of each symbol, indexed
+                by time, with "open", "high", "low", "close" and "volume"
+                columns (e.g. from `make_synthetic_bars`).  They are replayed
+                as they are, whatever bar size is requested.
+            speed (float, optional): How many times faster than real time to
+                replay the bars.  Use `math.inf` to replay them as fast as
+                possible. Defaults to 1.
+            replay_from (datetime, optional): Where to start replaying.  Bars
+                before it are available as history from the start.  Defaults
+                to the time of the first bar.
+            fill_latency_s (float, optional): The time between placing an
+                order and it being filled, in (real) seconds. Defaults to 0.
+            request_latency_s (float, optional): The time each request (e.g.
+                for history, or to qualify contracts) takes, in (real)
+                seconds. Defaults to 0.
+            starting_cash (float, optional): The account's starting cash.
+                Defaults to 1,000,000.
+            commission (float, optional): The commission per contract.
+                Defaults to 0.
+            account (str, optional): The account number.
+                Defaults to "DU0000000".
+        """
+        self.speed = speed
+        self.fill_latency_s = fill_latency_s
+        self.request_latency_s = request_latency_s
+        self.commission = commission
+        self.account = account
+
+        for name in ib.IB.events:
+            setattr(self, name, ib.Event(name))
+
+        # The time and OHLCV of each symbol's bars, and the number of them
+        # replayed so far
+        self._times: dict[str, np.ndarray] = {}
+        self._ohlcv: dict[str, np.ndarray] = {}
+        self._num_replayed: dict[str, int] = {}
+        for symbol, df in bars.items():
+            index = pd.DatetimeIndex(df.index)
+            if index.tz is None:
+                index = index.tz_localize(timezone.utc)
+            order = np.argsort(index.asi8, kind="stable")
+            self._times[symbol] = index.asi8[order]
+            self._ohlcv[symbol] = df[["open", "high", "low", "close", "volume"]] \
+                .to_numpy(dtype=np.float64)[order]
+
+        first_ns = min((t[0] for t in self._times.values() if len(t)), default=0)
+        self._replay_from_ns = pd.Timestamp(replay_from).value if replay_from else first_ns
+        for symbol, times in self._times.items():
+            self._num_replayed[symbol] = int(np.searchsorted(times, self._replay_from_ns))
+        self._now_ns = self._replay_from_ns
+
+        self._connected = False
+        self._replay_task: asyncio.Task = None
+        self._tasks: set[asyncio.Task] = set()
+        self._subscriptions: dict[str, list[ib.BarDataList]] = {}
+
+        # Account state
+        self._cash = starting_cash
+        self._positions: dict[int, ib.Position] = {}
+        self._trades: list[ib.Trade] = []
+        self._resting: list[ib.Trade] = []
+        self._account_values: dict[str, ib.AccountValue] = {}
+        self._con_ids: dict[tuple, int] = {}
+        self._order_ids = itertools.count(1)
+        self._exec_ids = itertools.count(1)
+
+
+    @property
+    def time_now(self) -> datetime:
+        """The current replay time."""
+        return pd.Timestamp(self._now_ns, tz=timezone.utc).to_pydatetime()
+
+
+    async def connectAsync(self, host: str = "127.0.0.1", port: int = 7497,
+                           clientId: int = 1, **kwargs) -> "SimulatedIB":
+        self._connected = True
+        self._update_account_values()
+        self._replay_task = asyncio.create_task(self._replay())
+        self.connectedEvent()
+        return self
+
+
+    def disconnect(self) -> None:
+        if self._replay_task is not None:
+            self._replay_task.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        if self._connected:
+            self._connected = False
+            self.disconnectedEvent()
+
+
+    def isConnected(self) -> bool:
+        return self._connected
+
+
+    async def wait_until_replayed(self) -> None:
+        """Wait until every bar has been replayed."""
+        await self._replay_task
+
+
+    def accountValues(self, account: str = "") -> list[ib.AccountValue]:
+        return list(self._account_values.values())
+
+
+    def positions(self, account: str = "") -> list[ib.Position]:
+        return list(self._positions.values())
+
+
+    async def reqPositionsAsync(self) -> list[ib.Position]:
+        await self._request_latency()
+        return self.positions()
+
+
+    def trades(self) -> list[ib.Trade]:
+        return list(self._trades)
+
+
+    def openTrades(self) -> list[ib.Trade]:
+        return [t for t in self._trades if not t.isDone()]
+
+
+    def openOrders(self) -> list[ib.Order]:
+        return [t.order for t in self.openTrades()]
+
+
+    async def reqAllOpenOrdersAsync(self) -> list[ib.Trade]:
+        await self._request_latency()
+        return self.openTrades()
+
+
+    async def qualifyContractsAsync(self, *contracts: ib.Contract,
+                                    returnAll: bool = False) -> list[ib.Contract]:
+        await self._request_latency()
+        for contract in contracts:
+            self._assign_con_id(contract)
+        return list(contracts)
+
+
+    async def reqHistoricalDataAsync(self, contract: ib.Contract, endDateTime,
+                                     durationStr: str, barSizeSetting: str,
+                                     whatToShow: str, useRTH: bool,
+                                     formatDate: int = 1, keepUpToDate: bool = False,
+                                     chartOptions: list = [],
+                                     timeout: float = 60) -> ib.BarDataList:
+        await self._request_latency()
+        bars = ib.BarDataList()
+        bars.contract = contract
+        bars.durationStr = durationStr
+        bars.barSizeSetting = barSizeSetting
+        bars.whatToShow = whatToShow
+        bars.keepUpToDate = keepUpToDate
+
+        symbol = contract.symbol
+        if symbol not in self._times:
+            print(f"WARNING: The simulator has no bars for {symbol}.")
+            return bars
+
+        # The bars replayed so far, within the requested duration
+        amount, unit = durationStr.split()
+        since_ns = self._now_ns - int(amount) * _DURATION_UNITS_S[unit] * 10**9
+        end = self._num_replayed[symbol]
+        start = int(np.searchsorted(self._times[symbol][:end], since_ns))
+        dates = pd.to_datetime(self._times[symbol][start:end], utc=True).to_pydatetime()
+        bars.extend(ib.BarData(date=date, open=o, high=h, low=l, close=c, volume=v)
+                    for date, (o, h, l, c, v) in 
+                    zip(dates, self._ohlcv[symbol][start:end].tolist()))
+
+        if keepUpToDate:
+            self._subscriptions.setdefault(symbol, []).append(bars)
+        return bars
+
+
+    async def reqSecDefOptParamsAsync(self, underlyingSymbol: str, futFopExchange: str,
+                                      underlyingSecType: str,
+                                      underlyingConId: int) -> list[ib.OptionChain]:
+        # A chain of strikes every 5 around the last price, expiring on each
+        # of the next 5 weekdays
+        await self._request_latency()
+        price = self._last_price(underlyingSymbol)
+        if price is None:
+            return []
+        atm = 5 * round(price / 5)
+        day = self.time_now.date()
+        expirations = []
+        while len(expirations) < 5:
+            day += timedelta(days=1)
+            if day.weekday() < 5:
+                expirations.append(day.strftime("%Y%m%d"))
+        return [ib.OptionChain(futFopExchange, underlyingConId, underlyingSymbol,
+                               "100", expirations,
+                               [float(s) for s in range(atm - 100, atm + 105, 5)])]
+
+
+    async def whatIfOrderAsync(self, contract: ib.Contract, order: ib.Order) -> ib.OrderState:
+        await self._request_latency()
+        return ib.OrderState()
+
+
+    def placeOrder(self, contract: ib.Contract, order: ib.Order) -> ib.Trade:
+        self._assign_con_id(contract)
+        if not order.orderId:
+            order.orderId = next(self._order_ids)
+        trade = ib.Trade(contract=contract, order=order,
+                         orderStatus=ib.OrderStatus(orderId=order.orderId,
+                                                    status="PendingSubmit",
+                                                    remaining=order.totalQuantity))
+        trade.log.append(ib.TradeLogEntry(self.time_now, "PendingSubmit"))
+        self._trades.append(trade)
+        self.newOrderEvent(trade)
+        self._start_task(self._submit(trade))
+        return trade
+
+
+    def cancelOrder(self, order: ib.Order, manualCancelOrderTime: str = "") -> ib.Trade:
+        for trade in self._trades:
+            if trade.order is order and not trade.isDone():
+                if trade in self._resting:
+                    self._resting.remove(trade)
+                self._set_status(trade, "Cancelled")
+                trade.cancelledEvent(trade)
+                return trade
+        return None
+
+
+    async def _replay(self):
+        # Release each bar when the replay clock reaches its time, paced
+        # against the event loop's clock.
+        loop = asyncio.get_running_loop()
+        wall_start = loop.time()
+        pending = [t[self._num_replayed[s]:] for s, t in self._times.items()]
+        times = np.unique(np.concatenate(pending)) if pending else []
+        for t_ns in times:
+            if math.isinf(self.speed):
+                await asyncio.sleep(0)
+            else:
+                target = wall_start + (t_ns - self._replay_from_ns) / 1e9 / self.speed
+                await asyncio.sleep(max(target - loop.time(), 0))
+
+            self._now_ns = int(t_ns)
+            for symbol, symbol_times in self._times.items():
+                i = self._num_replayed[symbol]
+                if i < len(symbol_times) and symbol_times[i] == t_ns:
+                    self._num_replayed[symbol] = i + 1
+                    self._release_bar(symbol, i)
+
+
+    def _release_bar(self, symbol: str, i: int):
+        for bars in self._subscriptions.get(symbol, []):
+            bars.append(self._make_bar(symbol, i))
+            bars.updateEvent(bars, True)
+
+        for trade in [t for t in self._resting if t.contract.symbol == symbol]:
+            price = self._get_fill_price(trade)
+            if price is not None:
+                self._resting.remove(trade)
+                self._fill(trade, price)
+
+
+    def _assign_con_id(self, contract: ib.Contract):
+        if not contract.conId:
+            key = (contract.secType, contract.symbol,
+                   contract.lastTradeDateOrContractMonth, contract.strike,
+                   contract.right, contract.exchange)
+            contract.conId = self._con_ids.setdefault(key, len(self._con_ids) + 1)
+
+
+    def _make_bar(self, symbol: str, i: int) -> ib.BarData:
+        o, h, l, c, v = self._ohlcv[symbol][i]
+        date = pd.Timestamp(self._times[symbol][i], tz=timezone.utc).to_pydatetime()
+        return ib.BarData(date=date, open=o, high=h, low=l, close=c, volume=v)
+
+
+    def _last_price(self, symbol: str) -> float:
+        i = self._num_replayed.get(symbol, 0)
+        return float(self._ohlcv[symbol][i - 1, 3]) if i > 0 else None
+
+
+    async def _request_latency(self):
+        if self.request_latency_s > 0:
+            await asyncio.sleep(self.request_latency_s)
+
+
+    def _start_task(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+    async def _submit(self, trade: ib.Trade):
+        if self.fill_latency_s > 0:
+            await asyncio.sleep(self.fill_latency_s)
+        if trade.isDone():
+            return
+
+        if trade.order.orderType not in _SUPPORTED_ORDER_TYPES:
+            self._reject(trade, f"Order type {trade.order.orderType} is not "
+                                "supported by the simulator.")
+            return
+        if self._last_price(trade.contract.symbol) is None:
+            self._reject(trade, f"No market data for {trade.contract.symbol}.")
+            return
+
+        self._set_status(trade, "Submitted")
+        price = self._get_fill_price(trade)
+        if price is None:
+            self._resting.append(trade)
+        else:
+            self._fill(trade, price)
+
+
+    def _reject(self, trade: ib.Trade, message: str):
+        trade.log.append(ib.TradeLogEntry(self.time_now, "Cancelled", message))
+        self._set_status(trade, "Cancelled")
+        trade.cancelledEvent(trade)
+
+
+    def _get_fill_price(self, trade: ib.Trade) -> float:
+        # Market orders fill at the last price, and limit orders do too once
+        # the last price is at or better than the limit
+        price = self._last_price(trade.contract.symbol)
+        order = trade.order
+        if order.orderType == "LMT":
+            if order.action == "BUY" and price > order.lmtPrice:
+                return None
+            if order.action == "SELL" and price < order.lmtPrice:
+                return None
+        return price
+
+
+    def _set_status(self, trade: ib.Trade, status: str):
+        trade.orderStatus.status = status
+        if trade.log[-1].status != status:
+            trade.log.append(ib.TradeLogEntry(self.time_now, status))
+        trade.statusEvent(trade)
+        self.orderStatusEvent(trade)
+
+
+    def _fill(self, trade: ib.Trade, price: float):
+        contract, order = trade.contract, trade.order
+        qty = order.totalQuantity
+        now = self.time_now
+        exec_id = f"sim.{next(self._exec_ids)}"
+        execution = ib.Execution(
+            execId=exec_id, time=now, acctNumber=self.account,
+            exchange=contract.exchange, side="BOT" if order.action == "BUY" else "SLD",
+            shares=qty, price=price, orderId=order.orderId, cumQty=qty, avgPrice=price)
+        report = ib.CommissionReport(execId=exec_id, commission=self.commission * qty,
+                                     currency="USD")
+        fill = ib.Fill(contract, execution, report, now)
+
+        trade.fills.append(fill)
+        trade.orderStatus.filled = qty
+        trade.orderStatus.remaining = 0
+        trade.orderStatus.avgFillPrice = price
+        trade.orderStatus.lastFillPrice = price
+        trade.log.append(ib.TradeLogEntry(now, "Filled", f"Fill {qty}@{price}"))
+
+        self._update_position(contract, qty if order.action == "BUY" else -qty, price)
+        self._cash -= report.commission
+
+        trade.fillEvent(trade, fill)
+        self.execDetailsEvent(trade, fill)
+        trade.commissionReportEvent(trade, fill, report)
+        self.commissionReportEvent(trade, fill, report)
+        self._set_status(trade, "Filled")
+        trade.filledEvent(trade)
+        self._update_account_values()
+
+
+    def _update_position(self, contract: ib.Contract, qty: float, price: float):
+        multiplier = float(contract.multiplier or 1)
+        self._cash -= qty * price * multiplier
+
+        # avgCost is per contract, including the multiplier, as from IB
+        pos = self._positions.get(contract.conId)
+        old_qty, old_cost = (pos.position, pos.avgCost) if pos else (0.0, 0.0)
+        new_qty = old_qty + qty
+        if new_qty == 0:
+            avg_cost = 0.0
+        elif old_qty == 0 or (old_qty > 0) != (new_qty > 0):
+            avg_cost = price * multiplier
+        elif abs(new_qty) > abs(old_qty):
+            avg_cost = (old_qty * old_cost + qty * price * multiplier) / new_qty
+        else:
+            avg_cost = old_cost
+
+        pos = ib.Position(self.account, contract, new_qty, avg_cost)
+        if new_qty == 0:
+            self._positions.pop(contract.conId, None)
+        else:
+            self._positions[contract.conId] = pos
+        self.positionEvent(pos)
+
+
+    def _update_account_values(self):
+        net_liq = self._cash
+        for pos in self._positions.values():
+            price = self._last_price(pos.contract.symbol)
+            multiplier = float(pos.contract.multiplier or 1)
+            net_liq += pos.position * multiplier * \
+                (price if price is not None else pos.avgCost / multiplier)
+
+        for tag, value in [("CashBalance", self._cash), ("BuyingPower", net_liq),
+                           ("NetLiquidation", net_liq)]:
+            av = ib.AccountValue(self.account, tag, f"{value:.2f}", "USD", "")
+            self._account_values[tag] = av
+            if self._connected:
+                self.accountValueEvent(av)
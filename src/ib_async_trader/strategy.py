@@ -1,11 +1,27 @@
+import ib_async as ib
+import numpy as np
 import pandas as pd
 
 from datetime import datetime
+from typing import NamedTuple
 
 from .broker import Broker
 from .data import Data
 
 
+class TargetPosition(NamedTuple):
+    """
+    The position a strategy wants to hold in a contract at each bar, as 
+    returned by `Strategy.get_target_positions` for the 
+    `VectorizedBacktestEngine`.  The contract is priced from the data for its 
+    symbol (i.e. `datas[contract.symbol]`), and `positions` is aligned to that 
+    data's index: a signed number of contracts per bar, with NaN meaning no 
+    position.
+    """
+    contract: ib.Contract
+    positions: pd.Series | np.ndarray
+
+
 class Strategy:
     """
     The `Strategy` class is an abstract class that is designed to provided a 
@@ -56,6 +72,21 @@ class Strategy:
         return df
         
         
+    def get_target_positions(self) -> list[TargetPosition]:
+        """
+        Used instead of `Strategy.tick()` by the `VectorizedBacktestEngine`.  
+        Called once, after `on_data_update`, to get the position the strategy 
+        wants to hold in each contract over the whole backtest.  Any change in 
+        the target position is filled at that bar's price, just as a market 
+        order placed in `tick()` would be.
+
+        Returns:
+            list[TargetPosition]: The target positions for each contract traded.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not implement get_target_positions().")
+        
+        
     def on_finish(self) -> None:
         """
         Called when a `Strategy` has finished, at the end of the backtest.
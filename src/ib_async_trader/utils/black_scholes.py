@@ -1,7 +1,31 @@
 import numpy as np
 
 from datetime import datetime
+from scipy.special import erf
 from scipy.stats import norm
+from typing import NamedTuple
+
+
+_SQRT_1_2 = np.sqrt(0.5)
+_INV_SQRT_2PI = 1 / np.sqrt(2 * np.pi)
+
+class OptionGreeks(NamedTuple):
+    """
+    The Black-Scholes prices and greeks for a batch of options contracts, as
+    returned by `BlackScholes.greeks`.  Each field is an array with one element
+    per contract.  Theta is expressed per year, and vega and rho per unit
+    (i.e. 1.00, not 1%) change in volatility and rate, respectively.
+    """
+    call: np.ndarray
+    put: np.ndarray
+    call_delta: np.ndarray
+    put_delta: np.ndarray
+    gamma: np.ndarray
+    vega: np.ndarray
+    call_theta: np.ndarray
+    put_theta: np.ndarray
+    call_rho: np.ndarray
+    put_rho: np.ndarray
 
 
 class BlackScholes:
@@ -12,6 +36,8 @@ class BlackScholes:
     """
     DAYS_PER_YEAR = 365
     SECONDS_PER_DAY = 86400
+    IV_MIN = 1E-6
+    IV_MAX = 5.0
     
     
     @classmethod
@@ -37,9 +63,10 @@ class BlackScholes:
         """
         d1 = cls._calc_d1(S, K, sigma, t, r, q)
         d2 = cls._calc_d2(d1, sigma, t)
+        disc_S = S * np.exp(-q * t)
     
-        c = S * cls._N(d1) - K * np.exp(-r * t) * cls._N(d2)
-        p = K * np.exp(-r * t) * cls._N(-d2) - S * cls._N(-d1)
+        c = disc_S * cls._N(d1) - K * np.exp(-r * t) * cls._N(d2)
+        p = K * np.exp(-r * t) * cls._N(-d2) - disc_S * cls._N(-d1)
     
         return c, p
     
@@ -105,7 +132,7 @@ class BlackScholes:
             tuple[float, float]: The delta of a call or put contract with the
             given parameters.
         """
-        d1 = cls._calc_d1(S, K, sigma, t, r)
+        d1 = cls._calc_d1(S, K, sigma, t, r, q)
         delta_call = np.exp(-q * t) * cls._N(d1)
         delta_put =  np.exp(-q * t) * (cls._N(d1) - 1)
         return delta_call, delta_put
@@ -135,6 +162,181 @@ class BlackScholes:
         return S / denom
     
     
+    @classmethod
+    def call_put_price_batch(cls, S: np.ndarray, K: np.ndarray, t: np.ndarray, 
+                             sigma: np.ndarray, r: float = 0.25, 
+                             q: float = 0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate the Black-Scholes call and put prices for a batch of options
+        contracts at once (e.g. a whole options chain).  All arguments are 
+        broadcast against each other, so any of them may be scalars.
+
+        Args:
+            S (np.ndarray): The price(s) of the underlying.
+            K (np.ndarray): The strike price(s) of the options contracts.
+            t (np.ndarray): The time(s) to expiration, expressed in fractions 
+            of a year (see `time_to_expiration_years`).
+            sigma (np.ndarray): The implied volatility of the underlying.
+            r (float, optional): The risk-free rate. Defaults to 0.25.
+            q (float, optional): The dividend yeild. Defaults to 0.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The call and put prices for each 
+            contract.
+        """
+        S, K, t, sigma, r, q = cls._as_arrays(S, K, t, sigma, r, q)
+        d1, d2 = cls._calc_d1_d2_batch(S, K, t, sigma, r, q)
+        disc_S = S * np.exp(-q * t)
+        disc_K = K * np.exp(-r * t)
+        c = disc_S * cls._N_fast(d1) - disc_K * cls._N_fast(d2)
+        p = disc_K * cls._N_fast(-d2) - disc_S * cls._N_fast(-d1)
+        return c, p
+    
+    
+    @classmethod
+    def greeks(cls, S: np.ndarray, K: np.ndarray, t: np.ndarray, 
+               sigma: np.ndarray, r: float = 0.25, 
+               q: float = 0) -> OptionGreeks:
+        """
+        Calculate the Black-Scholes call and put prices along with the delta,
+        gamma, vega, theta and rho for a batch of options contracts at once 
+        (e.g. a whole options chain).  All arguments are broadcast against each
+        other, so any of them may be scalars.
+
+        Args:
+            S (np.ndarray): The price(s) of the underlying.
+            K (np.ndarray): The strike price(s) of the options contracts.
+            t (np.ndarray): The time(s) to expiration, expressed in fractions 
+            of a year (see `time_to_expiration_years`).
+            sigma (np.ndarray): The implied volatility of the underlying.
+            r (float, optional): The risk-free rate. Defaults to 0.25.
+            q (float, optional): The dividend yeild. Defaults to 0.
+
+        Returns:
+            OptionGreeks: The prices and greeks for each contract.
+        """
+        S, K, t, sigma, r, q = cls._as_arrays(S, K, t, sigma, r, q)
+        d1, d2 = cls._calc_d1_d2_batch(S, K, t, sigma, r, q)
+        
+        # Compute each of the shared terms only once for the whole batch
+        sqrt_t = np.sqrt(t)
+        disc_S = S * np.exp(-q * t)
+        disc_K = K * np.exp(-r * t)
+        N_d1 = cls._N_fast(d1)
+        N_d2 = cls._N_fast(d2)
+        N_neg_d1 = 1 - N_d1
+        N_neg_d2 = 1 - N_d2
+        pdf_d1 = cls._pdf(d1)
+        decay = -disc_S * pdf_d1 * sigma / (2 * sqrt_t)
+        
+        return OptionGreeks(
+            call=disc_S * N_d1 - disc_K * N_d2,
+            put=disc_K * N_neg_d2 - disc_S * N_neg_d1,
+            call_delta=np.exp(-q * t) * N_d1,
+            put_delta=np.exp(-q * t) * (N_d1 - 1),
+            gamma=np.exp(-q * t) * pdf_d1 / (S * sigma * sqrt_t),
+            vega=disc_S * pdf_d1 * sqrt_t,
+            call_theta=decay - r * disc_K * N_d2 + q * disc_S * N_d1,
+            put_theta=decay + r * disc_K * N_neg_d2 - q * disc_S * N_neg_d1,
+            call_rho=t * disc_K * N_d2,
+            put_rho=-t * disc_K * N_neg_d2)
+    
+    
+    @classmethod
+    def implied_vol(cls, price: np.ndarray, S: np.ndarray, K: np.ndarray, 
+                    t: np.ndarray, right: np.ndarray, r: float = 0.25, 
+                    q: float = 0, tol: float = 1E-8, 
+                    max_iter: int = 50) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Calculate the implied volatility for a batch of options contracts 
+        (e.g. a whole historical chain snapshot) from their prices.  All 
+        arguments are broadcast against each other, so any of them may be 
+        scalars.
+        
+        A vectorized Newton-Raphson iteration (using vega) is run first.  Any 
+        contracts for which it fails to converge are then solved by bisection
+        between `IV_MIN` and `IV_MAX`, which always converges when a solution
+        exists.
+
+        Args:
+            price (np.ndarray): The price(s) of the options contracts.
+            S (np.ndarray): The price(s) of the underlying.
+            K (np.ndarray): The strike price(s) of the options contracts.
+            t (np.ndarray): The time(s) to expiration, expressed in fractions 
+            of a year (see `time_to_expiration_years`).
+            right (np.ndarray): The right of each contract ("C"/"CALL" or 
+            "P"/"PUT").
+            r (float, optional): The risk-free rate. Defaults to 0.25.
+            q (float, optional): The dividend yeild. Defaults to 0.
+            tol (float, optional): The absolute price tolerance for 
+            convergence. Defaults to 1E-8.
+            max_iter (int, optional): The maximum number of Newton-Raphson
+            iterations. Defaults to 50.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The implied volatility of each 
+            contract (NaN where it could not be found), and a boolean array 
+            indicating which contracts converged.
+        """
+        arrays = np.broadcast_arrays(*cls._as_arrays(price, S, K, t, r, q),
+                                     np.isin(right, ["C", "CALL"]))
+        shape = arrays[0].shape
+        price, S, K, t, r, q, is_call = [a.ravel() for a in arrays]
+        
+        # Only prices that are strictly between the no-arbitrage bounds have
+        # an implied volatility.
+        disc_S = S * np.exp(-q * t)
+        disc_K = K * np.exp(-r * t)
+        lower = np.maximum(np.where(is_call, disc_S - disc_K, disc_K - disc_S), 0)
+        upper = np.where(is_call, disc_S, disc_K)
+        valid = (t > 0) & (price > lower) & (price < upper)
+        
+        # Start from the Brenner-Subrahmanyam approximation
+        sigma = np.full(price.shape, np.nan)
+        sigma[valid] = np.clip(np.sqrt(2 * np.pi / t[valid]) * price[valid] 
+                               / S[valid], 0.01, 3.0)
+        converged = np.zeros(price.shape, dtype=bool)
+        
+        # Newton-Raphson, dropping each contract out of the active set as 
+        # soon as it converges or steps outside of the allowed range.
+        active = valid.copy()
+        for _ in range(max_iter):
+            idx = np.flatnonzero(active)
+            if idx.size == 0:
+                break
+            diff, vega = cls._price_error_and_vega(price[idx], S[idx], K[idx], 
+                                                   t[idx], sigma[idx], r[idx], 
+                                                   q[idx], is_call[idx])
+            done = np.abs(diff) < tol
+            converged[idx[done]] = True
+            
+            with np.errstate(divide="ignore", invalid="ignore"):
+                new_sigma = sigma[idx] - diff / vega
+            ok = ~done & (new_sigma > cls.IV_MIN) & (new_sigma < cls.IV_MAX)
+            sigma[idx[ok]] = new_sigma[ok]
+            active[idx[~ok]] = False
+        
+        # Bisection fallback for whatever Newton-Raphson couldn't solve
+        idx = np.flatnonzero(valid & ~converged)
+        if idx.size > 0:
+            lo = np.full(idx.size, cls.IV_MIN)
+            hi = np.full(idx.size, cls.IV_MAX)
+            args = (price[idx], S[idx], K[idx], t[idx])
+            tail = (r[idx], q[idx], is_call[idx])
+            for _ in range(100):
+                mid = 0.5 * (lo + hi)
+                diff, _ = cls._price_error_and_vega(*args, mid, *tail)
+                lo = np.where(diff < 0, mid, lo)
+                hi = np.where(diff < 0, hi, mid)
+            mid = 0.5 * (lo + hi)
+            diff, _ = cls._price_error_and_vega(*args, mid, *tail)
+            sigma[idx] = mid
+            converged[idx] = np.abs(diff) < tol
+        
+        sigma[~converged] = np.nan
+        return sigma.reshape(shape), converged.reshape(shape)
+    
+    
     @classmethod
     def _calc_d1(_, S: float, K: float, sigma: float, t: float, r: float, 
                  q: float = 0) -> float:
@@ -151,4 +353,46 @@ class BlackScholes:
     @classmethod
     def _N(_, x: float) -> float:
         return norm.cdf(x)
+    
+    
+    @classmethod
+    def _calc_d1_d2_batch(_, S: np.ndarray, K: np.ndarray, t: np.ndarray,
+                          sigma: np.ndarray, r: np.ndarray, 
+                          q: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        sig_sqrt_t = sigma * np.sqrt(t)
+        d1 = (np.log(S / K) + t * (r - q + 0.5 * sigma**2)) / sig_sqrt_t
+        return d1, d1 - sig_sqrt_t
+    
+    
+    @classmethod
+    def _price_error_and_vega(cls, price: np.ndarray, S: np.ndarray, 
+                              K: np.ndarray, t: np.ndarray, sigma: np.ndarray, 
+                              r: np.ndarray, q: np.ndarray, 
+                              is_call: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        d1, d2 = cls._calc_d1_d2_batch(S, K, t, sigma, r, q)
+        disc_S = S * np.exp(-q * t)
+        disc_K = K * np.exp(-r * t)
+        c = disc_S * cls._N_fast(d1) - disc_K * cls._N_fast(d2)
+        
+        # Put price from put-call parity, to avoid evaluating the CDF twice
+        model = np.where(is_call, c, c - disc_S + disc_K)
+        vega = disc_S * cls._pdf(d1) * np.sqrt(t)
+        return model - price, vega
+    
+    
+    @classmethod
+    def _N_fast(_, x: np.ndarray) -> np.ndarray:
+        # The standard normal CDF expressed in terms of erf, which avoids the 
+        # per-call overhead of scipy.stats distributions.
+        return 0.5 * (1 + erf(x * _SQRT_1_2))
+    
+    
+    @classmethod
+    def _pdf(_, x: np.ndarray) -> np.ndarray:
+        return np.exp(-0.5 * x**2) * _INV_SQRT_2PI
+    
+    
+    @classmethod
+    def _as_arrays(_, *args) -> list[np.ndarray]:
+        return [np.asarray(a, dtype=np.float64) for a in args]
     
\ No newline at end of file
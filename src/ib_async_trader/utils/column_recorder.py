@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+
+class ColumnRecorder:
+    """
+    An append-only, NumPy-backed table of timestamped rows.  Storage for each
+    column is preallocated, and doubled whenever it fills up, so appending a
+    row is just a few array assignments.
+    """
+
+    def __init__(self, columns: dict[str, np.dtype], capacity: int = 1024):
+        """
+        Initialize a `ColumnRecorder`.
+
+        Args:
+            columns (dict[str, np.dtype]): The name and dtype of each column.
+                Use `object` for strings.
+            capacity (int, optional): The number of rows to allocate storage
+                for up front. Defaults to 1024.
+        """
+        capacity = max(capacity, 1)
+        self._times = np.zeros(capacity, dtype=np.int64)
+        self._cols = {name: np.zeros(capacity, dtype=dtype)
+                      for name, dtype in columns.items()}
+        self._col_list = list(self._cols.values())
+        self._len = 0
+
+
+    def __len__(self) -> int:
+        return self._len
+
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self._cols.keys())
+
+
+    def append(self, time_ns: int, **values) -> None:
+        """
+        Append a row.
+
+        Args:
+            time_ns (int): The timestamp of the row, in nanoseconds.
+            **values: The value of each column in the row.  Every column must
+                be given.
+        """
+        i = self._len
+        if i == len(self._times):
+            self._grow()
+        self._times[i] = time_ns
+        for name, col in self._cols.items():
+            col[i] = values[name]
+        self._len = i + 1
+
+
+    def append_row(self, time_ns: int, values: tuple) -> None:
+        """
+        Append a row, given as a tuple of values in the order of `columns`.
+        This is a faster alternative to `append` for recording on every tick.
+
+        Args:
+            time_ns (int): The timestamp of the row, in nanoseconds.
+            values (tuple): The value of each column in the row.
+        """
+        i = self._len
+        if i == len(self._times):
+            self._grow()
+        self._times[i] = time_ns
+        for col, value in zip(self._col_list, values):
+            col[i] = value
+        self._len = i + 1
+
+
+    def as_df(self) -> pd.DataFrame:
+        """
+        Get the rows recorded so far as a DataFrame, indexed by time.  The
+        DataFrame is a copy, so it is unaffected by later appends.
+        """
+        n = self._len
+        index = pd.DatetimeIndex(self._times[:n].view("datetime64[ns]"), name="time")
+        return pd.DataFrame({name: col[:n].copy() for name, col in self._cols.items()},
+                            index=index)
+
+
+    def to_parquet(self, path: str) -> None:
+        """
+        Write the rows recorded so far to a Parquet file.
+
+        Args:
+            path (str): The path of the file to write.
+        """
+        self.as_df().to_parquet(path)
+
+
+    def _grow(self):
+        capacity = 2 * len(self._times)
+        self._times = np.resize(self._times, capacity)
+        for name, col in self._cols.items():
+            self._cols[name] = np.resize(col, capacity)
+        self._col_list = list(self._cols.values())
@@ -0,0 +1,240 @@
+import asyncio
+import time
+
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class ContractCache:
+    """
+    A cache for contract details and options chains, which rarely change
+    within a trading session but are slow (and rate limited) to request.
+
+    Entries expire after a time to live, and all of them are dropped when the
+    session changes (see `set_session`).  Requests for a key that is already
+    being fetched wait on the fetch in flight instead of starting another, so
+    concurrent identical requests make a single round-trip.  Keeps counts of
+    hits, misses and coalesced requests so that the cache can be tuned.
+    """
+
+    def __init__(self, ttl_s: float = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a `ContractCache`.
+
+        Args:
+            ttl_s (float, optional): How long an entry is valid for, in
+                seconds.  If None, entries are valid until the session
+                changes. Defaults to None.
+            clock (Callable[[], float], optional): Returns the current time in
+                seconds.  A backtest passes its simulated time.
+                Defaults to `time.monotonic`.
+        """
+        self.ttl_s = ttl_s
+        self.clock = clock
+        self.session: Hashable = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        # (value, expiry time) of each entry, and the fetches in flight
+        self._entries: dict[Hashable, tuple[Any, float]] = {}
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key) is not _MISSING
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    def set_session(self, session: Hashable) -> None:
+        """
+        Set the current session (e.g. the trading date), dropping every entry
+        if it differs from the last one set.
+
+        Args:
+            session (Hashable): An identifier of the session.
+        """
+        if session != self.session:
+            self.session = session
+            self.clear()
+
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a value from the cache.
+
+        Args:
+            key (Hashable): The key of the value.
+            default (Any, optional): The value returned if `key` is not in the
+                cache, or has expired. Defaults to None.
+
+        Returns:
+            Any: The cached value, or `default`.
+        """
+        value = self._lookup(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+
+    def put(self, key: Hashable, value: Any, ttl_s: float = None) -> None:
+        """
+        Add a value to the cache.
+
+        Args:
+            key (Hashable): The key of the value.
+            value (Any): The value to cache.
+            ttl_s (float, optional): Overrides the cache's time to live for
+                this entry. Defaults to None.
+        """
+        ttl_s = self.ttl_s if ttl_s is None else ttl_s
+        expiry = float("inf") if ttl_s is None else self.clock() + ttl_s
+        self._entries[key] = (value, expiry)
+
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove a value from the cache."""
+        self._entries.pop(key, None)
+
+
+    def clear(self) -> None:
+        """
+        Remove all values from the cache.  Fetches in flight still complete,
+        but their results are not cached.
+        """
+        self._entries.clear()
+        self._in_flight.clear()
+
+
+    async def get_or_fetch(self, key: Hashable,
+                           fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Get a value from the cache, fetching and caching it if it is missing.
+        If it is already being fetched, wait for that fetch instead.  Errors
+        raised by the fetch are raised to every caller waiting on it, and
+        nothing is cached.
+
+        Args:
+            key (Hashable): The key of the value.
+            fetch (Callable[[], Awaitable[Any]]): Fetches the value.
+
+        Returns:
+            Any: The value.
+        """
+        return (await self.get_or_fetch_many([key], lambda _: _fetch_one(fetch)))[0]
+
+
+    async def get_or_fetch_many(self, keys: list[Hashable],
+                                fetch_many: Callable[[list[Hashable]], Awaitable[list[Any]]]
+                                ) -> list[Any]:
+        """
+        Get several values from the cache, fetching all of the missing ones
+        with a single call.  Keys already being fetched are waited on rather
+        than fetched again.  A fetched value of None means "not found", and is
+        returned but not cached.
+
+        Args:
+            keys (list[Hashable]): The keys of the values.
+            fetch_many (Callable[[list[Hashable]], Awaitable[list[Any]]]):
+                Fetches the values of a list of keys, returning them in the
+                same order.  Returning a different number of values is an
+                error, raised to every caller waiting on those keys.
+
+        Returns:
+            list[Any]: The values, in the order of `keys`.
+        """
+        results = [None] * len(keys)
+        waiting: list[tuple[int, asyncio.Future]] = []
+        to_fetch: dict[Hashable, list[int]] = {}
+        for i, key in enumerate(keys):
+            value = self._lookup(key)
+            if value is not _MISSING:
+                self.hits += 1
+                results[i] = value
+            elif key in to_fetch:
+                self.coalesced += 1
+                to_fetch[key].append(i)
+            elif key in self._in_flight:
+                self.coalesced += 1
+                waiting.append((i, self._in_flight[key]))
+            else:
+                self.misses += 1
+                to_fetch[key] = [i]
+
+        if to_fetch:
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in to_fetch}
+            self._in_flight.update(futures)
+            try:
+                values = await fetch_many(list(to_fetch))
+                if len(values) != len(to_fetch):
+                    raise ValueError(f"fetch_many returned {len(values)} values "
+                                     f"for {len(to_fetch)} keys.")
+            except BaseException as e:
+                for key, future in futures.items():
+                    self._finish(key, future, error=e)
+                raise
+
+            for (key, indexes), value in zip(to_fetch.items(), values):
+                if value is not None and self._in_flight.get(key) is futures[key]:
+                    self.put(key, value)
+                self._finish(key, futures[key], value)
+                for i in indexes:
+                    results[i] = value
+
+        for i, future in waiting:
+            results[i] = await asyncio.shield(future)
+        return results
+
+
+    def stats(self) -> dict[str, int]:
+        """
+        Get the cache's counters.
+
+        Returns:
+            dict[str, int]: The number of entries, hits, misses and requests
+            coalesced with another.
+        """
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        value, expiry = entry
+        if self.clock() >= expiry:
+            del self._entries[key]
+            return _MISSING
+        return value
+
+
+    def _finish(self, key: Hashable, future: asyncio.Future,
+                value: Any = None, error: BaseException = None):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+            # Don't warn about an unretrieved exception if nobody was waiting
+            future.exception()
+        else:
+            future.set_result(value)
+
+
+# Marks a missing entry, since None may be a cached value
+_MISSING = object()
+
+
+async def _fetch_one(fetch: Callable[[], Awaitable[Any]]) -> list[Any]:
+    return [await fetch()]
@@ -0,0 +1,115 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class LRUCache:
+    """
+    A least-recently-used cache that is bounded by the total size (in bytes) 
+    of the values it holds rather than by the number of entries.  Keeps 
+    counts of hits, misses and evictions so that the cache can be tuned.
+    """
+    
+    def __init__(self, max_bytes: int, size_of: Callable[[Any], int]):
+        """
+        Initialize an `LRUCache`.
+
+        Args:
+            max_bytes (int): The maximum total size of the cached values.  
+                Least-recently-used entries are evicted to stay under it.
+            size_of (Callable[[Any], int]): A function that returns the size of
+                a value, in bytes.
+        """
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+    
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Get a value from the cache, marking it as most recently used.
+
+        Args:
+            key (Hashable): The key of the value.
+            default (Any, optional): The value returned if `key` is not in the
+                cache. Defaults to None.
+
+        Returns:
+            Any: The cached value, or `default`.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+    
+    
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Add a value to the cache, then evict least-recently-used values until
+        the cache is back under `max_bytes`.  A value larger than `max_bytes` 
+        is not cached at all.
+
+        Args:
+            key (Hashable): The key of the value.
+            value (Any): The value to cache.
+        """
+        self.pop(key)
+        
+        size = self.size_of(value)
+        if size > self.max_bytes:
+            return
+        
+        self._entries[key] = (value, size)
+        self.num_bytes += size
+        while self.num_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.num_bytes -= evicted_size
+            self.evictions += 1
+            
+    
+    def pop(self, key: Hashable) -> Any:
+        """Remove a value from the cache, returning it (or None)."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self.num_bytes -= entry[1]
+        return entry[0]
+    
+    
+    def clear(self) -> None:
+        """Remove all values from the cache."""
+        self._entries.clear()
+        self.num_bytes = 0
+        
+    
+    def stats(self) -> dict[str, int]:
+        """
+        Get the cache's counters.
+
+        Returns:
+            dict[str, int]: The number of entries, bytes used, hits, misses 
+            and evictions.
+        """
+        return {
+            "entries": len(self._entries),
+            "bytes": self.num_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
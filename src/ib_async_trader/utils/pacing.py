@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+from collections import deque
+from typing import Callable
+
+
+class HistoricalDataPacer:
+    """
+    Limits historical data requests to IB's pacing rules, so that requests
+    issued concurrently wait their turn instead of being rejected with a
+    pacing violation.  Limits both the number of requests outstanding at once
+    and the number started in any rolling window of time.  Use it as an async
+    context manager around each request.
+    """
+
+    def __init__(self, max_concurrent: int = 50, max_requests: int = 60,
+                 window_s: float = 600, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a `HistoricalDataPacer`.  The defaults are IB's limits for
+        bars of 30 seconds or less.
+
+        Args:
+            max_concurrent (int, optional): The maximum number of requests
+                outstanding at once. Defaults to 50.
+            max_requests (int, optional): The maximum number of requests
+                started in any window of `window_s`. Defaults to 60.
+            window_s (float, optional): The length of the rolling window, in
+                seconds. Defaults to 600.
+            clock (Callable[[], float], optional): Returns the current time in
+                seconds. Defaults to `time.monotonic`.
+        """
+        self.max_requests = max_requests
+        self.window_s = window_s
+        self.clock = clock
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+        # Start times of the requests in the current window, oldest first
+        self._request_times: deque[float] = deque()
+
+
+    async def __aenter__(self) -> "HistoricalDataPacer":
+        await self._semaphore.acquire()
+        try:
+            await self._wait_for_window()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return self
+
+
+    async def __aexit__(self, *exc_info) -> None:
+        self._semaphore.release()
+
+
+    async def _wait_for_window(self):
+        while True:
+            now = self.clock()
+            while self._request_times and now - self._request_times[0] >= self.window_s:
+                self._request_times.popleft()
+            if len(self._request_times) < self.max_requests:
+                self._request_times.append(now)
+                return
+            await asyncio.sleep(self._request_times[0] + self.window_s - now)
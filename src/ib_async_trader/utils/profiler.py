@@ -0,0 +1,190 @@
+import cProfile
+import functools
+import os
+import pandas as pd
+import pstats
+import sys
+import threading
+
+from collections import Counter
+from enum import Enum
+from time import perf_counter_ns
+
+
+class ProfileMode(Enum):
+    NONE = 1
+    PHASES = 2
+    CPROFILE = 3
+    SAMPLING = 4
+
+
+class Profiler:
+    """
+    Accumulates wall time and call counts per named phase of a backtest, and
+    optionally runs `cProfile` or a sampling profiler alongside.
+
+    Phases are timed either explicitly (see `add`) or by wrapping the methods
+    of an object (see `instrument`).  Nothing is wrapped or timed unless a
+    `Profiler` is in use, so profiling costs nothing when it is disabled.
+    """
+
+    def __init__(self, mode: ProfileMode = ProfileMode.PHASES,
+                 output_path: str = None, sample_interval_s: float = 0.001):
+        """
+        Initialize a `Profiler`.
+
+        Args:
+            mode (ProfileMode, optional): `PHASES` only times phases.
+                `CPROFILE` and `SAMPLING` also run `cProfile` or a sampling
+                profiler between `start` and `stop`.
+                Defaults to ProfileMode.PHASES.
+            output_path (str, optional): Where to write the `cProfile` stats
+                (readable with `pstats`), or the sampled stacks (in the
+                "collapsed" format used by flame graph tools).  If not given,
+                they are only kept in memory. Defaults to None.
+            sample_interval_s (float, optional): The time between samples when
+                using `SAMPLING`. Defaults to 1ms.
+        """
+        self.mode = mode
+        self.output_path = output_path
+        self.sample_interval_s = sample_interval_s
+
+        # Total nanoseconds and number of calls, per phase
+        self.timers: dict[str, list[int]] = {}
+
+        self.cprofile: cProfile.Profile = None
+        self.samples: Counter[str] = Counter()
+        self._sampler: threading.Thread = None
+        self._stop_sampling = threading.Event()
+        
+        # The (object, method name) of each method wrapped by instrument
+        self._instrumented: list[tuple[object, str]] = []
+
+
+    def add(self, name: str, elapsed_ns: int) -> None:
+        """
+        Add one call of a phase.
+
+        Args:
+            name (str): The name of the phase.
+            elapsed_ns (int): The time the call took, in nanoseconds (e.g. the
+                difference of two `time.perf_counter_ns()` calls).
+        """
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [elapsed_ns, 1]
+        else:
+            timer[0] += elapsed_ns
+            timer[1] += 1
+
+
+    def instrument(self, obj: object, method_names: list[str], label: str) -> None:
+        """
+        Time every call of some of an object's methods, as phases named
+        "<label>.<method name>".  The methods are wrapped on the object itself
+        (not its class), so other instances are unaffected, until `restore` 
+        is called.  Methods the object does not have are skipped.
+
+        Args:
+            obj (object): The object to instrument.
+            method_names (list[str]): The names of the methods to time.
+            label (str): The prefix for the phase names.
+        """
+        for method_name in method_names:
+            method = getattr(obj, method_name, None)
+            if method is None or not callable(method):
+                continue
+            if method_name in vars(obj):
+                # Already overridden on the instance, so it can't be restored
+                continue
+            setattr(obj, method_name, self._wrap(method, f"{label}.{method_name}"))
+            self._instrumented.append((obj, method_name))
+            
+            
+    def restore(self) -> None:
+        """Remove the wrappers added by `instrument`."""
+        for obj, method_name in self._instrumented:
+            delattr(obj, method_name)
+        self._instrumented.clear()
+
+
+    def start(self) -> None:
+        """Start `cProfile` or the sampling profiler, depending on the mode."""
+        match self.mode:
+            case ProfileMode.CPROFILE:
+                self.cprofile = cProfile.Profile()
+                self.cprofile.enable()
+            case ProfileMode.SAMPLING:
+                self._stop_sampling.clear()
+                self._sampler = threading.Thread(
+                    target=self._sample, args=(threading.get_ident(),),
+                    name="backtest-sampler", daemon=True)
+                self._sampler.start()
+
+
+    def stop(self) -> None:
+        """Stop profiling, and write its output if there is an output path."""
+        match self.mode:
+            case ProfileMode.CPROFILE:
+                self.cprofile.disable()
+                if self.output_path:
+                    self.cprofile.dump_stats(self.output_path)
+            case ProfileMode.SAMPLING:
+                self._stop_sampling.set()
+                self._sampler.join()
+                if self.output_path:
+                    with open(self.output_path, "w") as f:
+                        for stack, count in self.samples.most_common():
+                            f.write(f"{stack} {count}\n")
+
+
+    def report(self) -> pd.DataFrame:
+        """
+        Get a summary of the phase timers.
+
+        Returns:
+            pd.DataFrame: One row per phase, sorted by total time, with the
+            number of calls, the total time in milliseconds, the mean time
+            per call in microseconds, and the share of the total time of the
+            top-level phases (those whose name has no ".").
+        """
+        df = pd.DataFrame([(name, calls, total_ns / 1e6, total_ns / calls / 1e3)
+                           for name, (total_ns, calls) in self.timers.items()],
+                          columns=["phase", "calls", "total_ms", "mean_us"])
+        df = df.set_index("phase").sort_values("total_ms", ascending=False)
+        top_level_ms = df.loc[[name for name in df.index if "." not in name], "total_ms"].sum()
+        df["pct"] = 100 * df["total_ms"] / top_level_ms if top_level_ms else 0.0
+        return df
+
+
+    def cprofile_stats(self) -> pstats.Stats:
+        """Get the `cProfile` stats, when using `ProfileMode.CPROFILE`."""
+        return pstats.Stats(self.cprofile)
+
+
+    def _wrap(self, method, name: str):
+        add = self.add
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                add(name, perf_counter_ns() - start)
+        return timed
+
+
+    def _sample(self, thread_id: int):
+        # Periodically record the stack of the thread running the backtest,
+        # outermost frame first, naming each function by where it is defined.
+        while not self._stop_sampling.wait(self.sample_interval_s):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                             f":{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
@@ -0,0 +1,251 @@
+import numpy as np
+import pandas as pd
+
+
+class RingBuffer:
+    """
+    A fixed-capacity, NumPy-backed buffer of timestamped rows.  Storage for
+    every column is allocated up front, and once the buffer is full, appending
+    a row overwrites the oldest one, so memory use stays flat no matter how
+    many rows are appended.
+
+    Each row is written to two slots, `i` and `i + capacity`, so that the rows
+    in the buffer are always contiguous in memory (oldest first).  This lets
+    `as_df` and `column` return views rather than copies.
+    """
+
+    def __init__(self, capacity: int, columns: dict[str, np.dtype]):
+        """
+        Initialize a `RingBuffer`.
+
+        Args:
+            capacity (int): The maximum number of rows held.
+            columns (dict[str, np.dtype]): The name and dtype of each column.
+        """
+        self.capacity = capacity
+        self._times = np.zeros(2 * capacity, dtype=np.int64)
+        self._cols: dict[str, np.ndarray] = {}
+        for name, dtype in columns.items():
+            self.add_column(name, dtype)
+
+        # The number of rows held, and the slot the next row is written to
+        self._len = 0
+        self._end = 0
+
+
+    def __len__(self) -> int:
+        return self._len
+
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self._cols.keys())
+
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes allocated for the buffer's storage."""
+        return self._times.nbytes + sum(c.nbytes for c in self._cols.values())
+
+
+    def dtype(self, name: str) -> np.dtype:
+        """Get the dtype of a column."""
+        return self._cols[name].dtype
+
+
+    def add_column(self, name: str, dtype: np.dtype = np.float64) -> None:
+        """
+        Add a column to the buffer.  Rows already in the buffer are filled
+        with NaN (None for object columns, or zero for other dtypes).
+
+        Args:
+            name (str): The name of the column.
+            dtype (np.dtype, optional): The dtype of the column.
+                Defaults to np.float64.
+        """
+        self._cols[name] = np.full(2 * self.capacity, self._fill_value(dtype),
+                                   dtype=dtype)
+
+
+    def set_dtype(self, name: str, dtype: np.dtype) -> None:
+        """
+        Convert a column to another dtype, e.g. to upcast an integer column
+        so that it can hold NaN.
+
+        Args:
+            name (str): The name of the column.
+            dtype (np.dtype): The new dtype of the column.
+        """
+        self._cols[name] = self._cols[name].astype(dtype)
+
+
+    def append(self, time_ns: int, **values) -> None:
+        """
+        Append a row to the buffer, overwriting the oldest row if it is full.
+        Columns not given in `values` are filled as in `add_column`.
+
+        Args:
+            time_ns (int): The timestamp of the row, in nanoseconds.
+            **values: The value of each column in the row.
+        """
+        i = self._end
+        j = i + self.capacity
+        self._times[i] = self._times[j] = time_ns
+        for name, col in self._cols.items():
+            col[i] = col[j] = values.get(name, self._fill_value(col.dtype))
+        self._end = (i + 1) % self.capacity
+        self._len = min(self._len + 1, self.capacity)
+
+
+    def extend(self, times_ns: np.ndarray, columns: dict[str, np.ndarray]) -> None:
+        """
+        Append many rows at once, overwriting the oldest rows if the buffer
+        fills up.  Columns not given in `columns` are filled as in 
+        `add_column`.
+
+        Args:
+            times_ns (np.ndarray): The timestamps of the rows, in nanoseconds,
+                oldest first.
+            columns (dict[str, np.ndarray]): The values of each column, one 
+                per row.
+        """
+        n = len(times_ns)
+        skip = max(n - self.capacity, 0)
+        slots = (self._end + np.arange(n - skip)) % self.capacity
+        self._times[slots] = self._times[slots + self.capacity] = times_ns[skip:]
+        for name, col in self._cols.items():
+            values = columns[name][skip:] if name in columns \
+                else self._fill_value(col.dtype)
+            col[slots] = values
+            col[slots + self.capacity] = values
+        self._end = (self._end + n - skip) % self.capacity
+        self._len = min(self._len + n - skip, self.capacity)
+
+
+    def drop_since(self, time_ns: int) -> None:
+        """
+        Remove the most recent rows, from the first one at or after a time.
+
+        Args:
+            time_ns (int): The timestamp of the first row to remove, in 
+                nanoseconds.
+        """
+        num_dropped = self._len - int(np.searchsorted(self.times(), time_ns, side="left"))
+        self._end = (self._end - num_dropped) % self.capacity
+        self._len -= num_dropped
+
+
+    def set_last(self, **values) -> None:
+        """
+        Overwrite columns of the most recently appended row.
+
+        Args:
+            **values: The new value of each column to be overwritten.
+        """
+        i = (self._end - 1) % self.capacity
+        for name, value in values.items():
+            col = self._cols[name]
+            col[i] = col[i + self.capacity] = value
+
+
+    def get(self, name: str, bars_ago: int = 0) -> any:
+        """
+        Get the value of a column in the row `bars_ago` rows before the most
+        recently appended one.
+        """
+        if bars_ago >= self._len:
+            raise IndexError(f"Only {self._len} rows in buffer, cannot get {bars_ago} bars ago.")
+        return self._cols[name][self._stop() - 1 - bars_ago]
+
+
+    def get_last(self, name: str) -> any:
+        """Get the value of a column in the most recently appended row."""
+        return self._cols[name][self._stop() - 1]
+
+
+    def last_time(self) -> int:
+        """Get the timestamp (in nanoseconds) of the most recent row."""
+        return int(self._times[self._stop() - 1])
+
+
+    def position_asof(self, time_ns: int) -> tuple[int, bool]:
+        """
+        Find the most recent row at or before a time.
+
+        Args:
+            time_ns (int): The timestamp to search for, in nanoseconds.
+
+        Returns:
+            tuple[int, bool]: The number of rows between the row found and the
+            most recent row (i.e. its "bars ago"), or -1 if there is no such
+            row, and whether the row's timestamp is exactly `time_ns`.
+        """
+        if self._len > 0 and self._times[self._stop() - 1] == time_ns:
+            return 0, True
+        times = self.times()
+        pos = int(np.searchsorted(times, time_ns, side="right")) - 1
+        if pos < 0:
+            return -1, False
+        return len(times) - 1 - pos, bool(times[pos] == time_ns)
+
+
+    def times(self) -> np.ndarray:
+        """Get a view of the timestamps (in nanoseconds), oldest first."""
+        stop = self._stop()
+        return self._times[stop - self._len:stop]
+
+
+    def column(self, name: str) -> np.ndarray:
+        """Get a view of a column, oldest first."""
+        stop = self._stop()
+        return self._cols[name][stop - self._len:stop]
+
+
+    def set_tail(self, name: str, values: np.ndarray) -> None:
+        """
+        Overwrite a column for the last `len(values)` rows.
+
+        Args:
+            name (str): The name of the column.
+            values (np.ndarray): The new values, oldest first.
+        """
+        slots = np.arange(self._end - len(values), self._end) % self.capacity
+        col = self._cols[name]
+        col[slots] = values
+        col[slots + self.capacity] = values
+
+
+    def as_df(self, last_n: int = None) -> pd.DataFrame:
+        """
+        Get the rows in the buffer as a DataFrame, oldest first.  The columns
+        of the DataFrame are views of the buffer, so it is only valid until
+        the buffer is next modified.  Copy it to keep it for longer, or to
+        modify it; writes to the views would only reach one of the two copies
+        of each row.
+
+        Args:
+            last_n (int, optional): Only return the most recent `last_n` rows.
+                Defaults to all rows.
+
+        Returns:
+            pd.DataFrame: The rows, indexed by timestamp.
+        """
+        n = self._len if last_n is None else min(last_n, self._len)
+        stop = self._stop()
+        index = pd.DatetimeIndex(self._times[stop - n:stop].view("datetime64[ns]"))
+        return pd.DataFrame({name: col[stop - n:stop] for name, col in self._cols.items()},
+                            index=index, copy=False)
+
+
+    def _stop(self) -> int:
+        # The slot just past the most recent row, chosen from the two copies
+        # so that all rows in the buffer come before it contiguously.
+        return self._end if self._end >= self._len else self._end + self.capacity
+
+
+    @staticmethod
+    def _fill_value(dtype: np.dtype) -> any:
+        kind = np.dtype(dtype).kind
+        if kind == "f":
+            return np.nan
+        return None if kind == "O" else 0
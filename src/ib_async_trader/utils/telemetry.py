@@ -0,0 +1,220 @@
+import bisect
+import logging
+import os
+
+
+# Bucket upper bounds, in seconds, suitable for latencies from a millisecond
+# up to several ticks.
+DEFAULT_BUCKETS_S = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                     1, 2.5, 5, 10)
+
+
+class Histogram:
+    """
+    A histogram of observed values, with fixed bucket boundaries, in the style
+    of a Prometheus histogram.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS_S):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = float("-inf")
+
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else float("nan")
+
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile, as the upper bound of the bucket it falls in (or
+        the maximum observed, if it falls past the last bucket).
+        """
+        if self.count == 0:
+            return float("nan")
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.bucket_counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return self.max
+
+
+class MetricsSink:
+    """
+    Collects the metrics reported by an engine: histograms of observed values
+    (e.g. latencies) and counters, each optionally labeled (e.g. by stream).
+    The metrics are written somewhere on each `flush`, which subclasses
+    implement.  This base class only keeps them in memory.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS_S):
+        """
+        Initialize a `MetricsSink`.
+
+        Args:
+            buckets (tuple[float, ...], optional): The bucket boundaries of
+                every histogram. Defaults to `DEFAULT_BUCKETS_S`.
+        """
+        self.buckets = buckets
+        self.histograms: dict[tuple[str, tuple], Histogram] = {}
+        self.counters: dict[tuple[str, tuple], float] = {}
+        self.descriptions: dict[str, str] = {}
+
+
+    def describe(self, name: str, description: str) -> None:
+        """Set the help text of a metric."""
+        self.descriptions[name] = description
+
+
+    def observe(self, name: str, value: float, labels: dict[str, str] = None) -> None:
+        """
+        Add an observation to a histogram.
+
+        Args:
+            name (str): The name of the histogram.
+            value (float): The observed value.
+            labels (dict[str, str], optional): The labels of the histogram.
+                Defaults to None.
+        """
+        key = (name, self._label_key(labels))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(self.buckets)
+        histogram.observe(value)
+
+
+    def increment(self, name: str, value: float = 1, labels: dict[str, str] = None) -> None:
+        """
+        Increment a counter.
+
+        Args:
+            name (str): The name of the counter.
+            value (float, optional): The amount to increment by. Defaults to 1.
+            labels (dict[str, str], optional): The labels of the counter.
+                Defaults to None.
+        """
+        key = (name, self._label_key(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+
+    def flush(self) -> None:
+        """Write the metrics collected so far.  Does nothing by default."""
+        pass
+
+
+    @staticmethod
+    def _label_key(labels: dict[str, str]) -> tuple:
+        return tuple(sorted(labels.items())) if labels else ()
+
+
+class LoggingMetricsSink(MetricsSink):
+    """
+    A `MetricsSink` that logs a summary line for each metric on every flush.
+    """
+
+    def __init__(self, logger: logging.Logger = None, level: int = logging.INFO,
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS_S):
+        """
+        Initialize a `LoggingMetricsSink`.
+
+        Args:
+            logger (logging.Logger, optional): The logger to write to.
+                Defaults to the "ib_async_trader.telemetry" logger.
+            level (int, optional): The level to log at.
+                Defaults to logging.INFO.
+            buckets (tuple[float, ...], optional): See `MetricsSink`.
+        """
+        super().__init__(buckets)
+        self.logger = logger or logging.getLogger("ib_async_trader.telemetry")
+        self.level = level
+
+
+    def flush(self) -> None:
+        for (name, labels), h in sorted(self.histograms.items()):
+            self.logger.log(self.level,
+                            "%s%s count=%d mean=%.6f p50<=%.6g p99<=%.6g max=%.6f",
+                            name, _format_labels(labels), h.count, h.mean,
+                            h.quantile(0.5), h.quantile(0.99), h.max)
+        for (name, labels), value in sorted(self.counters.items()):
+            self.logger.log(self.level, "%s%s %g", name, _format_labels(labels), value)
+
+
+class PrometheusTextFileSink(MetricsSink):
+    """
+    A `MetricsSink` that writes every metric to a file in the Prometheus text
+    exposition format on each flush, e.g. for the node exporter's textfile
+    collector.  The file is replaced atomically, so it is never read half
+    written.
+    """
+
+    def __init__(self, path: str, prefix: str = "ib_async_trader_",
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS_S):
+        """
+        Initialize a `PrometheusTextFileSink`.
+
+        Args:
+            path (str): The path of the file to write (usually ending in
+                ".prom").
+            prefix (str, optional): A prefix for the name of every metric.
+                Defaults to "ib_async_trader_".
+            buckets (tuple[float, ...], optional): See `MetricsSink`.
+        """
+        super().__init__(buckets)
+        self.path = path
+        self.prefix = prefix
+
+
+    def flush(self) -> None:
+        lines = []
+        for name in sorted({name for name, _ in self.histograms}):
+            full_name = self.prefix + name
+            lines += self._header(name, full_name, "histogram")
+            for (n, labels), h in sorted(self.histograms.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.bucket_counts):
+                    cumulative += count
+                    lines.append(f"{full_name}_bucket{_format_labels(labels, le=bound)} {cumulative}")
+                lines.append(f"{full_name}_bucket{_format_labels(labels, le='+Inf')} {h.count}")
+                lines.append(f"{full_name}_sum{_format_labels(labels)} {h.sum}")
+                lines.append(f"{full_name}_count{_format_labels(labels)} {h.count}")
+
+        for name in sorted({name for name, _ in self.counters}):
+            full_name = self.prefix + name
+            lines += self._header(name, full_name, "counter")
+            for (n, labels), value in sorted(self.counters.items()):
+                if n == name:
+                    lines.append(f"{full_name}{_format_labels(labels)} {value}")
+
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+    def _header(self, name: str, full_name: str, metric_type: str) -> list[str]:
+        lines = []
+        if name in self.descriptions:
+            lines.append(f"# HELP {full_name} {self.descriptions[name]}")
+        lines.append(f"# TYPE {full_name} {metric_type}")
+        return lines
+
+
+def _format_labels(labels: tuple, **extra) -> str:
+    items = list(labels) + [(k, v) for k, v in extra.items()]
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
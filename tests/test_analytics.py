@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ib_async_trader import analytics
+
+
+def make_equity(n: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return 10000 * np.cumprod(1 + rng.normal(0.0005, 0.01, n))
+
+
+def test_metrics_match_loops():
+    equity = make_equity(500, 1)
+    rets = analytics.returns(equity)
+    
+    expected_rets = [equity[i] / equity[i - 1] - 1 for i in range(1, len(equity))]
+    assert np.allclose(rets, expected_rets)
+    
+    expected_sharpe = np.mean(rets) / np.std(rets, ddof=1) * np.sqrt(252)
+    assert np.isclose(analytics.sharpe_ratio(rets), expected_sharpe)
+    
+    downside = np.sqrt(np.mean([min(r, 0) ** 2 for r in rets]))
+    assert np.isclose(analytics.sortino_ratio(rets), np.mean(rets) / downside * np.sqrt(252))
+    
+    peak, worst = equity[0], 0
+    for e in equity:
+        peak = max(peak, e)
+        worst = min(worst, e / peak - 1)
+    assert np.isclose(analytics.max_drawdown(equity), worst)
+    
+    window = 20
+    rolling = analytics.rolling_sharpe_ratio(rets, window)
+    assert np.isnan(rolling[:window - 1]).all()
+    for i in [window - 1, 100, len(rets) - 1]:
+        w = rets[i - window + 1:i + 1]
+        assert np.isclose(rolling[i], np.mean(w) / np.std(w, ddof=1) * np.sqrt(252))
+        
+    rolling_dd = analytics.rolling_drawdown(equity, window)
+    assert np.isclose(rolling_dd[200], equity[200] / equity[181:201].max() - 1)
+
+
+def test_summarize_batch_matches_summarize():
+    curves = [pd.DataFrame({"equity": make_equity(n, seed)}) 
+              for seed, n in enumerate([300, 250, 400])]
+    batch = analytics.summarize_batch(curves)
+    
+    assert len(batch) == 3
+    for i, curve in enumerate(curves):
+        single = analytics.summarize(curve)
+        for name, value in batch.iloc[i].items():
+            assert np.isclose(value, single[name])
+
+
+def test_trade_stats():
+    trades = pd.DataFrame({"realized_pnl": [0, 100, 0, -50, 25, 0],
+                           "cash_effect": [-1000, 1100, -1000, 950, 1025, -500]})
+    stats = analytics.trade_stats(trades)
+    
+    assert stats["num_trades"] == 3
+    assert stats["win_rate"] == 2 / 3
+    assert stats["profit_factor"] == 125 / 50
+    assert stats["largest_loss"] == -50
+    assert np.isclose(stats["expectancy"], 75 / 3)
+    assert analytics.turnover(trades, np.full(10, 5575.0)) == 1.0
+
+
+def test_rolling_ratios_short_and_padded_returns():
+    rets = analytics.returns(make_equity(30, 2))
+    
+    # A window longer than the data has no full windows
+    assert np.isnan(analytics.rolling_sharpe_ratio(rets, 50)).all()
+    assert np.isnan(analytics.rolling_sortino_ratio(rets, 50)).all()
+    
+    # A window of one return has no variance to divide by
+    for rolling in [analytics.rolling_sharpe_ratio, analytics.rolling_sortino_ratio]:
+        with pytest.raises(ValueError):
+            rolling(rets, 1)
+    
+    # Returns padded with NaN (e.g. curves of different lengths stacked into
+    # columns) give the same ratios as unpadded ones, and NaN for windows 
+    # that include padding
+    window = 10
+    padded = np.full((40, 2), np.nan)
+    padded[:len(rets), 0] = rets
+    padded[5:5 + len(rets), 1] = rets
+    for rolling in [analytics.rolling_sharpe_ratio, analytics.rolling_sortino_ratio]:
+        expected = rolling(rets, window)
+        result = rolling(padded, window)
+        assert np.allclose(result[:len(rets), 0], expected, equal_nan=True)
+        assert np.allclose(result[5:5 + len(rets), 1], expected, equal_nan=True)
+        assert np.isnan(result[len(rets):, 0]).all()
+        assert np.isnan(result[:5 + window - 1, 1]).all()
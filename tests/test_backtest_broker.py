@@ -0,0 +1,120 @@
+import asyncio
+import os 
+import sqlite3
+
+from datetime import datetime
+from ib_async_trader import *
+
+TESTS_PATH = os.path.dirname(os.path.realpath(__file__))
+
+
+def make_broker(last_trade_date: str) -> tuple[BacktestBroker, DataFile]:
+    contract = ib.Future(symbol="ES", 
+                    lastTradeDateOrContractMonth=last_trade_date, 
+                    exchange="CME", multiplier=50)
+    data = DataFile(contract, f"{TESTS_PATH}/sample_es_data.csv")
+    broker = BacktestBroker({"ES": data}, 1_000_000)
+    broker.initialize(data.as_df().index[0])
+    return broker, data
+
+
+def test_backtest_broker_executes_every_open_trade():
+    broker, data = make_broker("20241220")
+    
+    # Every trade that can execute does so in the same update, rather than
+    # every other one being skipped
+    for _ in range(3):
+        broker.place_order(data.contract, ib.MarketOrder("BUY", 1))
+    broker.update()
+    
+    assert broker.get_open_trades() == []
+    positions = broker.get_positions()
+    assert len(positions) == 1
+    assert positions[0].position == 3
+    
+    # Closing the position removes it
+    broker.place_order(data.contract, ib.MarketOrder("SELL", 3))
+    broker.update()
+    assert broker.get_positions() == []
+
+
+def test_backtest_broker_expires_positions():
+    broker, data = make_broker("20240620")
+    index = data.as_df().index
+    
+    broker.place_order(data.contract, ib.MarketOrder("BUY", 1))
+    broker.update()
+    assert len(broker.get_positions()) == 1
+    
+    # An order that can't fill is left open until the position expires
+    limit = broker.place_order(data.contract, ib.LimitOrder("BUY", 1, 1.0))
+    broker.update()
+    assert broker.get_open_trades() == [limit]
+    
+    expiry = index[index.searchsorted(pd.Timestamp("2024-06-20 16:00"))]
+    data.set_time(expiry)
+    broker.time_now = expiry
+    broker.update()
+    assert broker.get_positions() == []
+    assert broker.get_open_trades() == []
+    assert limit.log[-1].status == "Cancelled"
+
+
+def test_backtest_broker_historical_chain_follows_quote_time(tmp_path):
+    # The 0DTE options are quoted until they expire at 16:00, after which 
+    # only the next day's are
+    expire_0dte = int(datetime(2024, 6, 20, 16).timestamp())
+    expire_1dte = int(datetime(2024, 6, 21, 16).timestamp())
+    before = datetime(2024, 6, 20, 15, 59)
+    after = datetime(2024, 6, 20, 16, 1)
+    quotes = pd.DataFrame({
+        "QUOTE_UNIXTIME": [int(before.timestamp())] * 2 + [int(after.timestamp())],
+        "EXPIRE_UNIX": [expire_0dte, expire_1dte, expire_1dte],
+        "STRIKE": [5500.0] * 3,
+    })
+    db_path = tmp_path / "quotes.db"
+    with sqlite3.connect(db_path) as conn:
+        quotes.to_sql("quotes", conn, index=False)
+    
+    contract = ib.Future(symbol="ES", lastTradeDateOrContractMonth="20241220", 
+                         exchange="CME", multiplier=50)
+    data = DataFile(contract, f"{TESTS_PATH}/sample_es_data.csv",
+                    options_model=OptionsModelType.HISTORICAL_DATA,
+                    historical_options_path=str(db_path))
+    broker = BacktestBroker({"ES": data}, 1_000_000)
+    broker.initialize(before)
+    
+    chains = asyncio.run(broker.get_options_chain(contract, days_ahead=2))
+    assert list(chains[0].expirations) == ["20240620", "20240621"]
+    
+    broker.time_now = after
+    chains = asyncio.run(broker.get_options_chain(contract, days_ahead=2))
+    assert list(chains[0].expirations) == ["20240621"]
+
+
+def test_backtest_broker_tracks_trades_across_qualification():
+    broker, data = make_broker("20240620")
+    index = data.as_df().index
+    contract = ib.Future(symbol="ES", lastTradeDateOrContractMonth="20240620", 
+                         exchange="CME", multiplier=50)
+    cancelled = []
+    
+    # Qualifying a contract after its orders are placed must not lose track
+    # of them
+    buy = broker.place_order(contract, ib.MarketOrder("BUY", 1),
+                             cancel_event=cancelled.append)
+    limit = broker.place_order(contract, ib.LimitOrder("BUY", 1, 1.0),
+                               cancel_event=cancelled.append)
+    asyncio.run(broker.qualify_contracts(contract))
+    broker.update()
+    assert broker.get_open_trades() == [limit]
+    assert len(broker.get_positions()) == 1
+    
+    expiry = index[index.searchsorted(pd.Timestamp("2024-06-20 16:00"))]
+    data.set_time(expiry)
+    broker.time_now = expiry
+    broker.update()
+    assert broker.get_positions() == []
+    assert broker.get_open_trades() == []
+    assert cancelled == [limit]
+    assert buy.log[-1].status == "Filled"
@@ -29,3 +29,98 @@ def test_backtest_engine():
                        parse_dates=["date"])
     engine = BacktestEngine(strat, data)
     engine.run()
+        
+
+class TickCountStrat(Strategy):
+    
+    def __init__(self):
+        super().__init__()
+        self.tick_times = []
+        
+    
+    async def tick(self):
+        self.tick_times.append(self.time_now)
+        
+
+def test_backtest_engine_data_index_clock():
+    contract = ib.Future(symbol="ES", 
+                    lastTradeDateOrContractMonth="202412", 
+                    exchange="CME", multiplier=50)
+    data = DataFile(contract, f"{TESTS_PATH}/sample_es_data.csv")
+    index = data.as_df().index
+    
+    strat = TickCountStrat()
+    engine = BacktestEngine(strat, {"ES": data}, None, index[0], index[-1],
+                            clock_type=ClockType.DATA_INDEX)
+    engine.run()
+    
+    assert strat.tick_times == list(index)
+
+
+class BuyOnceStrat(Strategy):
+    
+    def __init__(self, contract: ib.Contract):
+        super().__init__()
+        self.contract = contract
+        self.num_ticks = 0
+        
+    
+    async def tick(self):
+        if self.num_ticks == 10:
+            self.broker.place_order(self.contract, ib.MarketOrder("BUY", 2))
+        elif self.num_ticks == 100:
+            self.broker.place_order(self.contract, ib.MarketOrder("SELL", 1))
+        self.num_ticks += 1
+        
+
+def test_backtest_engine_records_equity_curve_and_trades(tmp_path):
+    contract = ib.Future(symbol="ES", 
+                    lastTradeDateOrContractMonth="20241220", 
+                    exchange="CME", multiplier=50)
+    data = DataFile(contract, f"{TESTS_PATH}/sample_es_data.csv")
+    df = data.as_df()
+    
+    engine = BacktestEngine(BuyOnceStrat(contract), {"ES": data}, None, 
+                            df.index[0], df.index[-1], start_cash=1_000_000,
+                            clock_type=ClockType.DATA_INDEX)
+    curve, trades = engine.run()
+    
+    assert curve.index.equals(df.index)
+    assert list(trades["quantity"]) == [2, -1]
+    assert list(trades["price"]) == [df["close"].iloc[10], df["close"].iloc[100]]
+    assert trades["realized_pnl"].iloc[1] == 50 * (df["close"].iloc[100] - df["close"].iloc[10])
+    
+    # One contract is still held, marked at the last close
+    last = curve.iloc[-1]
+    assert last["market_value"] == 50 * df["close"].iloc[-1]
+    assert last["exposure"] == last["market_value"]
+    assert np.isclose(last["realized_pnl"] + last["unrealized_pnl"], 
+                      last["equity"] - 1_000_000)
+    
+    engine.save_results(str(tmp_path))
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "equity_curve.parquet"), curve)
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "trades.parquet"), trades)
+
+
+def test_backtest_engine_profile_report(tmp_path):
+    contract = ib.Future(symbol="ES", 
+                    lastTradeDateOrContractMonth="20241220", 
+                    exchange="CME", multiplier=50)
+    data = DataFile(contract, f"{TESTS_PATH}/sample_es_data.csv")
+    index = data.as_df().index
+    
+    engine = BacktestEngine(BuyOnceStrat(contract), {"ES": data}, None, 
+                            index[0], index[-1], start_cash=1_000_000,
+                            clock_type=ClockType.DATA_INDEX,
+                            profile=ProfileMode.CPROFILE,
+                            profile_path=str(tmp_path / "backtest.prof"))
+    engine.run()
+    report = engine.profile_report()
+    
+    for phase in ["clock", "set_time", "tick", "broker.update", "record"]:
+        assert report.loc[phase, "calls"] == len(index)
+    assert report.loc["broker._execute_trade", "calls"] == 2
+    assert (tmp_path / "backtest.prof").exists()
+    
+    # The instrumented methods are restored afterwards
+    assert "get" not in vars(data) and "update" not in vars(engine.broker)
@@ -0,0 +1,90 @@
+import os 
+from ib_async_trader import *
+
+TESTS_PATH = os.path.dirname(os.path.realpath(__file__))
+
+
+class BuyAfterStrat(Strategy):
+    
+    def __init__(self, bars_before_buy: int):
+        super().__init__()
+        if bars_before_buy == -2:
+            # Kill the worker process, as a crash in native code would
+            os._exit(1)
+        if bars_before_buy < 0:
+            raise ValueError("bars_before_buy must not be negative")
+        self.bars_before_buy = bars_before_buy
+        self.num_ticks = 0
+        
+        
+    def on_data_update(self, data_id, df):
+        # Modify the (memory-mapped) data in place
+        df.loc[df.index[0], "volume"] = df["volume"].iloc[0]
+        return df
+        
+    
+    async def tick(self):
+        if self.num_ticks == self.bars_before_buy:
+            self.broker.place_order(self.datas["ES"].contract, 
+                                    ib.MarketOrder("BUY", 1))
+        self.num_ticks += 1
+        
+
+class CountTicksStrat(Strategy):
+    
+    def __init__(self, unused: int):
+        super().__init__()
+        self.num_ticks = 0
+        
+        
+    async def tick(self):
+        self.num_ticks += 1
+        
+        
+def count_ticks(engine: BacktestEngine) -> dict:
+    return {"num_ticks": engine.strategy.num_ticks}
+
+
+def test_backtest_sweep_isolates_failures():
+    contract = ib.Future(symbol="ES", 
+                    lastTradeDateOrContractMonth="20241220", 
+                    exchange="CME", multiplier=50)
+    data = DataFile(contract, f"{TESTS_PATH}/sample_es_data.csv")
+    index = data.as_df().index
+    
+    sweep = BacktestSweep(BuyAfterStrat, {"bars_before_buy": [-1, 0, 10, -2, 5]}, 
+                          {"ES": data}, None, index[0], index[-1],
+                          start_cash=1_000_000, clock_type=ClockType.DATA_INDEX,
+                          max_workers=2)
+    results = sweep.run()
+    
+    assert list(results["bars_before_buy"]) == [-1, 0, 10, -2, 5]
+    assert "bars_before_buy must not be negative" in results["error"][0]
+    assert "died" in results["error"][3]
+    ok = [1, 2, 4]
+    assert results["error"][ok].isna().all()
+    assert (results["open_positions"][ok] == 1).all()
+    
+    # Each run bought one contract at the close of a different bar
+    closes = data.as_df()["close"]
+    assert results["cash_balance"][1] == 1_000_000 - 50 * closes.iloc[0]
+    assert results["cash_balance"][2] == 1_000_000 - 50 * closes.iloc[10]
+    
+    
+def test_backtest_sweep_reads_chunked_data_in_full():
+    contract = ib.Future(symbol="ES", 
+                    lastTradeDateOrContractMonth="20241220", 
+                    exchange="CME", multiplier=50)
+    index = DataFile(contract, f"{TESTS_PATH}/sample_es_data.csv").as_df().index
+    data = ChunkedDataFile(contract, f"{TESTS_PATH}/sample_es_data.csv", 
+                           chunksize=7, lookback=3)
+    
+    # Every run sees all of the data, not just the chunks in memory
+    sweep = BacktestSweep(CountTicksStrat, {"unused": [0, 1]}, {"ES": data}, 
+                          None, index[0], index[-1], 
+                          clock_type=ClockType.DATA_INDEX, 
+                          metrics=count_ticks, max_workers=2)
+    results = sweep.run()
+    assert results["error"].isna().all()
+    assert (results["num_ticks"] == len(index)).all()
+
@@ -0,0 +1,73 @@
+import asyncio
+
+from datetime import datetime, timedelta, timezone
+
+from ib_async_trader import *
+
+
+def make_bars(start: datetime, n: int) -> list[CachedBar]:
+    return [CachedBar(start + timedelta(seconds=5 * i), 100 + i, 101 + i, 
+                      99 + i, 100.5 + i, 10) for i in range(n)]
+
+
+class FakeIB:
+    """Just enough of `ib_async.IB` to start a data stream."""
+    
+    def __init__(self, history: list[CachedBar]):
+        self.history = history
+        self.durations = []
+        
+        
+    async def qualifyContractsAsync(self, *contracts):
+        for c in contracts:
+            c.conId = 42
+        return list(contracts)
+    
+    
+    async def reqHistoricalDataAsync(self, contract, durationStr, **kwargs):
+        self.durations.append(durationStr)
+        return ib.BarDataList(self.history)
+
+
+def test_bar_cache_round_trip(tmp_path):
+    cache = BarCache(str(tmp_path / "bars.sqlite"))
+    start = datetime(2026, 10, 16, 14, 30, tzinfo=timezone.utc)
+    bars = make_bars(start, 10)
+    cache.append("ES", bars[:6])
+    cache.append("ES", bars[4:])
+    cache.append("NQ", bars)
+    
+    assert cache.load("ES", start) == bars
+    cache.prune("ES", bars[5].date)
+    assert cache.load("ES", start) == bars[5:]
+    assert len(cache.load("NQ", start)) == 10
+    
+    
+def test_data_stream_warm_start(tmp_path):
+    cache = BarCache(str(tmp_path / "bars.sqlite"))
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    start = now - timedelta(minutes=10)
+    start -= timedelta(seconds=start.second % 60)
+    bars = make_bars(start, 120)
+    
+    # A stream that has seen the first 100 bars before, so it only needs to
+    # request the rest from IB (which overlap the cached bars a little)
+    cache.append("42:FUT:TRADES", bars[:100])
+    fake = FakeIB(bars[90:])
+    data = DataStream(ib.Future(symbol="ES"), 60, bar_cache=cache)
+    
+    async def main():
+        await data.initialize(fake)
+        await data._on_update(data._five_sec_bars, True)
+        data._flush_task.cancel()
+        
+    asyncio.run(main())
+    assert fake.durations[0].endswith(" S")
+    assert int(fake.durations[0].split()[0]) < 86400
+    
+    # Every bar was folded exactly once, and the new ones were cached
+    df = data.as_df()
+    assert df["volume"].sum() == 10 * 119
+    assert df["close"].iloc[-1] == bars[-2].close
+    data.flush_bar_cache()
+    assert cache.load("42:FUT:TRADES", start) == bars[:119]
@@ -0,0 +1,82 @@
+import numpy as np
+
+from ib_async_trader.utils.black_scholes import BlackScholes
+
+
+def test_greeks_match_scalar_path():
+    S, t, sigma = 5000.0, 30 / 365, 0.15
+    K = np.linspace(4500, 5500, 21)
+    
+    g = BlackScholes.greeks(S, K, t, sigma)
+    for i, k in enumerate(K):
+        c, p = BlackScholes.call_put_price(S, k, t, sigma)
+        dc, dp = BlackScholes.call_put_delta(S, k, t, sigma)
+        assert np.isclose(g.call[i], c)
+        assert np.isclose(g.put[i], p)
+        assert np.isclose(g.call_delta[i], dc)
+        assert np.isclose(g.put_delta[i], dp)
+        
+
+def test_scalar_and_batch_agree_with_dividend_yield():
+    S, t, sigma, r, q = 5000.0, 0.5, 0.2, 0.05, 0.03
+    K = np.array([4500.0, 5000.0, 5500.0])
+    
+    c_batch, p_batch = BlackScholes.call_put_price_batch(S, K, t, sigma, r, q)
+    g = BlackScholes.greeks(S, K, t, sigma, r, q)
+    for i, k in enumerate(K):
+        c, p = BlackScholes.call_put_price(S, k, t, sigma, r, q)
+        dc, dp = BlackScholes.call_put_delta(S, k, t, sigma, r, q)
+        assert np.isclose(c, c_batch[i]) and np.isclose(p, p_batch[i])
+        assert np.isclose(dc, g.call_delta[i]) and np.isclose(dp, g.put_delta[i])
+        
+        # Put-call parity, with the underlying discounted by the yield
+        assert np.isclose(c - p, S * np.exp(-q * t) - k * np.exp(-r * t))
+        
+
+def test_greeks_match_finite_differences():
+    S, K, t, sigma, r = 5000.0, np.array([4900.0, 5000.0, 5100.0]), 0.1, 0.2, 0.05
+    h = 1e-4
+    g = BlackScholes.greeks(S, K, t, sigma, r)
+    
+    dS = 0.5
+    c_up, _ = BlackScholes.call_put_price_batch(S + dS, K, t, sigma, r)
+    c_dn, _ = BlackScholes.call_put_price_batch(S - dS, K, t, sigma, r)
+    assert np.allclose(g.gamma, (c_up - 2 * g.call + c_dn) / dS**2, rtol=1e-3)
+    
+    c_up, _ = BlackScholes.call_put_price_batch(S, K, t, sigma + h, r)
+    assert np.allclose(g.vega, (c_up - g.call) / h, rtol=1e-3)
+    
+    c_up, p_up = BlackScholes.call_put_price_batch(S, K, t + h, sigma, r)
+    assert np.allclose(g.call_theta, -(c_up - g.call) / h, rtol=1e-3)
+    assert np.allclose(g.put_theta, -(p_up - g.put) / h, rtol=1e-3)
+    
+    c_up, p_up = BlackScholes.call_put_price_batch(S, K, t, sigma, r + h)
+    assert np.allclose(g.call_rho, (c_up - g.call) / h, rtol=1e-3)
+    assert np.allclose(g.put_rho, (p_up - g.put) / h, rtol=1e-3)
+        
+
+def test_implied_vol_round_trip():
+    S, t = 5000.0, np.array([[2 / 365], [30 / 365], [1.0]])
+    K = np.linspace(4000, 6000, 41)
+    sigma = 0.1 + 0.2 * (K / 6000)
+    c, p = BlackScholes.call_put_price_batch(S, K, t, sigma, r=0.05)
+    
+    # Use OTM options, which are the ones quoted in practice
+    is_call = np.broadcast_to(K >= S, c.shape)
+    prices = np.where(is_call, c, p)
+    rights = np.where(is_call, "C", "P")
+    
+    iv, converged = BlackScholes.implied_vol(prices, S, K, t, rights, r=0.05)
+    
+    # Prices that round to zero have no meaningful implied volatility
+    solvable = prices > 1E-6
+    assert converged[solvable].all()
+    assert np.allclose(iv[solvable], np.broadcast_to(sigma, iv.shape)[solvable], 
+                       atol=1E-4)
+    
+    
+def test_implied_vol_outside_arbitrage_bounds():
+    iv, converged = BlackScholes.implied_vol([0.0, 6000.0], 5000.0, 5000.0, 
+                                             0.1, "C")
+    assert not converged.any()
+    assert np.isnan(iv).all()
@@ -0,0 +1,98 @@
+import asyncio
+
+from ib_async_trader.utils.contract_cache import ContractCache
+
+
+class FakeClock:
+    
+    def __init__(self):
+        self.now = 0.0
+        
+        
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_contract_cache_ttl_and_session():
+    clock = FakeClock()
+    cache = ContractCache(ttl_s=10, clock=clock)
+    cache.set_session("day 1")
+    cache.put("a", 1)
+    cache.put("b", 2, ttl_s=100)
+    
+    clock.now = 9
+    assert cache.get("a") == 1
+    clock.now = 10
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    
+    cache.set_session("day 1")
+    assert "b" in cache
+    cache.set_session("day 2")
+    assert "b" not in cache
+    
+
+def test_contract_cache_coalesces_fetches():
+    cache = ContractCache()
+    fetched = []
+    
+    async def fetch_many(keys):
+        fetched.append(keys)
+        await asyncio.sleep(0)
+        return [None if key == "missing" else key.upper() for key in keys]
+    
+    async def main():
+        return await asyncio.gather(
+            cache.get_or_fetch_many(["a", "b", "a"], fetch_many),
+            cache.get_or_fetch_many(["b", "c", "missing"], fetch_many),
+            cache.get_or_fetch("a", lambda: fetch_many(["never"])))
+    
+    first, second, third = asyncio.run(main())
+    assert first == ["A", "B", "A"]
+    assert second == ["B", "C", None]
+    assert third == "A"
+    assert fetched == [["a", "b"], ["c", "missing"]]
+    assert cache.stats() == {"entries": 3, "hits": 0, "misses": 4, "coalesced": 3}
+    
+    # Found values are cached, missing ones are fetched again
+    assert asyncio.run(cache.get_or_fetch_many(["a", "missing"], fetch_many)) == ["A", None]
+    assert fetched[-1] == ["missing"]
+    
+    
+def test_contract_cache_fetch_errors_are_not_cached():
+    cache = ContractCache()
+    
+    async def fail():
+        await asyncio.sleep(0)
+        raise ConnectionError("disconnected")
+    
+    async def ok():
+        return "value"
+    
+    async def main():
+        return await asyncio.gather(cache.get_or_fetch("a", fail), 
+                                    cache.get_or_fetch("a", fail),
+                                    return_exceptions=True)
+    
+    results = asyncio.run(main())
+    assert all(isinstance(r, ConnectionError) for r in results)
+    assert asyncio.run(cache.get_or_fetch("a", ok)) == "value"
+    
+    
+def test_contract_cache_short_fetch_result_does_not_hang():
+    cache = ContractCache()
+    
+    async def fetch_many(keys):
+        await asyncio.sleep(0)
+        return [key.upper() for key in keys[:-1]]
+    
+    async def main():
+        return await asyncio.wait_for(
+            asyncio.gather(cache.get_or_fetch_many(["a", "b"], fetch_many),
+                           cache.get_or_fetch("b", lambda: fetch_many(["never"])),
+                           return_exceptions=True), 
+            timeout=1)
+    
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert len(cache) == 0
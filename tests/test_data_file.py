@@ -0,0 +1,134 @@
+import numpy as np
+import os 
+import pandas as pd
+from datetime import timedelta
+from ib_async_trader import *
+
+TESTS_PATH = os.path.dirname(os.path.realpath(__file__))
+
+
+def make_data_file() -> DataFile:
+    contract = ib.Future(symbol="ES", 
+                    lastTradeDateOrContractMonth="202412", 
+                    exchange="CME", multiplier=50)
+    return DataFile(contract, f"{TESTS_PATH}/sample_es_data.csv")
+
+
+def test_data_file_get_matches_dataframe():
+    data = make_data_file()
+    df = data.as_df()
+    
+    for i in [0, 1, 10, len(df) - 1]:
+        data.set_time(df.index[i])
+        assert data.exists()
+        assert data.get("close") == df.iloc[i]["close"]
+        assert data.get("iv", bars_ago=1) == df.iloc[i - 1]["iv"]
+        assert data.get_last("close") == df.iloc[i]["close"]
+
+
+def test_data_file_get_between_bars():
+    data = make_data_file()
+    df = data.as_df()
+    
+    # Between two bars, get returns None but get_last returns the prior bar
+    data.set_time(df.index[5] + timedelta(seconds=1))
+    assert not data.exists()
+    assert data.get("close") is None
+    assert data.get_last("close") == df.iloc[5]["close"]
+    
+    # Moving backwards in time still finds the correct bar
+    data.set_time(df.index[2])
+    assert data.get("close") == df.iloc[2]["close"]
+
+    
+def test_data_file_unsorted_data():
+    data = make_data_file()
+    df = data.as_df()
+    
+    # Out of order data (from a file, from_df, or on_update) is sorted by time
+    unsorted = DataFile.from_df(data.contract, df.sample(frac=1, random_state=0))
+    unsorted.initialize(lambda data_id, df: df.iloc[::-1])
+    for i in [1, 10, len(df) - 1]:
+        unsorted.set_time(df.index[i])
+        assert unsorted.get("close") == df.iloc[i]["close"]
+        assert unsorted.get("close", bars_ago=1) == df.iloc[i - 1]["close"]
+        assert unsorted.get_last("close") == df.iloc[i]["close"]
+    
+    
+def test_data_file_binary_cache(tmp_path):
+    contract = ib.Future(symbol="ES", 
+                    lastTradeDateOrContractMonth="202412", 
+                    exchange="CME", multiplier=50)
+    csv_path = tmp_path / "es.csv"
+    csv_path.write_text(open(f"{TESTS_PATH}/sample_es_data.csv").read())
+    cache_dir = tmp_path / "cache"
+    
+    uncached = DataFile(contract, str(csv_path)).as_df()
+    assert not cache_dir.exists()
+    first = DataFile(contract, str(csv_path), use_cache=True, cache_dir=str(cache_dir)).as_df()
+    assert len(list(cache_dir.glob("es.csv-*/key.json"))) == 1
+    
+    # The second read is memory-mapped from the cache
+    second_data = DataFile(contract, str(csv_path), use_cache=True, cache_dir=str(cache_dir))
+    second = second_data.as_df()
+    pd.testing.assert_frame_equal(first, uncached)
+    pd.testing.assert_frame_equal(second, uncached)
+    assert not second["close"].values.flags.writeable
+    
+    # ...but on_update can still modify the data in place
+    def double_close(symbol, df):
+        df["close"] *= 2
+        return df
+    second_data.initialize(double_close)
+    second_data.set_time(uncached.index[3])
+    assert second_data.get("close") == 2 * uncached["close"].iloc[3]
+    
+    # Changing the file invalidates the cache
+    with open(csv_path, "a") as f:
+        f.write("\n360,2024-06-21 09:00:00-05:00,1.0,1.0,1.0,1.0,1.0,1.0,1,0.1\n")
+    third = DataFile(contract, str(csv_path), use_cache=True, cache_dir=str(cache_dir)).as_df()
+    assert len(third) == len(uncached) + 1
+    
+    
+def test_data_file_date_only(tmp_path):
+    csv_path = tmp_path / "daily.csv"
+    csv_path.write_text("date,open,high,low,close,volume,iv\n"
+                        "2024-06-20,1,2,0.5,1.5,10,0.2\n"
+                        "2024-06-21,1.5,2,1,1.8,12,0.21\n")
+    data = DataFile(ib.Stock("SPY", "SMART", "USD"), str(csv_path))
+    assert list(data.as_df().index) == [pd.Timestamp("2024-06-20"), 
+                                        pd.Timestamp("2024-06-21")]
+
+
+def test_chunked_data_file_matches_data_file():
+    data = make_data_file()
+    df = data.as_df()
+    chunked = ChunkedDataFile(data.contract, f"{TESTS_PATH}/sample_es_data.csv",
+                              chunksize=7, lookback=3)
+    
+    index = pd.DatetimeIndex([]).append(list(chunked.iter_index_chunks()))
+    assert index.equals(df.index)
+    
+    for i in range(len(df)):
+        chunked.set_time(df.index[i])
+        assert chunked.exists()
+        assert chunked.get("close") == df.iloc[i]["close"]
+        if i >= 3:
+            assert chunked.get("close", bars_ago=3) == df.iloc[i - 3]["close"]
+    
+    # Only the lookback and the current chunk are kept in memory
+    assert len(chunked.as_df()) <= 3 + 7
+    
+    # The clock can be read along with the data, as the engine does, from 
+    # the chunks that the data reads
+    chunked = ChunkedDataFile(data.contract, f"{TESTS_PATH}/sample_es_data.csv",
+                              chunksize=7, lookback=3)
+    chunked.initialize(lambda data_id, df: df.assign(hour=df.index.hour))
+    times = []
+    for chunk in chunked.iter_index_chunks():
+        for t in chunk:
+            chunked.set_time(t)
+            assert chunked.get("close") == df.loc[t, "close"]
+            assert chunked.get("hour") == t.hour
+            times.append(t)
+    assert pd.DatetimeIndex(times).equals(df.index)
@@ -0,0 +1,71 @@
+import asyncio
+import math
+import numpy as np
+import pytest
+
+from ib_async_trader import *
+
+
+def run_stream(data: DataStream, on_update) -> pd.DataFrame:
+    bars = make_synthetic_bars(240)
+    sim = SimulatedIB({"ES": bars}, speed=math.inf, 
+                      replay_from=bars.index[120].to_pydatetime())
+    
+    async def main():
+        await sim.connectAsync()
+        await data.initialize(sim, on_update)
+        await sim.wait_until_replayed()
+        for _ in range(10):
+            await asyncio.sleep(0)
+    
+    asyncio.run(main())
+    return bars
+
+
+def test_data_stream_uses_frame_from_on_update():
+    data = DataStream(ib.Future(symbol="ES", exchange="CME"), 60)
+    num_updates = 0
+    
+    def on_update(data_id, df):
+        nonlocal num_updates
+        num_updates += 1
+        # Modify the bars in place, add columns that are not floats, and 
+        # drop the oldest bar
+        df["close"] *= 2
+        df["signal"] = np.where(df["open"] < df["close"], "buy", "sell")
+        df["count"] = np.arange(len(df))
+        return df.iloc[1:]
+    
+    bars = run_stream(data, on_update)
+    df = data.as_df()
+    assert num_updates > 1
+    
+    # The frame returned by the last update is the data, and on_update is 
+    # always given the unmodified bars
+    assert len(df) == 19
+    assert df["close"].iloc[-1] == 2 * bars["close"].iloc[-2]
+    assert set(df["signal"]) <= {"buy", "sell"}
+    assert list(df["count"]) == list(range(1, 20))
+    data.time_now = df.index[-1]
+    assert data.get("close") == df["close"].iloc[-1]
+    assert data.get("signal", bars_ago=1) == df["signal"].iloc[-2]
+    
+    
+def test_data_stream_new_rows_only():
+    data = DataStream(ib.Future(symbol="ES", exchange="CME"), 60,
+                      on_update_new_rows_only=True)
+    
+    def on_update(data_id, df):
+        df["close"] *= 2
+        df["count"] = len(df)
+        return df
+    
+    bars = run_stream(data, on_update)
+    df = data.as_df()
+    assert len(df) == 20
+    assert df["close"].iloc[-1] == 2 * bars["close"].iloc[-2]
+    assert (df["count"] >= 1).all()
+    
+    # The rows returned must be the ones given
+    with pytest.raises(ValueError, match="same rows"):
+        data._store_user_data(df.iloc[1:], df.index)
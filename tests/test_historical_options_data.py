@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import sqlite3
+
+from ib_async_trader import *
+from datetime import date, datetime, time, timedelta
+
+
+QUOTE_TIMES = [datetime(2024, 6, 20, 9, 30) + i * timedelta(minutes=1) for i in range(5)]
+EXPIRATIONS = [date(2024, 6, 20), date(2024, 6, 21)]
+STRIKES = [5450.0, 5500.0, 5550.0]
+
+
+def make_quotes() -> pd.DataFrame:
+    rows = []
+    for q in QUOTE_TIMES:
+        for e in EXPIRATIONS:
+            for k in STRIKES:
+                rows.append({
+                    "QUOTE_UNIXTIME": int(q.timestamp()),
+                    "QUOTE_READTIME": q.strftime("%Y-%m-%d %H:%M"),
+                    "EXPIRE_DATE": e.strftime("%Y-%m-%d"),
+                    "EXPIRE_UNIX": int(datetime.combine(e, time(16)).timestamp()),
+                    "STRIKE": k,
+                    "C_LAST": np.round(np.random.uniform(1, 100), 2),
+                    "C_VOLUME": float(np.random.randint(0, 100)),
+                    "P_LAST": np.round(np.random.uniform(1, 100), 2),
+                    "P_VOLUME": float(np.random.randint(0, 100)),
+                })
+    # Shuffle the rows and add a duplicate, as the raw data is not sorted
+    df = pd.DataFrame(rows).sample(frac=1, random_state=0)
+    return pd.concat([df, df.iloc[:1]])
+
+
+def test_columnar_store_matches_sql(tmp_path):
+    db_path = str(tmp_path / "quotes.db")
+    with sqlite3.connect(db_path) as conn:
+        make_quotes().to_sql("quotes", conn, index=False)
+    
+    sql = HistoricalOptionsDataSql(db_path)
+    store = HistoricalOptionsDataColumnar.convert(db_path, str(tmp_path / "store"), 
+                                                  chunksize=7)
+    
+    q = QUOTE_TIMES[2]
+    e = datetime.combine(EXPIRATIONS[1], time())
+    for k in STRIKES:
+        assert store.has_quote_data(q, e, k, "C")
+        assert store.get_price_for_option(q, e, k, "P") == \
+            sql.get_price_for_option(q, e, k, "P")
+    assert not store.has_quote_data(q, e, 5600.0, "C")
+    assert not store.has_quote_data(datetime(2024, 6, 21), e, STRIKES[0], "C")
+    
+    chain = store.get_options_chain_as_of(q, days_ahead=1)
+    expected = sql.get_options_chain_as_of(q, days_ahead=1)
+    assert len(chain) == len(expected.drop_duplicates(["EXPIRE_UNIX", "STRIKE"]))
+    assert (chain["QUOTE_UNIXTIME"] == int(q.timestamp())).all()
+    
+    ts = store.get_price_timeseries_for_option(EXPIRATIONS[0], STRIKES[1], "C")
+    expected = sql.get_price_timeseries_for_option(EXPIRATIONS[0], STRIKES[1], "C")
+    assert list(ts.index) == sorted(expected.index)
+    assert np.array_equal(ts["C_LAST"], expected.sort_index()["C_LAST"])
+    
+    
+def test_columnar_store_keeps_columns_null_in_some_chunks(tmp_path):
+    quotes = make_quotes().drop_duplicates(["QUOTE_UNIXTIME", "EXPIRE_UNIX", "STRIKE"])
+    quotes = quotes.sort_values(["QUOTE_UNIXTIME", "EXPIRE_UNIX", "STRIKE"])
+    quotes["C_IV"] = np.where(np.arange(len(quotes)) < 10, None, 0.2)
+    quotes["P_IV"] = np.where(np.arange(len(quotes)) >= 10, None, 0.3)
+    db_path = str(tmp_path / "quotes.db")
+    with sqlite3.connect(db_path) as conn:
+        quotes.astype({"C_IV": float, "P_IV": float}).to_sql("quotes", conn, index=False)
+    
+    # The first chunk has no C_IV and later ones no P_IV, but both are kept
+    store = HistoricalOptionsDataColumnar.convert(db_path, str(tmp_path / "store"), 
+                                                  chunksize=7)
+    assert {"C_IV", "P_IV"} <= set(store.columns)
+    chain = store.get_options_chain_as_of(QUOTE_TIMES[4], days_ahead=1)
+    assert (chain["C_IV"] == 0.2).all() and chain["P_IV"].isna().all()
+    
+    
+def test_sql_price_cache_prefetch_and_eviction(tmp_path):
+    db_path = str(tmp_path / "quotes.db")
+    with sqlite3.connect(db_path) as conn:
+        make_quotes().to_sql("quotes", conn, index=False)
+    
+    sql = HistoricalOptionsDataSql(db_path, prefetch_strike_range=50, 
+                                   prefetch_days=1)
+    e = datetime.combine(EXPIRATIONS[0], time())
+    sql.prefetch(e, 5500.0)
+    
+    # Every contract was prefetched in one query, so these are all hits
+    for k in STRIKES:
+        for e in EXPIRATIONS:
+            assert sql.has_quote_data(QUOTE_TIMES[0], e, k, "C")
+    stats = sql.cache_stats()
+    assert stats["entries"] == len(STRIKES) * len(EXPIRATIONS)
+    assert stats["hits"] == len(STRIKES) * len(EXPIRATIONS)
+    assert stats["misses"] == 0
+    
+    # With room for only two contracts, the least-recently-used is evicted
+    entry_bytes = stats["bytes"] // stats["entries"]
+    sql = HistoricalOptionsDataSql(db_path, cache_max_bytes=2 * entry_bytes)
+    for k in STRIKES:
+        sql.get_price_for_option(QUOTE_TIMES[0], EXPIRATIONS[0], k, "C")
+    stats = sql.cache_stats()
+    assert stats["entries"] == 2
+    assert stats["misses"] == len(STRIKES)
+    assert stats["evictions"] == 1
+    
+    
+def test_sql_creates_indexes_and_probes_quotes(tmp_path):
+    db_path = str(tmp_path / "quotes.db")
+    with sqlite3.connect(db_path) as conn:
+        make_quotes().to_sql("quotes", conn, index=False)
+    
+    sql = HistoricalOptionsDataSql(db_path, create_indexes=True)
+    with sqlite3.connect(db_path) as conn:
+        indexes = [row[1] for row in conn.execute("PRAGMA index_list(quotes)")]
+    assert "idx_quotes_contract" in indexes
+    
+    # Probes cache the contract, so later probes and prices are hits
+    e = datetime.combine(EXPIRATIONS[0], time())
+    assert sql.has_quote_data(QUOTE_TIMES[0], e, STRIKES[0], "C")
+    assert not sql.has_quote_data(QUOTE_TIMES[0], e, 5600.0, "C")
+    assert sql.has_quote_data(QUOTE_TIMES[1], e, STRIKES[0], "P")
+    assert not sql.has_quote_data(datetime(2024, 6, 21), e, STRIKES[0], "C")
+    sql.get_price_for_option(QUOTE_TIMES[2], e, STRIKES[0], "C")
+    stats = sql.cache_stats()
+    assert stats["entries"] == 2
+    assert stats["misses"] == 2
+    assert stats["hits"] == 3
@@ -0,0 +1,114 @@
+import asyncio
+
+from ib_async_trader import *
+
+
+class FakeEvent:
+    
+    def __init__(self):
+        self.handlers = []
+        
+        
+    def __iadd__(self, handler):
+        self.handlers.append(handler)
+        return self
+    
+    
+    def emit(self, *args):
+        for handler in self.handlers:
+            handler(*args)
+
+
+class FakeIB:
+    """Just enough of `ib_async.IB` for the broker's account values."""
+    
+    def __init__(self, values: list[ib.AccountValue]):
+        self.values = values
+        self.accountValueEvent = FakeEvent()
+        self.connectedEvent = FakeEvent()
+        
+    
+    def accountValues(self) -> list[ib.AccountValue]:
+        return self.values
+    
+    
+def account_value(tag: str, value: str, currency: str = "USD") -> ib.AccountValue:
+    return ib.AccountValue(account="DU123", tag=tag, value=value, 
+                           currency=currency, modelCode="")
+
+
+def test_ib_live_trade_broker_account_values():
+    fake = FakeIB([account_value("BuyingPower", "40000"),
+                   account_value("CashBalance", "10000", "BASE"),
+                   account_value("CashBalance", "9000"),
+                   account_value("AccountType", "INDIVIDUAL", "")])
+    broker = IBLiveTradeBroker(fake)
+    
+    # Values that arrived before the broker subscribed are picked up
+    assert broker.get_buying_power() == 40000.0
+    assert broker.get_cash_balance() == 10000.0
+    assert broker.get_account_value("CashBalance", currency="USD") == 9000.0
+    assert broker.get_account_value("AccountType") == "INDIVIDUAL"
+    
+    # A snapshot is unaffected by later updates
+    snapshot = broker.get_account_snapshot()
+    fake.accountValueEvent.emit(account_value("BuyingPower", "35000"))
+    assert snapshot.buying_power == 40000.0
+    assert broker.get_buying_power() == 35000.0
+    
+    latest = broker.get_account_snapshot()
+    assert latest.generation > snapshot.generation
+    assert latest.buying_power == 35000.0
+    assert broker.get_account_snapshot() is latest
+
+
+class FakeQualifyingIB(FakeIB):
+    """Also qualifies contracts and gets options chains, counting requests."""
+    
+    def __init__(self):
+        super().__init__([])
+        self.qualify_requests = []
+        self.chain_requests = 0
+        
+        
+    async def qualifyContractsAsync(self, *contracts):
+        self.qualify_requests.append(len(contracts))
+        await asyncio.sleep(0)
+        for c in contracts:
+            c.conId = hash(c.symbol) % 1000 + 1
+        return [c for c in contracts if c.symbol != "BAD"]
+    
+    
+    async def reqSecDefOptParamsAsync(self, symbol, exchange, sec_type, con_id):
+        self.chain_requests += 1
+        await asyncio.sleep(0)
+        return [ib.OptionChain(exchange, con_id, symbol, "50", ["20261120"], [100.0])]
+    
+
+def test_ib_live_trade_broker_contract_cache():
+    fake = FakeQualifyingIB()
+    broker = IBLiveTradeBroker(fake)
+    
+    async def main():
+        es = ib.Future(symbol="ES", exchange="CME")
+        results = await asyncio.gather(
+            broker.qualify_contracts(es, ib.Future(symbol="BAD")),
+            broker.qualify_contracts(ib.Future(symbol="ES", exchange="CME")),
+            broker.get_options_chain(es),
+            broker.get_options_chain(es))
+        
+        # Already qualified contracts, and fresh copies of them, are hits
+        again = await broker.qualify_contracts(es, ib.Future(symbol="ES", exchange="CME"))
+        return es, results, again
+    
+    es, (first, second, chain1, chain2), again = asyncio.run(main())
+    assert first == [es] and es.conId != 0
+    assert second[0].conId == es.conId
+    assert [c.conId for c in again] == [es.conId, es.conId]
+    assert fake.qualify_requests == [2]
+    assert chain1 is chain2 and fake.chain_requests == 1
+    
+    # Reconnecting invalidates everything
+    fake.connectedEvent.emit()
+    asyncio.run(broker.qualify_contracts(ib.Future(symbol="ES", exchange="CME")))
+    assert fake.qualify_requests == [2, 1]
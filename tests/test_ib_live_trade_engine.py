@@ -0,0 +1,110 @@
+import asyncio
+
+from ib_async_trader import *
+from ib_async_trader.utils.pacing import HistoricalDataPacer
+
+
+class NoOpStrat(Strategy):
+    
+    async def tick(self):
+        pass
+
+
+class FakeEvent:
+    
+    def __iadd__(self, handler):
+        return self
+
+
+class FakeIB:
+    """Just enough of `ib_async.IB` to start data streams."""
+    
+    def __init__(self, history_delay_s: float, unknown_symbols: set = ()):
+        self.history_delay_s = history_delay_s
+        self.unknown_symbols = unknown_symbols
+        self.accountValueEvent = FakeEvent()
+        self.connectedEvent = FakeEvent()
+        self.qualify_requests = []
+        self.history_requests = []
+        self.open_requests = 0
+        self.max_open_requests = 0
+        
+        
+    def accountValues(self):
+        return []
+        
+    
+    async def qualifyContractsAsync(self, *contracts):
+        self.qualify_requests.append([c.symbol for c in contracts])
+        qualified = []
+        for i, c in enumerate(contracts):
+            if c.symbol not in self.unknown_symbols:
+                c.conId = i + 1
+                qualified.append(c)
+        return qualified
+    
+    
+    async def reqHistoricalDataAsync(self, contract, **kwargs):
+        self.history_requests.append(contract.symbol)
+        self.open_requests += 1
+        self.max_open_requests = max(self.max_open_requests, self.open_requests)
+        await asyncio.sleep(self.history_delay_s)
+        self.open_requests -= 1
+        return ib.BarDataList()
+    
+
+
+def test_ib_live_trade_engine_starts_streams_concurrently():
+    symbols = [f"S{i}" for i in range(10)]
+    datas = {s: DataStream(ib.Stock(s, "SMART", "USD"), 60) for s in symbols}
+    engine = IBLiveTradeEngine(NoOpStrat(), datas, 
+                               history_pacer=HistoricalDataPacer(max_concurrent=4))
+    fake = engine.ib = FakeIB(history_delay_s=0.05)
+    engine.strategy.broker = IBLiveTradeBroker(fake)
+    
+    async def main():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await engine._initialize_datas()
+        return loop.time() - start
+    
+    elapsed_s = asyncio.run(main())
+    
+    # One qualification request, and the history requests overlap up to the
+    # pacer's limit (three rounds of 0.05s, rather than ten)
+    assert fake.qualify_requests == [symbols]
+    assert fake.max_open_requests == 4
+    assert elapsed_s < 0.3
+    assert sorted(engine.stream_load_s) == symbols
+    assert all(data._five_sec_bars is not None for data in datas.values())
+    
+    
+def test_ib_live_trade_engine_skips_unqualified_streams():
+    datas = {s: DataStream(ib.Stock(s, "SMART", "USD"), 60) for s in ["A", "B"]}
+    engine = IBLiveTradeEngine(NoOpStrat(), datas)
+    fake = engine.ib = FakeIB(history_delay_s=0, unknown_symbols={"B"})
+    engine.strategy.broker = IBLiveTradeBroker(fake)
+    
+    asyncio.run(engine._initialize_datas())
+    
+    # No history is requested for a contract IB does not know
+    assert fake.history_requests == ["A"]
+    assert list(engine.stream_load_s) == ["A"]
+    assert datas["B"]._five_sec_bars is None
+    
+    
+def test_historical_data_pacer_window():
+    pacer = HistoricalDataPacer(max_requests=3, window_s=0.1)
+    
+    async def request():
+        async with pacer:
+            return asyncio.get_running_loop().time()
+        
+    async def main():
+        start = asyncio.get_running_loop().time()
+        times = await asyncio.gather(*(request() for _ in range(5)))
+        return [t - start for t in times]
+    
+    times = asyncio.run(main())
+    assert max(times[:3]) < 0.05
+    assert min(times[3:]) >= 0.1
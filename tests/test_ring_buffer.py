@@ -0,0 +1,74 @@
+import numpy as np
+
+from ib_async_trader.utils.ring_buffer import RingBuffer
+
+
+def test_ring_buffer_wraps_and_returns_views():
+    buf = RingBuffer(4, {"close": np.float64})
+    for i in range(10):
+        buf.append(i, close=float(i))
+        
+    df = buf.as_df()
+    assert len(buf) == 4
+    assert list(df["close"]) == [6.0, 7.0, 8.0, 9.0]
+    assert list(df.index.asi8) == [6, 7, 8, 9]
+    assert np.shares_memory(df["close"].to_numpy(), buf._cols["close"])
+    
+    assert buf.get("close") == 9.0
+    assert buf.get("close", bars_ago=3) == 6.0
+    assert buf.position_asof(8) == (1, True)
+    assert buf.position_asof(100) == (0, False)
+    assert buf.position_asof(5) == (-1, False)
+    
+    
+def test_ring_buffer_user_columns():
+    buf = RingBuffer(4, {"close": np.float64})
+    for i in range(6):
+        buf.append(i, close=float(i))
+    buf.add_column("signal", np.float64)
+    buf.set_tail("signal", np.array([1.0, 2.0, 3.0]))
+    buf.set_last(close=50.0)
+    
+    df = buf.as_df()
+    assert np.isnan(df["signal"].iloc[0])
+    assert list(df["signal"].iloc[1:]) == [1.0, 2.0, 3.0]
+    assert list(df["close"]) == [2.0, 3.0, 4.0, 50.0]
+    
+    
+def test_ring_buffer_object_and_upcast_columns():
+    buf = RingBuffer(4, {"close": np.float64})
+    for i in range(3):
+        buf.append(i, close=float(i))
+    buf.add_column("signal", object)
+    buf.add_column("count", np.int64)
+    buf.set_tail("signal", np.array(["buy", "sell"], dtype=object))
+    buf.set_tail("count", np.array([1, 2, 3]))
+    buf.append(3, close=3.0)
+    
+    # Integer columns can be upcast to hold NaN
+    buf.set_dtype("count", np.float64)
+    buf.set_tail("count", np.array([np.nan]))
+    
+    df = buf.as_df()
+    assert list(df["signal"]) == [None, "buy", "sell", None]
+    assert list(df["count"].iloc[:3]) == [1.0, 2.0, 3.0]
+    assert np.isnan(df["count"].iloc[3])
+    
+    
+def test_ring_buffer_extend_and_drop_since():
+    buf = RingBuffer(4, {"close": np.float64, "signal": object})
+    buf.extend(np.arange(3), {"close": np.array([0.0, 1.0, 2.0])})
+    buf.drop_since(1)
+    assert list(buf.times()) == [0]
+    
+    # Only the most recent rows are kept when extending past the capacity
+    buf.extend(np.arange(1, 7), {"close": np.arange(1.0, 7.0), 
+                                 "signal": np.array(list("abcdef"), dtype=object)})
+    df = buf.as_df()
+    assert list(df.index.asi8) == [3, 4, 5, 6]
+    assert list(df["close"]) == [3.0, 4.0, 5.0, 6.0]
+    assert list(df["signal"]) == ["c", "d", "e", "f"]
+    
+    buf.drop_since(5)
+    buf.append(5, close=50.0)
+    assert list(buf.as_df()["close"]) == [3.0, 4.0, 50.0]
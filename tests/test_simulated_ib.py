@@ -0,0 +1,64 @@
+import asyncio
+import math
+
+from datetime import timedelta
+
+from ib_async_trader import *
+
+
+def test_simulated_ib_replays_bars_to_data_streams():
+    bars = make_synthetic_bars(240)
+    sim = SimulatedIB({"ES": bars}, speed=math.inf, 
+                      replay_from=bars.index[120].to_pydatetime())
+    data = DataStream(ib.Future(symbol="ES", exchange="CME"), 60)
+    
+    async def main():
+        await sim.connectAsync()
+        await data.initialize(sim)
+        history = len(data._five_sec_bars)
+        await sim.wait_until_replayed()
+        for _ in range(10):
+            await asyncio.sleep(0)
+        return history
+    
+    # The history is everything before the replay started, and the rest is
+    # replayed to the stream.  The last five second bar is still open.
+    assert asyncio.run(main()) == 120
+    df = data.as_df()
+    assert len(df) == 20
+    assert df["volume"].sum() == bars["volume"].iloc[:-1].sum()
+    assert df["close"].iloc[-1] == bars["close"].iloc[-2]
+    
+
+def test_simulated_ib_order_round_trip():
+    bars = make_synthetic_bars(100)
+    sim = SimulatedIB({"ES": bars}, speed=math.inf, fill_latency_s=0.01, 
+                      starting_cash=100_000)
+    broker = IBLiveTradeBroker(sim)
+    contract = ib.Future(symbol="ES", exchange="CME", multiplier="50")
+    events = []
+    
+    async def main():
+        await sim.connectAsync()
+        await sim.wait_until_replayed()
+        await broker.qualify_contracts(contract)
+        
+        buy = broker.place_order(contract, ib.MarketOrder("BUY", 2),
+                                 filled_event=lambda t: events.append("filled"))
+        limit = broker.place_order(contract, ib.LimitOrder("SELL", 1, 1e6),
+                                   cancelled_event=lambda t: events.append("cancelled"))
+        assert buy.orderStatus.status == "PendingSubmit"
+        await asyncio.sleep(0.05)
+        sim.cancelOrder(limit.order)
+        return buy, limit
+    
+    buy, limit = asyncio.run(main())
+    price = bars["close"].iloc[-1]
+    assert events == ["filled", "cancelled"]
+    assert buy.orderStatus.avgFillPrice == price
+    assert limit.orderStatus.status == "Cancelled" and not limit.fills
+    
+    [pos] = sim.positions()
+    assert pos.position == 2 and pos.avgCost == price * 50
+    assert broker.get_cash_balance() == round(100_000 - 2 * 50 * price, 2)
+    assert broker.get_account_value("NetLiquidation") == 100_000
@@ -0,0 +1,47 @@
+import logging
+
+from ib_async_trader.utils.telemetry import *
+
+
+def test_histogram_buckets_and_quantiles():
+    h = Histogram(buckets=(0.01, 0.1, 1))
+    for value in [0.005, 0.01, 0.05, 0.5, 2]:
+        h.observe(value)
+    
+    assert h.bucket_counts == [2, 1, 1, 1]
+    assert h.count == 5 and h.max == 2
+    assert h.quantile(0.4) == 0.01
+    assert h.quantile(1.0) == 2
+
+
+def test_prometheus_text_file_sink(tmp_path):
+    path = tmp_path / "metrics.prom"
+    sink = PrometheusTextFileSink(str(path), buckets=(0.01, 0.1))
+    sink.describe("tick_lag_seconds", "How late each tick started.")
+    sink.observe("tick_lag_seconds", 0.005)
+    sink.observe("tick_lag_seconds", 0.05)
+    sink.observe("stream_update_seconds", 0.2, {"stream": "ES"})
+    sink.increment("ticks_skipped_total")
+    sink.flush()
+    
+    lines = path.read_text().splitlines()
+    assert "# HELP ib_async_trader_tick_lag_seconds How late each tick started." in lines
+    assert "# TYPE ib_async_trader_tick_lag_seconds histogram" in lines
+    assert 'ib_async_trader_tick_lag_seconds_bucket{le="0.01"} 1' in lines
+    assert 'ib_async_trader_tick_lag_seconds_bucket{le="0.1"} 2' in lines
+    assert 'ib_async_trader_tick_lag_seconds_bucket{le="+Inf"} 2' in lines
+    assert 'ib_async_trader_tick_lag_seconds_count 2' in lines
+    assert 'ib_async_trader_stream_update_seconds_bucket{stream="ES",le="+Inf"} 1' in lines
+    assert "# TYPE ib_async_trader_ticks_skipped_total counter" in lines
+    assert "ib_async_trader_ticks_skipped_total 1" in lines
+    
+
+def test_logging_metrics_sink(caplog):
+    sink = LoggingMetricsSink()
+    sink.observe("tick_duration_seconds", 0.02)
+    sink.increment("tick_overruns_total", labels={"stream": "ES"})
+    with caplog.at_level(logging.INFO, logger="ib_async_trader.telemetry"):
+        sink.flush()
+    
+    assert "tick_duration_seconds count=1" in caplog.text
+    assert 'tick_overruns_total{stream="ES"} 1' in caplog.text
@@ -0,0 +1,78 @@
+import os 
+from ib_async_trader import *
+
+TESTS_PATH = os.path.dirname(os.path.realpath(__file__))
+
+
+class CrossoverStrat(Strategy):
+    """
+    Holds the future (and a call on it) while the close is above its moving
+    average.  Implements both tick() and get_target_positions() so that the
+    two engines can be compared.
+    """
+    
+    def __init__(self, contracts: list[ib.Contract]):
+        super().__init__()
+        self.contracts = contracts
+        
+    
+    def on_data_update(self, data_id, df):
+        df["target"] = (df["close"] > df["close"].rolling(10).mean()).astype(float)
+        return df
+    
+    
+    async def tick(self):
+        data = self.datas["ES"]
+        if not data.exists():
+            return
+        for contract in self.contracts:
+            held = sum(p.position for p in self.broker.get_positions() 
+                       if p.contract == contract)
+            qty = data.get("target") - held
+            if qty != 0:
+                action = "BUY" if qty > 0 else "SELL"
+                self.broker.place_order(contract, ib.MarketOrder(action, abs(qty)))
+        
+    
+    def get_target_positions(self):
+        target = self.datas["ES"].as_df()["target"]
+        return [TargetPosition(contract, target) for contract in self.contracts]
+
+
+def test_vectorized_backtest_engine_matches_backtest_engine():
+    future = ib.Future(symbol="ES", lastTradeDateOrContractMonth="20241220", 
+                       exchange="CME", multiplier=50)
+    call = ib.FuturesOption(symbol="ES", lastTradeDateOrContractMonth="20240620",
+                            strike=5550, right="C", exchange="CME", multiplier=50)
+    contracts = [future, call]
+    
+    data = DataFile(future, f"{TESTS_PATH}/sample_es_data.csv")
+    index = data.as_df().index
+    event = BacktestEngine(CrossoverStrat(contracts), {"ES": data}, None, 
+                           index[0], index[-1], start_cash=1_000_000,
+                           clock_type=ClockType.DATA_INDEX)
+    event.run()
+    
+    data = DataFile(future, f"{TESTS_PATH}/sample_es_data.csv")
+    vectorized = VectorizedBacktestEngine(CrossoverStrat(contracts), {"ES": data},
+                                          index[0], index[-1], start_cash=1_000_000)
+    vectorized.run()
+    
+    assert len(vectorized.trades) > 2
+    assert np.isclose(vectorized.broker.cash_balance, event.broker.cash_balance)
+    assert np.isclose(vectorized.broker.account_pnl.realizedPnL, 
+                      event.broker.account_pnl.realizedPnL)
+    assert [(p.contract, p.position) for p in vectorized.broker.get_positions()] \
+        == [(p.contract, p.position) for p in event.broker.get_positions()]
+    
+    # The option expired during the backtest, so was closed
+    assert vectorized.trades[vectorized.trades["sec_type"] == "FOP"]["quantity"].sum() == 0
+    
+    curve = vectorized.equity_curve
+    assert curve.index.equals(index)
+    assert np.isclose(curve["cash"].iloc[-1], vectorized.broker.cash_balance)
+    
+    event_curve = event.get_equity_curve()
+    assert np.allclose(curve["equity"], event_curve["equity"])
+    assert np.allclose(curve["realized_pnl"], event_curve["realized_pnl"])
+    pd.testing.assert_frame_equal(vectorized.trades, event.get_trades())